@@ -2,13 +2,19 @@
 """
 Final Analysis Script for v4_data.csv (N=246)
 Locked-in analysis with exports for paper writing
+
+The statistics below are locked. The only additions are optional hooks
+(results store, robust inference block, stage timings) that are skipped
+when their modules are missing and leave every table unchanged.
 """
 
 import pandas as pd
 import numpy as np
 from scipy.stats import pearsonr
 import os
+import sys
 import json
+import time
 
 # Try to import optional libraries
 try:
@@ -34,6 +40,31 @@ except ImportError:
     HAS_PLOTTING = False
     print("WARNING: matplotlib/seaborn not available. Figures will be skipped.")
 
+# Versioned results store (stdlib sqlite3); lives in scripts/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+try:
+    from results_store import ResultsStore, frame_rows, matrix_rows, document_rows
+    HAS_RESULTS_STORE = True
+except ImportError:
+    HAS_RESULTS_STORE = False
+    print("WARNING: scripts/results_store.py not found. Runs will not be recorded.")
+
+try:
+    from robust_regression import robust_entries
+    HAS_ROBUST = True
+except ImportError:
+    HAS_ROBUST = False
+
+# Per-step wall-clock timings, recorded with the run
+stage_timings = {}
+_stage_clock = [time.perf_counter()]
+
+
+def mark_stage(name):
+    now = time.perf_counter()
+    stage_timings[name] = now - _stage_clock[0]
+    _stage_clock[0] = now
+
 print("="*70)
 print("FINAL ANALYSIS: v4_data.csv (N=246)")
 print("="*70)
@@ -174,6 +205,8 @@ for var in key_vars:
 
 print("\n" + "="*70)
 
+mark_stage("step1_load")
+
 # ============================================================================
 # STEP 2: RELIABILITY AND DESCRIPTIVES
 # ============================================================================
@@ -241,6 +274,8 @@ for var in desc_vars:
 table1 = pd.DataFrame(desc_data)
 print("\n✓ Table 1 (Descriptives + Reliability) created")
 
+mark_stage("step2_descriptives")
+
 # ============================================================================
 # STEP 3: CORRELATION MATRIX
 # ============================================================================
@@ -284,6 +319,8 @@ print(f"  CREATIVITY vs AUTHORSHIP: r = {r3:.3f}, p = {p3:.4f}")
 
 print("\n✓ Table 2 (Correlation Matrix) created")
 
+mark_stage("step3_correlations")
+
 # ============================================================================
 # STEP 4: REGRESSION MODELS
 # ============================================================================
@@ -395,11 +432,23 @@ if HAS_STATSMODELS:
         }
     }
     
+    # Heteroskedasticity-robust (HC0-HC3) and Huber/bisquare inference
+    if HAS_ROBUST:
+        print("\nRobust inference (focal coefficient):")
+        for model_key, entry in robust_entries(reg_data).items():
+            reg_results[model_key]["robust"] = entry
+            print(f"  {reg_results[model_key]['model_name']}: HC3 SE = {entry['HC3_SE']:.3f} "
+                  f"(p = {entry['HC3_p']:.4f}); Huber B = {entry['huber_B']:.3f} "
+                  f"(p = {entry['huber_p']:.4f}); bisquare B = {entry['bisquare_B']:.3f} "
+                  f"(p = {entry['bisquare_p']:.4f})")
+    
     print("\n✓ Regression models completed")
 else:
     reg_results = None
     print("\n⚠ Regression models skipped (statsmodels not available)")
 
+mark_stage("step4_regression")
+
 # ============================================================================
 # STEP 5: CLUSTERING (OPTIONAL)
 # ============================================================================
@@ -453,6 +502,8 @@ if HAS_SKLEARN:
 else:
     print("\n⚠ Clustering skipped (sklearn not available)")
 
+mark_stage("step5_clustering")
+
 # ============================================================================
 # STEP 6: EXPORT DATA, TABLES, AND FIGURES
 # ============================================================================
@@ -574,6 +625,31 @@ if HAS_PLOTTING:
 else:
     print("⚠ Figures skipped (matplotlib not available)")
 
+mark_stage("step6_export")
+
+# Record this run (every table above plus the regression JSON) in the results store
+if HAS_RESULTS_STORE:
+    store_rows = frame_rows("table1_descriptives_reliability", table1, "variable_name")
+    store_rows += matrix_rows("table2_correlation_matrix", corr_matrix)
+    store_rows += document_rows("key_correlations", key_corrs)
+    if reg_results:
+        store_rows += frame_rows("table3_regression_summary", reg_table, "Model")
+        store_rows += document_rows("regression_results", reg_results)
+    if cluster_results is not None:
+        store_rows += frame_rows("table4_cluster_profiles", cluster_results, "cluster")
+    run_config = {
+        "corr_vars": corr_vars,
+        "reg_vars": reg_vars if reg_results else None,
+        "kmeans": {"n_clusters": 3, "random_state": 42, "n_init": 10} if cluster_results is not None else None,
+        "has_statsmodels": HAS_STATSMODELS,
+        "has_sklearn": HAS_SKLEARN,
+    }
+    with ResultsStore() as store:
+        run_id = store.record_run("final_analysis_v4.py", store_rows, input_path="v4_data.csv",
+                                  config=run_config, timings=stage_timings,
+                                  label=os.environ.get("RESULTS_LABEL"))
+    print(f"✓ Recorded run {run_id} in results/results.sqlite ({len(store_rows)} statistics)")
+
 print("\n" + "="*70)
 
 # ============================================================================
@@ -659,6 +735,8 @@ if reg_results:
     print("  • tables/regression_results.json")
 if cluster_results is not None:
     print("  • tables/table4_cluster_profiles.csv")
+if HAS_RESULTS_STORE:
+    print("  • results/results.sqlite (run history)")
 if HAS_PLOTTING:
     print("  • figures/histograms_main_variables.png")
     print("  • figures/scatterplots_main_relationships.png")
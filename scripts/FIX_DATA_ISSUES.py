@@ -141,6 +141,7 @@ def calculate_composite_score(df, items, min_items_required=None, method='mean')
 # ============================================================================
 # FIX #3: Reverse code items properly
 # ============================================================================
+# Historical v3 pass: keeps its own keys and minimums rather than scales.json
 neg_auth_items = ["auth_less_connected", "auth_less_authentic", "auth_worry_copy"]
 
 for col in neg_auth_items:
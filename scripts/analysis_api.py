@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Importable, stateless version of the final_analysis_v4.py pipeline (STEPS 1-5).
+
+final_analysis_v4.py and analyze_v4_data.py run at module top level, read
+v4_data.csv and write fixed paths. This module exposes the same analysis as
+functions that take a DataFrame or a path plus an AnalysisConfig and return
+typed result objects; nothing is read from or written to globals, and files
+are written only when write_outputs() is called.
+
+    from analysis_api import AnalysisConfig, run_analysis, run_batch
+    result = run_analysis("v4_data.csv")
+    result.models["model_b"].coefficients["AI_USE_SCORE"].B
+    result.table1(); result.regression_results(); result.v4_summary()
+
+run_batch() fans many datasets across a worker pool. Each worker imports
+numpy/pandas/scipy/sklearn once and then analyzes a stream of datasets, so
+300 school files cost a handful of interpreter starts instead of 300.
+
+Regression uses listwise deletion on the STEP 4 variables (one sample for
+Models A-C); Table 2 is listwise on its six variables; the key correlations
+and alphas use the pairwise/complete rows of their own variables. STEP 4 also
+attaches the HC0-HC3 and Huber/bisquare block from robust_regression to each
+model (AnalysisConfig(robust=False) skips it).
+
+Usage:
+    python scripts/analysis_api.py --data exports/ [--n-jobs 4] [--out-dir batch_outputs]
+"""
+
+import argparse
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from survey_data import (
+    load_analysis_frame, rename_columns, score_composites, prepare_covariates,
+    desc_vars, scale_items, corr_vars, key_pairs, cluster_vars,
+    regression_data, build_design, model_specs, INTERACTION_TERM,
+)
+from parallel import parallel_map, resolve_n_jobs
+from robust_regression import robust_entries
+
+try:
+    from sklearn.preprocessing import StandardScaler
+    from sklearn.cluster import KMeans
+    HAS_SKLEARN = True
+except ImportError:
+    HAS_SKLEARN = False
+
+
+
+# ----------------------------------------------------------------------------
+# Configuration and result types
+# ----------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class AnalysisConfig:
+    """Options for one run; the defaults reproduce final_analysis_v4.py."""
+    models: Tuple[str, ...] = ("model_a", "model_b", "model_c")
+    clustering: bool = True
+    n_clusters: int = 3
+    random_state: int = 42
+    n_init: int = 10
+    robust: bool = True
+
+
+@dataclass
+class Descriptive:
+    variable: str
+    N: int
+    mean: float
+    sd: float
+    min: float
+    max: float
+    alpha: float
+
+
+@dataclass
+class Correlation:
+    x: str
+    y: str
+    r: float
+    p: float
+    N: int
+
+
+@dataclass
+class Coefficient:
+    term: str
+    B: float
+    SE: float
+    t: float
+    p: float
+
+
+@dataclass
+class ModelResult:
+    key: str
+    model_name: str
+    outcome_name: str
+    N: int
+    R2: float
+    adj_R2: float
+    coefficients: Dict[str, Coefficient]
+    dropped_terms: List[str] = field(default_factory=list)
+    robust: Dict[str, object] = field(default_factory=dict)
+
+    def table(self):
+        """Coefficient table with one row per term."""
+        return pd.DataFrame([vars(c) for c in self.coefficients.values()])
+
+
+@dataclass
+class AnalysisResult:
+    source: str
+    n_participants: int
+    descriptives: List[Descriptive]
+    correlation_matrix: pd.DataFrame
+    correlation_N: int
+    key_correlations: Dict[str, Correlation]
+    models: Dict[str, ModelResult]
+    clusters: Optional[pd.DataFrame]
+    config: AnalysisConfig
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def table1(self):
+        """Table 1 (tables/table1_descriptives_reliability.csv layout)."""
+        return pd.DataFrame([{"variable_name": d.variable, "N": d.N, "mean": d.mean, "sd": d.sd,
+                              "min": d.min, "max": d.max, "alpha": d.alpha} for d in self.descriptives])
+
+    def regression_results(self):
+        """Model summaries in the tables/regression_results.json layout."""
+        out = {}
+        for key, m in self.models.items():
+            entry = {"model_name": m.model_name, "outcome_name": m.outcome_name, "N": m.N, "R2": m.R2}
+            if INTERACTION_TERM in m.coefficients:
+                c = m.coefficients[INTERACTION_TERM]
+                entry.update({"interaction_B": c.B, "interaction_SE": c.SE, "interaction_p": c.p})
+            else:
+                c = m.coefficients["AI_USE_SCORE"]
+                entry.update({"AI_USE_SCORE_B": c.B, "AI_USE_SCORE_SE": c.SE, "AI_USE_SCORE_p": c.p})
+            if m.robust:
+                entry["robust"] = m.robust
+            out[key] = entry
+        return out
+
+    def table3(self):
+        """Table 3 (tables/table3_regression_summary.csv layout)."""
+        rows = []
+        for key in ("model_a", "model_b"):
+            if key in self.models:
+                m = self.models[key]
+                c = m.coefficients["AI_USE_SCORE"]
+                rows.append({"Model": m.model_name, "Outcome": m.outcome_name, "N": m.N, "R2": m.R2,
+                             "AI_USE_B": c.B, "AI_USE_SE": c.SE, "AI_USE_p": c.p})
+        return pd.DataFrame(rows)
+
+    def v4_summary(self):
+        """Summary in the v4_analysis_results.json layout of analyze_v4_data.py."""
+        d = {x.variable: x for x in self.descriptives}
+        kc = self.key_correlations
+        summary = {
+            "sample_size": self.n_participants,
+            "reliability": {"ai_use": d["AI_USE_SCORE"].alpha,
+                            "creativity_general": d["CREATIVITY_GENERAL"].alpha,
+                            "authorship_core": d["AUTHORSHIP_SCORE"].alpha},
+            "correlations": {
+                "ai_use_creativity": {"r": kc["AI_USE_vs_CREATIVITY"].r, "p": kc["AI_USE_vs_CREATIVITY"].p},
+                "ai_use_authorship": {"r": kc["AI_USE_vs_AUTHORSHIP"].r, "p": kc["AI_USE_vs_AUTHORSHIP"].p},
+                "creativity_authorship": {"r": kc["CREATIVITY_vs_AUTHORSHIP"].r,
+                                          "p": kc["CREATIVITY_vs_AUTHORSHIP"].p},
+            },
+            "descriptives": {
+                "ai_use": {"mean": d["AI_USE_SCORE"].mean, "sd": d["AI_USE_SCORE"].sd},
+                "creativity": {"mean": d["CREATIVITY_GENERAL"].mean, "sd": d["CREATIVITY_GENERAL"].sd},
+                "authorship": {"mean": d["AUTHORSHIP_SCORE"].mean, "sd": d["AUTHORSHIP_SCORE"].sd},
+            },
+        }
+        if "model_a" in self.models and "model_b" in self.models:
+            summary["regression"] = {
+                key: {"ai_use_coef": self.models[key].coefficients["AI_USE_SCORE"].B,
+                      "ai_use_p": self.models[key].coefficients["AI_USE_SCORE"].p,
+                      "rsquared": self.models[key].R2, "n": self.models[key].N}
+                for key in ("model_a", "model_b")
+            }
+        if "model_c" in self.models:
+            c = self.models["model_c"].coefficients[INTERACTION_TERM]
+            summary["moderation"] = {"interaction_coef": c.B, "interaction_p": c.p}
+        if self.clusters is not None:
+            profiles = self.clusters.set_index("cluster")
+            summary["clustering"] = {
+                "n_clustered": int(profiles["N"].sum()),
+                "cluster_sizes": profiles["N"].to_dict(),
+                "cluster_means": profiles[cluster_vars].to_dict(),
+            }
+        return summary
+
+
+# ----------------------------------------------------------------------------
+# Pipeline steps (pure functions)
+# ----------------------------------------------------------------------------
+
+def prepare_frame(data):
+    """
+    STEP 1 for a path, a raw export DataFrame or an already scored frame.
+
+    The caller's DataFrame is never modified.
+    """
+    if isinstance(data, (str, os.PathLike)):
+        return load_analysis_frame(data)
+    if "AI_USE_SCORE" in data.columns:
+        return data.copy()
+    adf = rename_columns(data).copy()
+    score_composites(adf)
+    prepare_covariates(adf)
+    return adf
+
+
+def _alpha(items):
+    items = items[~np.isnan(items).any(axis=1)]
+    k = items.shape[1]
+    total_var = items.sum(axis=1).var(ddof=1)
+    return (k / (k - 1)) * (1 - items.var(axis=0, ddof=1).sum() / total_var)
+
+
+def descriptives(adf):
+    """STEP 2: N, mean, SD, range and Cronbach's alpha of each composite."""
+    out = []
+    for var in desc_vars:
+        values = adf[var].dropna()
+        out.append(Descriptive(var, int(len(values)), values.mean(), values.std(), values.min(), values.max(),
+                               _alpha(adf[scale_items[var]].to_numpy(dtype=float))))
+    return out
+
+
+def _pearson(x, y):
+    ok = ~(np.isnan(x) | np.isnan(y))
+    n = int(ok.sum())
+    r = np.corrcoef(x[ok], y[ok])[0, 1]
+    t = r * np.sqrt((n - 2) / (1 - r ** 2))
+    return r, 2 * t_dist.sf(abs(t), n - 2), n
+
+
+def correlations(adf):
+    """STEP 3: listwise Table 2 matrix, its N, and the pairwise key correlations."""
+    corr_data = adf[corr_vars].dropna()
+    key = {}
+    for name, (a, b) in key_pairs.items():
+        r, p, n = _pearson(adf[a].to_numpy(dtype=float), adf[b].to_numpy(dtype=float))
+        key[name] = Correlation(a, b, r, p, n)
+    return corr_data.corr(), len(corr_data), key
+
+
+def fit_model(reg_data, model_key):
+    """
+    STEP 4: classical OLS for one of Models A-C on the listwise sample.
+
+    Predictors that are constant in the sample (e.g. grade in a one-grade
+    school file) are dropped and listed in dropped_terms.
+    """
+    spec = model_specs[model_key]
+    X, y, terms = build_design(reg_data, model_key)
+    constant = [j for j in range(1, X.shape[1]) if np.ptp(X[:, j]) == 0] if len(X) else []
+    dropped = [terms[j] for j in constant]
+    keep = [j for j in range(X.shape[1]) if j not in constant]
+    X, terms = X[:, keep], [terms[j] for j in keep]
+    n, p = X.shape
+    if n <= p:
+        raise ValueError(f"{spec['model_name']}: {n} complete cases for {p} parameters")
+    Q, R = np.linalg.qr(X)
+    b = np.linalg.solve(R, Q.T @ y)
+    resid = y - X @ b
+    dof = n - p
+    s2 = resid @ resid / dof
+    R_inv = np.linalg.inv(R)
+    se = np.sqrt(s2 * (R_inv ** 2).sum(axis=1))
+    t = b / se
+    pvals = 2 * t_dist.sf(np.abs(t), dof)
+    r2 = 1 - resid @ resid / ((y - y.mean()) ** 2).sum()
+    coefficients = {term: Coefficient(term, b[i], se[i], t[i], pvals[i]) for i, term in enumerate(terms)}
+    return ModelResult(model_key, spec["model_name"], spec["outcome_name"], int(n), r2,
+                       1 - (1 - r2) * (n - 1) / dof, coefficients, dropped)
+
+
+def cluster_profiles(adf, config):
+    """STEP 5: k-means profiles (table4 layout), or None without sklearn."""
+    if not (config.clustering and HAS_SKLEARN):
+        return None
+    features = adf[cluster_vars].dropna()
+    if len(features) < config.n_clusters:
+        return None
+    X = StandardScaler().fit_transform(features)
+    labels = KMeans(n_clusters=config.n_clusters, random_state=config.random_state,
+                    n_init=config.n_init).fit_predict(X)
+    profiles = features.groupby(labels).mean()
+    sizes = pd.Series(labels).value_counts().sort_index()
+    table = profiles.reset_index(names="cluster")
+    table.insert(1, "N", sizes.to_numpy())
+    return table
+
+
+def run_analysis(data, config=None, source=None):
+    """
+    Run STEPS 1-5 on one dataset.
+
+    Parameters:
+    -----------
+    data : str, path-like or DataFrame
+        Export path, raw export frame, or a frame already scored by survey_data
+    config : AnalysisConfig, optional
+    source : str, optional
+        Label stored on the result (defaults to the path)
+
+    Returns:
+    --------
+    AnalysisResult
+    """
+    config = config or AnalysisConfig()
+    timings = {}
+    clock = time.perf_counter()
+
+    def mark(name):
+        nonlocal clock
+        now = time.perf_counter()
+        timings[name] = now - clock
+        clock = now
+
+    adf = prepare_frame(data)
+    mark("step1_load")
+    desc = descriptives(adf)
+    mark("step2_descriptives")
+    corr_matrix, corr_n, key = correlations(adf)
+    mark("step3_correlations")
+    reg_data = regression_data(adf)
+    models = {key_: fit_model(reg_data, key_) for key_ in config.models}
+    if config.robust and models:
+        for key_, entry in robust_entries(reg_data, tuple(models)).items():
+            models[key_].robust = entry
+    mark("step4_regression")
+    clusters = cluster_profiles(adf, config)
+    mark("step5_clustering")
+
+    if source is None:
+        source = os.fspath(data) if isinstance(data, (str, os.PathLike)) else "<DataFrame>"
+    return AnalysisResult(source, len(adf), desc, corr_matrix, corr_n, key, models, clusters, config, timings)
+
+
+def write_outputs(result, out_dir):
+    """
+    Write the STEP 6 tables and JSON summaries for one result under out_dir.
+
+    Returns:
+    --------
+    list : paths written
+    """
+    tables = os.path.join(out_dir, "tables")
+    os.makedirs(tables, exist_ok=True)
+    written = []
+
+    def path(*parts):
+        p = os.path.join(out_dir, *parts)
+        written.append(p)
+        return p
+
+    result.table1().to_csv(path("tables", "table1_descriptives_reliability.csv"), index=False)
+    result.correlation_matrix.to_csv(path("tables", "table2_correlation_matrix.csv"))
+    if result.models:
+        result.table3().to_csv(path("tables", "table3_regression_summary.csv"), index=False)
+        with open(path("tables", "regression_results.json"), "w") as f:
+            json.dump(result.regression_results(), f, indent=2, default=float)
+    if result.clusters is not None:
+        result.clusters.to_csv(path("tables", "table4_cluster_profiles.csv"), index=False)
+    with open(path("v4_analysis_results.json"), "w") as f:
+        json.dump(result.v4_summary(), f, indent=2, default=str)
+    return written
+
+
+# ----------------------------------------------------------------------------
+# Batch runner
+# ----------------------------------------------------------------------------
+
+@dataclass
+class BatchItem:
+    source: str
+    result: Optional[AnalysisResult] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+def _batch_task(task):
+    source, config, out_dir = task
+    start = time.perf_counter()
+    try:
+        result = run_analysis(source, config)
+        if out_dir is not None:
+            name = os.path.splitext(os.path.basename(os.fspath(source)))[0]
+            write_outputs(result, os.path.join(out_dir, name))
+        return BatchItem(os.fspath(source), result, seconds=time.perf_counter() - start)
+    except (OSError, KeyError, ValueError, np.linalg.LinAlgError, pd.errors.ParserError) as exc:
+        return BatchItem(os.fspath(source), error=f"{type(exc).__name__}: {exc}",
+                         seconds=time.perf_counter() - start)
+
+
+def run_batch(sources, config=None, n_jobs=None, out_dir=None):
+    """
+    Analyze many datasets across a worker pool; results come back in input order.
+
+    Workers are reused for many datasets (tasks are sent in chunks), so the
+    heavy imports happen once per worker. A dataset that fails is returned
+    with its error instead of stopping the batch.
+
+    Parameters:
+    -----------
+    sources : list of paths
+    config : AnalysisConfig, optional
+    n_jobs : int, optional
+        Worker processes (None = one per CPU)
+    out_dir : str, optional
+        When given, each dataset's outputs go to out_dir/<file stem>/
+
+    Returns:
+    --------
+    list of BatchItem
+    """
+    config = config or AnalysisConfig()
+    sources = list(sources)
+    workers = min(resolve_n_jobs(n_jobs), max(len(sources), 1))
+    chunksize = max(1, len(sources) // (4 * workers))
+    tasks = [(source, config, out_dir) for source in sources]
+    return parallel_map(_batch_task, tasks, n_jobs=workers, chunksize=chunksize)
+
+
+def batch_summary(items):
+    """One row per dataset with N and the key Model A-C estimates."""
+    rows = []
+    for item in items:
+        row = {"source": item.source, "error": item.error or "", "seconds": item.seconds}
+        if item.result is not None:
+            row["N"] = item.result.n_participants
+            for key, m in item.result.models.items():
+                term = INTERACTION_TERM if INTERACTION_TERM in m.coefficients else "AI_USE_SCORE"
+                c = m.coefficients.get(term, Coefficient(term, np.nan, np.nan, np.nan, np.nan))
+                row.update({f"{key}_N": m.N, f"{key}_R2": m.R2, f"{key}_B": c.B,
+                            f"{key}_SE": c.SE, f"{key}_p": c.p, f"{key}_dropped": " ".join(m.dropped_terms)})
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main():
+    from sharded_analysis import expand_paths
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", nargs="+", default=["v4_data.csv"],
+                        help="CSV files, directories or glob patterns")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--out-dir", default=None, help="Write each dataset's tables under this directory")
+    parser.add_argument("--no-clustering", action="store_true")
+    parser.add_argument("--no-robust", action="store_true", help="Skip the HC0-HC3 / M-estimation block")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("BATCH ANALYSIS (STEPS 1-5 per dataset)")
+    print("=" * 70)
+
+    sources = expand_paths(args.data)
+    config = AnalysisConfig(clustering=not args.no_clustering, robust=not args.no_robust)
+    start = time.perf_counter()
+    items = run_batch(sources, config, args.n_jobs, args.out_dir)
+    elapsed = time.perf_counter() - start
+
+    summary = batch_summary(items)
+    failed = summary["error"] != ""
+    print(f"✓ Analyzed {(~failed).sum()} of {len(items)} datasets in {elapsed:.1f}s")
+    for _, row in summary[failed].iterrows():
+        print(f"  ⚠ {row['source']}: {row['error']}")
+
+    os.makedirs("tables", exist_ok=True)
+    summary.to_csv("tables/batch_summary.csv", index=False)
+    print("✓ Exported: tables/batch_summary.csv")
+
+
+if __name__ == "__main__":
+    main()
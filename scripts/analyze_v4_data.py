@@ -4,10 +4,24 @@ Comprehensive analysis of v4_data.csv
 Generates results for ChatGPT report
 """
 
+import os
+import time
+
 import pandas as pd
 import numpy as np
 from scipy.stats import pearsonr
 
+from survey_data import score_composites, ai_items, creativity_general_items, authorship_core_items
+
+try:
+    from results_store import ResultsStore, document_rows
+    HAS_RESULTS_STORE = True
+except ImportError:
+    HAS_RESULTS_STORE = False
+    print("Warning: results_store not available, run will not be recorded")
+
+run_start = time.perf_counter()
+
 try:
     import statsmodels.formula.api as smf
     HAS_STATSMODELS = True
@@ -64,23 +78,8 @@ for col in df_v4.columns:
 df_v4 = df_v4.rename(columns=rename_map)
 adf_v4 = df_v4.copy()
 
-# Calculate composite scores
-ai_items = ["ai_brainstorm", "ai_draft", "ai_edit", "ai_stuck", "ai_rely"]
-creativity_general_items = ["creat_feels_creative", "creat_conf_no_ai", "creat_enjoy_writing"]
-creativity_ai_boost_items = ["creat_ai_helps_ideas", "creat_more_creative_with_ai"]
-
-adf_v4["AI_USE_SCORE"] = adf_v4[ai_items].mean(axis=1)
-adf_v4["CREATIVITY_GENERAL"] = adf_v4[creativity_general_items].mean(axis=1)
-adf_v4["CREATIVITY_AI_BOOST"] = adf_v4[creativity_ai_boost_items].mean(axis=1)
-
-# Reverse code authorship items
-neg_auth_items = ["auth_less_connected", "auth_less_authentic"]
-for col in neg_auth_items:
-    if col in adf_v4.columns:
-        adf_v4[col + "_REV"] = 6 - adf_v4[col]
-
-authorship_core_items = ["auth_ideas_mine", "auth_comfort_credit", "auth_less_connected_REV", "auth_less_authentic_REV"]
-adf_v4["AUTHORSHIP_SCORE"] = adf_v4[authorship_core_items].mean(axis=1)
+# Reverse-coded items and composite scores (scripts/scales.json)
+score_composites(adf_v4)
 
 # Reliability
 def cronbach_alpha(df_subset):
@@ -236,3 +235,13 @@ with open("v4_analysis_results.json", "w") as f:
 
 print("\nResults saved to v4_analysis_results.json")
 
+# Keep every run queryable alongside final_analysis_v4.py's runs
+if HAS_RESULTS_STORE:
+    with ResultsStore() as store:
+        run_id = store.record_run("analyze_v4_data.py", document_rows("v4_analysis_results", results),
+                                  input_path="v4_data.csv", config={"has_statsmodels": HAS_STATSMODELS,
+                                                                    "has_sklearn": HAS_SKLEARN},
+                                  timings={"total": time.perf_counter() - run_start},
+                                  label=os.environ.get("RESULTS_LABEL"))
+    print(f"Run {run_id} recorded in results/results.sqlite")
+
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+Out-of-core column store for survey exports larger than memory.
+
+`convert` streams the CSV export in row chunks and writes one flat binary
+file per column into a store directory:
+  - the Likert items as uint8 (0 = missing),
+  - the encoded Model A-C covariates as float32 (NaN = missing),
+with a sidecar schema.json listing each column's file, dtype, missing code
+and valid range, plus the row count.
+
+`analyze` works on the store block by block and never holds a full column:
+  1. composite scoring (mean of the available items, reverse-keyed items
+     flipped) is written back as float32 columns,
+  2. one pass over the blocks then accumulates every statistic at once:
+     per-variable N/mean/SD/min/max, item covariances for Cronbach's alpha,
+     the STEP 3 correlation matrix and the centred normal equations of
+     Models A-C, each under its own complete-case rule.
+Blocks are read through short-lived memory maps sized to stay in cache
+(--block-rows), and per-block moments are merged with the pairwise update
+of Chan et al., so peak RAM stays flat and sums stay accurate as N grows.
+
+Usage:
+    python scripts/column_store.py convert [--data v4_data.csv] [--store data/column_store]
+    python scripts/column_store.py analyze [--store data/column_store]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from scale_scoring import compiled_scales
+from survey_data import (
+    rename_map, rename_columns, prepare_covariates, likert_items, covariates,
+    scale_items, corr_vars, model_specs, INTERACTION_TERM,
+)
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+DEFAULT_STORE = "data/column_store"
+SCHEMA_FILE = "schema.json"
+CONVERT_CHUNK_ROWS = 100_000
+# Rows x columns of one float64 block; 1M elements (8 MB) keeps a block in cache
+MAX_BLOCK_ELEMENTS = 1_000_000
+LIKERT_RANGE = (1, 5)
+# Predictor correlation matrices worse conditioned than this are treated as collinear
+MAX_CONDITION = 1e10
+
+text_fields = ["grade", "gender", "assignments_per_week", "overall_policy",
+               "writing_ability", "artificial_intelligence_instruction"]
+reg_vars = ["CREATIVITY_GENERAL", "AUTHORSHIP_SCORE", "AI_USE_SCORE"] + covariates + [INTERACTION_TERM]
+
+# Complete-case rule of each accumulated statistic, and the columns one pass reads
+rules = {
+    **{f"alpha_{name}": items for name, items in scale_items.items()},
+    "correlations": corr_vars,
+    "regression": reg_vars,
+}
+stat_variables = list(dict.fromkeys(list(scale_items) + [v for vs in rules.values() for v in vs]))
+
+
+# ----------------------------------------------------------------------------
+# Conversion
+# ----------------------------------------------------------------------------
+
+def _write_schema(store, schema):
+    tmp = os.path.join(store, SCHEMA_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp, os.path.join(store, SCHEMA_FILE))
+
+
+def read_export_chunks(data_path, chunk_rows=CONVERT_CHUNK_ROWS):
+    """Yield renamed export chunks with the numeric covariates added."""
+    # Covariate text columns stay text even in chunks where they are blank
+    text_dtype = {raw: str for raw, short in rename_map.items() if short in text_fields}
+    for raw in pd.read_csv(data_path, index_col=0, dtype=text_dtype, chunksize=chunk_rows):
+        yield prepare_covariates(rename_columns(raw).copy())
+
+
+def convert(data_path, store, chunk_rows=CONVERT_CHUNK_ROWS):
+    """
+    Stream a CSV export into a column store.
+
+    Parameters:
+    -----------
+    data_path : str
+        CSV export in the v4_data.csv format
+    store : str
+        Output directory; existing column files are overwritten
+    chunk_rows : int
+        Rows parsed per chunk
+
+    Returns:
+    --------
+    dict : the schema written to store/schema.json
+    """
+    os.makedirs(store, exist_ok=True)
+    columns = {}
+    for item in likert_items:
+        columns[item] = {"file": f"{item}.u8", "dtype": "uint8", "role": "item",
+                         "missing": 0, "range": list(LIKERT_RANGE), "out_of_range": 0}
+    for cov in covariates:
+        columns[cov] = {"file": f"{cov}.f32", "dtype": "float32", "role": "covariate"}
+
+    handles = {name: open(os.path.join(store, spec["file"]), "wb") for name, spec in columns.items()}
+    n_rows = 0
+    try:
+        for adf in read_export_chunks(data_path, chunk_rows):
+            for item in likert_items:
+                values = pd.to_numeric(adf[item], errors="coerce").to_numpy(dtype=float)
+                valid = np.isin(values, np.arange(LIKERT_RANGE[0], LIKERT_RANGE[1] + 1))
+                columns[item]["out_of_range"] += int((~valid & ~np.isnan(values)).sum())
+                np.where(valid, values, 0).astype(np.uint8).tofile(handles[item])
+            for cov in covariates:
+                adf[cov].to_numpy(dtype=np.float32).tofile(handles[cov])
+            n_rows += len(adf)
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+    schema = {
+        "format": 1,
+        "source": os.path.abspath(data_path),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "n_rows": n_rows,
+        "columns": columns,
+        "composites": {},
+    }
+    _write_schema(store, schema)
+    return schema
+
+
+# ----------------------------------------------------------------------------
+# Block access
+# ----------------------------------------------------------------------------
+
+class ColumnStore:
+    """Read-only view of a column store; rows are served in blocks."""
+
+    def __init__(self, store):
+        self.store = store
+        with open(os.path.join(store, SCHEMA_FILE)) as f:
+            self.schema = json.load(f)
+        self.n_rows = self.schema["n_rows"]
+        self.columns = self.schema["columns"]
+
+    def block_rows(self, width):
+        return max(1024, MAX_BLOCK_ELEMENTS // max(width, 1))
+
+    def column(self, name, start, stop):
+        """float64 copy of rows [start, stop) of a stored column, NaN where missing."""
+        spec = self.columns[name]
+        dtype = np.dtype(spec["dtype"])
+        # A map per block is unmapped as soon as it is copied, so resident pages do not pile up
+        mapped = np.memmap(os.path.join(self.store, spec["file"]), dtype=dtype, mode="r",
+                           offset=start * dtype.itemsize, shape=(stop - start,))
+        values = mapped.astype(np.float64)
+        del mapped
+        if "missing" in spec:
+            values[values == spec["missing"]] = np.nan
+        return values
+
+    def values(self, name, start, stop):
+        """Stored column, reverse-keyed item ('<item>_REV') or product term ('a:b')."""
+        if ":" in name:
+            left, right = name.split(":")
+            return self.values(left, start, stop) * self.values(right, start, stop)
+        if name not in self.columns and name.endswith("_REV"):
+            lo, hi = self.columns[name[:-4]]["range"]
+            return lo + hi - self.column(name[:-4], start, stop)
+        return self.column(name, start, stop)
+
+    def blocks(self, variables, block_rows=None):
+        """Yield (start, stop, float64 block) with one column per variable."""
+        block_rows = block_rows or self.block_rows(len(variables))
+        for start in range(0, self.n_rows, block_rows):
+            stop = min(start + block_rows, self.n_rows)
+            yield start, stop, np.column_stack([self.values(v, start, stop) for v in variables])
+
+
+def score_store(store, block_rows=None):
+    """
+    Write the composite scores as float32 columns.
+
+    All composites in scripts/scales.json come from one scoring-matrix product
+    per block; observed-item counts from the same pass go into the schema.
+
+    Returns:
+    --------
+    list : composite names written
+    """
+    scoring = compiled_scales()
+    handles = {name: open(os.path.join(store.store, f"{name}.f32"), "wb") for name in scoring.names}
+    below_min = np.zeros(len(scoring.names), dtype=np.int64)
+    item_missing = np.zeros(len(scoring.items), dtype=np.int64)
+    try:
+        for _, _, X in store.blocks(scoring.items, block_rows):
+            scores, count, missing = scoring.score(X)
+            for s, name in enumerate(scoring.names):
+                scores[:, s].astype(np.float32).tofile(handles[name])
+            below_min += (count < scoring.min_items).sum(axis=0)
+            item_missing += missing
+    finally:
+        for handle in handles.values():
+            handle.close()
+    for s, name in enumerate(scoring.names):
+        store.schema["composites"][name] = {**scoring.scales[name], "below_min_items": int(below_min[s])}
+        store.columns[name] = {"file": f"{name}.f32", "dtype": "float32", "role": "composite"}
+    for j, item in enumerate(scoring.items):
+        store.columns[item]["missing_count"] = int(item_missing[j])
+    _write_schema(store.store, store.schema)
+    return scoring.names
+
+
+# ----------------------------------------------------------------------------
+# Streaming statistics
+# ----------------------------------------------------------------------------
+
+class Moments:
+    """Count, mean vector and centred cross-product matrix, merged block by block."""
+
+    def __init__(self, k):
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.M2 = np.zeros((k, k))
+
+    def _combine(self, nb, mb, M2b):
+        n = self.n + nb
+        delta = mb - self.mean
+        self.M2 += M2b + np.outer(delta, delta) * (self.n * nb / n)
+        self.mean += delta * (nb / n)
+        self.n = n
+
+    def update(self, X):
+        if len(X) == 0:
+            return
+        mb = X.mean(axis=0)
+        Xc = X - mb
+        self._combine(len(X), mb, Xc.T @ Xc)
+
+    def merge(self, other):
+        """Add another partial result (e.g. a block or a shard) in place."""
+        if other.n:
+            self._combine(other.n, other.mean, other.M2)
+
+    def cov(self):
+        return self.M2 / (self.n - 1)
+
+
+class ColumnSummary:
+    """Pairwise-available N, mean, SD, min and max per column (Welford/Chan merge)."""
+
+    def __init__(self, k):
+        self.n = np.zeros(k)
+        self.mean = np.zeros(k)
+        self.M2 = np.zeros(k)
+        self.minimum = np.full(k, np.inf)
+        self.maximum = np.full(k, -np.inf)
+
+    def _combine(self, nb, mb, M2b, lo, hi):
+        has = nb > 0
+        n = self.n + nb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.where(has, mb - self.mean, 0.0)
+            self.M2 += np.where(has, M2b + delta ** 2 * self.n * nb / n, 0.0)
+            self.mean += np.where(has, delta * nb / n, 0.0)
+        self.n = n
+        self.minimum = np.fmin(self.minimum, lo)
+        self.maximum = np.fmax(self.maximum, hi)
+
+    def update(self, X):
+        ok = ~np.isnan(X)
+        nb = ok.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mb = np.where(ok, X, 0.0).sum(axis=0) / nb
+        M2b = (np.where(ok, X - mb, 0.0) ** 2).sum(axis=0)
+        self._combine(nb, mb, M2b, np.where(ok, X, np.inf).min(axis=0), np.where(ok, X, -np.inf).max(axis=0))
+
+    def merge(self, other):
+        self._combine(other.n, other.mean, other.M2, other.minimum, other.maximum)
+
+
+def new_statistics():
+    """
+    Empty STEP 2-4 accumulators.
+
+    Returns:
+    --------
+    dict : 'summary' (ColumnSummary over the composites) and Moments for each
+           complete-case rule: 'alpha_<composite>', 'correlations', 'regression'
+    """
+    return {"summary": ColumnSummary(len(scale_items)),
+            **{name: Moments(len(vs)) for name, vs in rules.items()}}
+
+
+_positions = {name: [stat_variables.index(v) for v in vs] for name, vs in rules.items()}
+
+
+def update_statistics(stats, X):
+    """Add a block whose columns follow stat_variables."""
+    stats["summary"].update(X[:, :len(scale_items)])
+    for name, cols in _positions.items():
+        block = X[:, cols]
+        stats[name].update(block[~np.isnan(block).any(axis=1)])
+    return stats
+
+
+def merge_statistics(total, part):
+    """Merge one partial result into another, in place; the order only affects rounding."""
+    for name, value in part.items():
+        total[name].merge(value)
+    return total
+
+
+def streaming_statistics(store, block_rows=None):
+    """One pass over the store for STEPS 2-4 (see new_statistics for the layout)."""
+    stats = new_statistics()
+    for _, _, X in store.blocks(stat_variables, block_rows):
+        update_statistics(stats, X)
+    return stats
+
+
+def descriptives_table(stats):
+    """Table 1 layout: variable_name, N, mean, sd, min, max, alpha."""
+    summary = stats["summary"]
+    rows = []
+    for j, name in enumerate(scale_items):
+        cov = stats[f"alpha_{name}"].cov()
+        k = cov.shape[0]
+        rows.append({
+            "variable_name": name,
+            "N": int(summary.n[j]),
+            "mean": summary.mean[j],
+            "sd": np.sqrt(summary.M2[j] / (summary.n[j] - 1)),
+            "min": summary.minimum[j],
+            "max": summary.maximum[j],
+            "alpha": k / (k - 1) * (1 - np.trace(cov) / cov.sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def correlation_table(stats):
+    cov = stats["correlations"].cov()
+    sd = np.sqrt(np.diag(cov))
+    return pd.DataFrame(cov / np.outer(sd, sd), index=corr_vars, columns=corr_vars)
+
+
+def ols_from_moments(moments, variables, outcome, predictors):
+    """
+    OLS with intercept from centred moments of the complete-case rows.
+
+    Slopes solve M2_xx b = M2_xy; the intercept and its SE are recovered from
+    the means, so no uncentred sums (and no cancellation) are involved.
+    Predictors that are constant in the sample (e.g. grade within one shard)
+    are dropped. When there are no residual degrees of freedom or the
+    predictors are collinear (e.g. a tiny shard), every estimate is NaN and
+    "note" says why.
+    """
+    n = moments.n
+    predictors = [p for p in predictors
+                  if moments.M2[variables.index(p), variables.index(p)] > 1e-12 * max(n, 1)]
+    xi = [variables.index(p) for p in predictors]
+    yi = variables.index(outcome)
+    Sxx = moments.M2[np.ix_(xi, xi)]
+    Sxy = moments.M2[xi, yi]
+    Syy = moments.M2[yi, yi]
+    p = len(xi) + 1
+    terms = ["Intercept"] + list(predictors)
+    note = ""
+    if n <= p:
+        note = f"N = {int(n)} does not exceed the {p} parameters"
+    elif xi:
+        sd = np.sqrt(np.diag(Sxx))
+        if np.linalg.cond(Sxx / np.outer(sd, sd)) > MAX_CONDITION:
+            note = "collinear predictors"
+    if note:
+        empty = np.full(p, np.nan)
+        return {"N": int(n), "R2": np.nan, "terms": terms, "B": empty, "SE": empty, "t": empty, "p": empty,
+                "note": note}
+    Sxx_inv = np.linalg.inv(Sxx)
+    slopes = Sxx_inv @ Sxy
+    mx = moments.mean[xi]
+    intercept = moments.mean[yi] - mx @ slopes
+    sse = Syy - slopes @ Sxy
+    s2 = sse / (n - p)
+    se_slopes = np.sqrt(s2 * np.diag(Sxx_inv))
+    se_intercept = np.sqrt(s2 * (1 / n + mx @ Sxx_inv @ mx))
+    B = np.concatenate([[intercept], slopes])
+    SE = np.concatenate([[se_intercept], se_slopes])
+    t = B / SE
+    return {
+        "N": int(n),
+        "R2": 1 - sse / Syy,
+        "terms": terms,
+        "B": B, "SE": SE, "t": t, "p": 2 * t_dist.sf(np.abs(t), n - p),
+        "note": note,
+    }
+
+
+def regression_table(stats):
+    """Long table of every Model A-C coefficient."""
+    rows = []
+    for key, spec in model_specs.items():
+        fit = ols_from_moments(stats["regression"], reg_vars, spec["outcome_name"], spec["terms"][1:])
+        for i, term in enumerate(fit["terms"]):
+            rows.append({"model": spec["model_name"], "outcome": spec["outcome_name"], "term": term,
+                         "B": fit["B"][i], "SE": fit["SE"][i], "t": fit["t"][i], "p": fit["p"][i],
+                         "N": fit["N"], "R2": fit["R2"], "note": fit["note"]})
+    return pd.DataFrame(rows)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unavailable)."""
+    if not HAS_RESOURCE:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    conv = sub.add_parser("convert", help="Stream a CSV export into the column store")
+    conv.add_argument("--data", default="v4_data.csv")
+    conv.add_argument("--chunk-rows", type=int, default=CONVERT_CHUNK_ROWS)
+
+    analyze = sub.add_parser("analyze", help="Score composites and run STEPS 2-4 block by block")
+    analyze.add_argument("--block-rows", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("OUT-OF-CORE COLUMN STORE")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    if args.command == "convert":
+        schema = convert(args.data, args.store, args.chunk_rows)
+        bad = sum(spec.get("out_of_range", 0) for spec in schema["columns"].values())
+        print(f"✓ Converted {schema['n_rows']} rows x {len(schema['columns'])} columns "
+              f"into {args.store} ({bad} out-of-range item values stored as missing)")
+    else:
+        store = ColumnStore(args.store)
+        score_store(store, args.block_rows)
+        print(f"✓ Scored composites for {store.n_rows} rows")
+        stats = streaming_statistics(store, args.block_rows)
+
+        table1 = descriptives_table(stats)
+        corr = correlation_table(stats)
+        reg = regression_table(stats)
+        print("\nTable 1:")
+        print(table1.round(3).to_string(index=False))
+        print("\nCorrelations:")
+        print(corr.round(3))
+        key = reg[reg["term"].isin(["AI_USE_SCORE", INTERACTION_TERM])]
+        print("\nKey coefficients:")
+        print(key[["model", "term", "B", "SE", "p", "N", "R2"]].round(4).to_string(index=False))
+
+        os.makedirs("tables", exist_ok=True)
+        table1.to_csv("tables/column_store_descriptives.csv", index=False)
+        print("\n✓ Exported: tables/column_store_descriptives.csv")
+        corr.to_csv("tables/column_store_correlations.csv")
+        print("✓ Exported: tables/column_store_correlations.csv")
+        reg.to_csv("tables/column_store_regression.csv", index=False)
+        print("✓ Exported: tables/column_store_regression.csv")
+
+    rss = peak_rss_mb()
+    print(f"\n{args.command} took {time.perf_counter() - start:.1f}s"
+          + (f", peak RSS {rss:.0f} MB" if rss is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Repeated k-fold cross-validation and regularization paths for the STEP 4 models.
+
+Reports out-of-sample R² and RMSE next to the in-sample R² for:
+  - Models A, B and C as specified in final_analysis_v4.py (OLS)
+  - "+ items" extensions of Models A and B that replace AI_USE_SCORE with
+    every Likert item not used to build the outcome composite
+each fitted by OLS, ridge and lasso. Folds are spread over worker
+processes. The ridge path comes from one SVD of the training design (all
+penalties at once); the lasso path is covariance-update coordinate descent,
+warm-started from the previous penalty on a descending grid.
+
+Each training fold builds its own penalty grid (lambda_max of that fold
+times a fixed ratio sequence), so held-out cases never shape the grid; folds
+are aligned by grid position, and the reported lambda is the full-sample
+lambda_max times the chosen ratio. The penalty is picked by the same CV, so
+ridge/lasso R² is mildly optimistic.
+
+Usage:
+    python scripts/cross_validation.py [--data v4_data.csv] [--folds 5] [--repeats 20] [--n-jobs 4]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from survey_data import (
+    load_analysis_frame, build_design, model_specs, covariates, likert_items,
+    creativity_general_items, authorship_core_items,
+)
+from parallel import parallel_map
+
+N_LAMBDAS = 30
+LAMBDA_MIN_RATIO = 1e-3
+
+
+def _extended_items(outcome_items):
+    raw = {item.replace("_REV", "") for item in outcome_items}
+    return [item for item in likert_items if item not in raw]
+
+
+cv_specs = {
+    "Model A": {"outcome_name": "CREATIVITY_GENERAL", "model_key": "model_a"},
+    "Model B": {"outcome_name": "AUTHORSHIP_SCORE", "model_key": "model_b"},
+    "Model C": {"outcome_name": "AUTHORSHIP_SCORE", "model_key": "model_c"},
+    "Model A + items": {
+        "outcome_name": "CREATIVITY_GENERAL",
+        "predictors": covariates + _extended_items(creativity_general_items),
+    },
+    "Model B + items": {
+        "outcome_name": "AUTHORSHIP_SCORE",
+        "predictors": covariates + _extended_items(authorship_core_items),
+    },
+}
+
+
+def spec_design(data, spec):
+    """Design matrix without the intercept column, outcome and term names for a CV spec."""
+    if "model_key" in spec:
+        X, y, terms = build_design(data, spec["model_key"])
+        return X[:, 1:], y, terms[1:]
+    X = data[spec["predictors"]].to_numpy(dtype=float)
+    y = data[spec["outcome_name"]].to_numpy(dtype=float)
+    return X, y, list(spec["predictors"])
+
+
+def cv_sample(adf, specs=None):
+    """Common listwise-deleted sample so every specification is scored on the same cases."""
+    specs = specs or cv_specs
+    columns = set()
+    for spec in specs.values():
+        columns.add(spec["outcome_name"])
+        if "model_key" in spec:
+            columns.update(t for t in model_specs[spec["model_key"]]["terms"] if t != "Intercept" and ":" not in t)
+        else:
+            columns.update(spec["predictors"])
+    return adf[sorted(columns)].dropna()
+
+
+def lambda_ratios(n_lambdas=N_LAMBDAS, min_ratio=LAMBDA_MIN_RATIO):
+    """Descending lambda / lambda_max sequence shared by every fold."""
+    return np.logspace(0, np.log10(min_ratio), n_lambdas)
+
+
+def lambda_grid(X, y, ratios=None):
+    """Descending penalty grid starting at the smallest lasso penalty that zeroes every coefficient."""
+    ratios = lambda_ratios() if ratios is None else ratios
+    sd = X.std(axis=0)
+    sd[sd == 0] = 1.0
+    Xs = (X - X.mean(axis=0)) / sd
+    lam_max = np.abs(Xs.T @ (y - y.mean())).max() / len(y)
+    return lam_max * ratios
+
+
+def ridge_path(X, y, lambdas):
+    """
+    Ridge coefficients for every penalty from a single SVD.
+
+    Minimizes (1/2n)||y - Xb||² + (lambda/2)||b||² on the given (already
+    standardized, centered) data; returns a (p, L) coefficient matrix.
+    """
+    n = X.shape[0]
+    U, s, Vt = np.linalg.svd(X, full_matrices=False)
+    Uy = U.T @ y
+    shrink = s[:, None] / (s[:, None] ** 2 + n * np.asarray(lambdas)[None, :])
+    return Vt.T @ (shrink * Uy[:, None])
+
+
+def lasso_path(X, y, lambdas, max_sweeps=1000, tol=1e-7):
+    """
+    Lasso coefficients along a descending penalty grid with warm starts.
+
+    Covariance-update coordinate descent on the Gram matrix, minimizing
+    (1/2n)||y - Xb||² + lambda ||b||_1; returns a (p, L) coefficient matrix.
+    """
+    n, p = X.shape
+    gram = X.T @ X / n
+    xty = X.T @ y / n
+    diag = np.diag(gram)
+    beta = np.zeros(p)
+    path = np.zeros((p, len(lambdas)))
+    for k, lam in enumerate(lambdas):
+        for _ in range(max_sweeps):
+            max_change = 0.0
+            for j in range(p):
+                rho = xty[j] - gram[j] @ beta + diag[j] * beta[j]
+                new = np.sign(rho) * max(abs(rho) - lam, 0.0) / diag[j]
+                max_change = max(max_change, abs(new - beta[j]))
+                beta[j] = new
+            if max_change < tol:
+                break
+        path[:, k] = beta
+    return path
+
+
+_WORKER = {}
+
+
+def _init_worker(designs, ratios):
+    _WORKER["designs"] = designs
+    _WORKER["ratios"] = ratios
+
+
+def _fit_fold(task):
+    """Fit every spec on one training fold and predict its held-out cases."""
+    repeat, fold, fold_ids = task
+    test = fold_ids == fold
+    train = ~test
+    out = {"repeat": repeat, "test": np.flatnonzero(test), "pred": {}}
+    for name, (X, y) in _WORKER["designs"].items():
+        Xtr, ytr, Xte = X[train], y[train], X[test]
+        mean, sd = Xtr.mean(axis=0), Xtr.std(axis=0)
+        sd[sd == 0] = 1.0
+        Ztr, Zte = (Xtr - mean) / sd, (Xte - mean) / sd
+        y_mean = ytr.mean()
+        yc = ytr - y_mean
+
+        ols = np.linalg.lstsq(Ztr, yc, rcond=None)[0]
+        # Grid from the training fold only
+        lambdas = lambda_grid(Xtr, ytr, _WORKER["ratios"])
+        out["pred"][name] = {
+            "OLS": y_mean + Zte @ ols,
+            "ridge": y_mean + Zte @ ridge_path(Ztr, yc, lambdas),
+            "lasso": y_mean + Zte @ lasso_path(Ztr, yc, lambdas),
+        }
+    return out
+
+
+def _fold_assignments(n, folds, repeats, seed):
+    rng = np.random.default_rng(seed)
+    base = np.arange(n) % folds
+    return [rng.permutation(base) for _ in range(repeats)]
+
+
+def _scores(y, pred):
+    resid = y[:, None] - pred.reshape(len(y), -1)
+    sse = (resid ** 2).sum(axis=0)
+    return 1 - sse / ((y - y.mean()) ** 2).sum(), np.sqrt(sse / len(y))
+
+
+def cross_validate(data, specs=None, folds=5, repeats=20, seed=42, n_jobs=None):
+    """
+    Repeated k-fold CV of every spec with OLS, ridge and lasso.
+
+    Returns:
+    --------
+    tuple : (summary DataFrame, regularization-path DataFrame)
+    """
+    specs = specs or cv_specs
+    designs = {}
+    lambdas = {}
+    ratios = lambda_ratios()
+    for name, spec in specs.items():
+        X, y, _ = spec_design(data, spec)
+        designs[name] = (X, y)
+        # Full-sample grid, used only to report the chosen penalty on the data scale
+        lambdas[name] = lambda_grid(X, y, ratios)
+
+    n = len(data)
+    assignments = _fold_assignments(n, folds, repeats, seed)
+    tasks = [(r, f, ids) for r, ids in enumerate(assignments) for f in range(folds)]
+    results = parallel_map(_fit_fold, tasks, n_jobs=n_jobs,
+                           initializer=_init_worker, initargs=(designs, ratios))
+
+    # Stitch the out-of-fold predictions back together per repeat
+    oof = {name: {m: np.zeros((repeats, n, 1 if m == "OLS" else len(lambdas[name])))
+                  for m in ("OLS", "ridge", "lasso")} for name in specs}
+    for res in results:
+        for name, preds in res["pred"].items():
+            for method, pred in preds.items():
+                oof[name][method][res["repeat"], res["test"]] = pred.reshape(len(res["test"]), -1)
+
+    summary = []
+    paths = []
+    for name, spec in specs.items():
+        X, y = designs[name]
+        Xc = np.column_stack([np.ones(n), X])
+        fitted = Xc @ np.linalg.lstsq(Xc, y, rcond=None)[0]
+        r2_in = 1 - ((y - fitted) ** 2).sum() / ((y - y.mean()) ** 2).sum()
+        for method in ("OLS", "ridge", "lasso"):
+            scores = [_scores(y, oof[name][method][r]) for r in range(repeats)]
+            r2 = np.array([s[0] for s in scores])
+            rmse = np.array([s[1] for s in scores])
+            best = int(np.argmax(r2.mean(axis=0)))
+            if method != "OLS":
+                for k, lam in enumerate(lambdas[name]):
+                    paths.append({"specification": name, "method": method, "lambda": lam,
+                                  "lambda_ratio": ratios[k],
+                                  "R2_cv": r2[:, k].mean(), "RMSE_cv": rmse[:, k].mean()})
+            summary.append({
+                "specification": name,
+                "Outcome": spec["outcome_name"],
+                "method": method,
+                "N": n,
+                "n_predictors": X.shape[1],
+                "lambda": lambdas[name][best] if method != "OLS" else np.nan,
+                "lambda_ratio": ratios[best] if method != "OLS" else np.nan,
+                "R2_in_sample": r2_in,
+                "R2_cv": r2[:, best].mean(),
+                "R2_cv_sd": r2[:, best].std(ddof=1) if repeats > 1 else np.nan,
+                "RMSE_cv": rmse[:, best].mean(),
+                "RMSE_cv_sd": rmse[:, best].std(ddof=1) if repeats > 1 else np.nan,
+                "R2_optimism": r2_in - r2[:, best].mean(),
+            })
+    return pd.DataFrame(summary), pd.DataFrame(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print(f"CROSS-VALIDATION ({args.repeats} x {args.folds}-fold)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    data = cv_sample(adf)
+    print(f"CV sample size (listwise deletion): N = {len(data)}")
+
+    summary, paths = cross_validate(data, folds=args.folds, repeats=args.repeats,
+                                    seed=args.seed, n_jobs=args.n_jobs)
+    print()
+    print(summary[["specification", "method", "n_predictors", "R2_in_sample", "R2_cv", "RMSE_cv"]]
+          .round(3).to_string(index=False))
+
+    os.makedirs("tables", exist_ok=True)
+    summary.to_csv("tables/table3_cv_summary.csv", index=False)
+    print("\n✓ Exported: tables/table3_cv_summary.csv")
+    paths.to_csv("tables/cv_regularization_path.csv", index=False)
+    print("✓ Exported: tables/cv_regularization_path.csv")
+
+
+if __name__ == "__main__":
+    main()
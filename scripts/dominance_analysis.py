@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Dominance analysis (relative importance) of the Model A and B predictors.
+
+For k predictors every one of the 2^k subsets is fitted, and the R² values
+give (Budescu, 1993; Azen & Budescu, 2003):
+  - conditional dominance: the average R² increment of a predictor when it
+    is added to subsets of each size 0 .. k-1
+  - general dominance: the mean of the conditional values, which is the
+    Shapley value of R²; the k values sum to the full-model R²
+  - complete dominance: X_i dominates X_j when adding X_i raises R² more
+    than adding X_j for every subset containing neither (1 = dominates,
+    0 = dominated, 0.5 = undetermined)
+
+No regression is refitted. The predictor and outcome correlation matrix is
+formed once, and the R² of subset s is r_s' R_ss^-1 r_s. The subsets of
+each size are gathered into one stack and solved with a single batched
+np.linalg.solve for all outcomes. The same call takes a stack of
+correlation matrices, so a block of bootstrap replicates is solved
+together. Percentile CIs of the general dominance values and shares, and
+the share of replicates that reproduce each complete-dominance
+designation, come from blocks of replicates spread over worker processes.
+--predictors accepts any numeric columns, e.g. individual items (k = 15
+means 32,768 subsets per replicate).
+
+Usage:
+    python scripts/dominance_analysis.py [--data v4_data.csv] [--n-boot 1000] [--n-jobs 4]
+"""
+
+import argparse
+import os
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from survey_data import load_analysis_frame, model_predictors
+from parallel import parallel_map
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    HAS_PLOTTING = True
+except ImportError:
+    HAS_PLOTTING = False
+
+outcomes = ["CREATIVITY_GENERAL", "AUTHORSHIP_SCORE"]
+# Largest stack of subset systems solved in one call (bounds memory for large k)
+MAX_STACK = 2 ** 16
+BOOT_BLOCK = 100
+
+
+def subset_masks(k):
+    """Subset bitmasks 0 .. 2^k - 1 and their sizes."""
+    masks = np.arange(2 ** k)
+    sizes = ((masks[:, None] >> np.arange(k)) & 1).sum(axis=1)
+    return masks, sizes
+
+
+def all_subset_r2(R, k):
+    """
+    R² of every predictor subset for every outcome.
+
+    Parameters:
+    -----------
+    R : array (..., k + m, k + m)
+        Correlation matrices with the k predictors first and m outcomes last
+    k : int
+        Number of predictors
+
+    Returns:
+    --------
+    array (..., 2^k, m) : R² indexed by subset bitmask (bit i = predictor i)
+    """
+    R = np.asarray(R, dtype=float)
+    batch, m = R.shape[:-2], R.shape[-1] - k
+    Rxx, rxy = R[..., :k, :k], R[..., :k, k:]
+    masks, sizes = subset_masks(k)
+    bits = (masks[:, None] >> np.arange(k)) & 1
+    r2 = np.zeros(batch + (2 ** k, m))
+    for size in range(1, k + 1):
+        members = masks[sizes == size]
+        index = np.nonzero(bits[members])[1].reshape(len(members), size)
+        step = max(1, MAX_STACK // max(1, int(np.prod(batch, dtype=int))))
+        for start in range(0, len(members), step):
+            idx = index[start:start + step]
+            sub = Rxx[..., idx[:, :, None], idx[:, None, :]]
+            r = rxy[..., idx, :]
+            beta = np.linalg.solve(sub, r)
+            r2[..., members[start:start + step], :] = (r * beta).sum(axis=-2)
+    return r2
+
+
+def _fix_bits(cube, k, n_batch, bits):
+    """View of the R² cube with predictor i's bit fixed to bits[i] (i -> 0/1)."""
+    index = [slice(None)] * cube.ndim
+    for i, value in bits.items():
+        index[n_batch + k - 1 - i] = value
+    return cube[tuple(index)]
+
+
+def dominance_statistics(r2, k):
+    """
+    Conditional, general and complete dominance from all-subset R².
+
+    The R² array is viewed as a (2,) * k cube over the predictor bits, so
+    "subsets without X_i, with X_i added" is a strided view, not a gather.
+
+    Returns:
+    --------
+    dict : conditional (..., k, k sizes, m), general (..., k, m),
+           complete (..., k, k, m), total (..., m)
+    """
+    batch, m = r2.shape[:-2], r2.shape[-1]
+    n_batch = len(batch)
+    cube = r2.reshape(batch + (2,) * k + (m,))
+    # Remaining k - 1 bits keep mask order, so one averaging matrix serves every predictor
+    _, sizes = subset_masks(k - 1)
+    average = (sizes[None, :] == np.arange(k)[:, None]) / np.bincount(sizes, minlength=k)[:, None]
+
+    conditional = []
+    for i in range(k):
+        gain = _fix_bits(cube, k, n_batch, {i: 1}) - _fix_bits(cube, k, n_batch, {i: 0})
+        conditional.append(np.einsum("js,...sm->...jm", average, gain.reshape(batch + (-1, m))))
+    conditional = np.stack(conditional, axis=-3)
+
+    complete = np.full(batch + (k, k, m), np.nan)
+    for i, j in combinations(range(k), 2):
+        diff = _fix_bits(cube, k, n_batch, {i: 1, j: 0}) - _fix_bits(cube, k, n_batch, {i: 0, j: 1})
+        diff = diff.reshape(batch + (-1, m))
+        value = np.where(diff.min(axis=-2) > 0, 1.0, np.where(diff.max(axis=-2) < 0, 0.0, 0.5))
+        complete[..., i, j, :] = value
+        complete[..., j, i, :] = 1 - value
+    return {"conditional": conditional, "general": conditional.mean(axis=-2),
+            "complete": complete, "total": r2[..., -1, :]}
+
+
+_WORKER = {}
+
+
+def _init_worker(X, k):
+    _WORKER["X"] = X
+    _WORKER["k"] = k
+
+
+def _boot_block(task):
+    """General dominance and complete dominance for one block of resamples."""
+    seed, n_rep = task
+    X, k = _WORKER["X"], _WORKER["k"]
+    n = len(X)
+    rng = np.random.default_rng(seed)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        R = np.stack([np.corrcoef(X[rng.integers(0, n, size=n)], rowvar=False) for _ in range(n_rep)])
+    R = R[np.isfinite(R).all(axis=(1, 2))]
+    stats = dominance_statistics(all_subset_r2(R, k), k)
+    return stats["general"], stats["complete"]
+
+
+def dominance_analysis(data, predictors, outcome_names, n_boot=1000, seed=42, n_jobs=None,
+                       block_size=BOOT_BLOCK):
+    """
+    Dominance analysis with bootstrap CIs.
+
+    Parameters:
+    -----------
+    data : DataFrame
+        Analysis frame; rows missing any predictor or outcome are dropped
+    predictors, outcome_names : list of str
+    n_boot : int
+        Bootstrap resamples (0 = none), in blocks of block_size per task
+
+    Returns:
+    --------
+    dict : general, conditional, complete DataFrames, N, n_boot (usable resamples)
+    """
+    sample = data[list(predictors) + list(outcome_names)].dropna()
+    X = sample.to_numpy(dtype=float)
+    k = len(predictors)
+    stats = dominance_statistics(all_subset_r2(np.corrcoef(X, rowvar=False), k), k)
+
+    boot_general = boot_complete = None
+    if n_boot > 0:
+        rng = np.random.default_rng(seed)
+        sizes = [min(block_size, n_boot - start) for start in range(0, n_boot, block_size)]
+        tasks = [(int(s), size) for s, size in zip(rng.integers(0, 2 ** 31 - 1, size=len(sizes)), sizes)]
+        blocks = parallel_map(_boot_block, tasks, n_jobs=n_jobs,
+                              initializer=_init_worker, initargs=(X, k))
+        boot_general = np.concatenate([b[0] for b in blocks])
+        boot_complete = np.concatenate([b[1] for b in blocks])
+
+    general, conditional, complete = [], [], []
+    for o, outcome in enumerate(outcome_names):
+        total = stats["total"][o]
+        values = stats["general"][:, o]
+        ranks = pd.Series(-values).rank(method="min").astype(int).to_numpy()
+        for i, predictor in enumerate(predictors):
+            row = {"outcome": outcome, "predictor": predictor, "general_dominance": values[i],
+                   "share": values[i] / total, "rank": ranks[i], "model_R2": total}
+            if boot_general is not None:
+                g = boot_general[:, i, o]
+                share = g / boot_general[:, :, o].sum(axis=1)
+                row.update({"ci_lower": np.quantile(g, 0.025), "ci_upper": np.quantile(g, 0.975),
+                            "share_ci_lower": np.quantile(share, 0.025),
+                            "share_ci_upper": np.quantile(share, 0.975)})
+            general.append(row)
+            conditional.append({"outcome": outcome, "predictor": predictor,
+                                **{f"size_{j}": stats["conditional"][i, j, o] for j in range(k)}})
+        for i, j in combinations(range(k), 2):
+            value = stats["complete"][i, j, o]
+            row = {"outcome": outcome, "predictor_i": predictors[i], "predictor_j": predictors[j],
+                   "complete": value,
+                   "designation": {1.0: "i dominates j", 0.0: "j dominates i"}.get(value, "undetermined")}
+            if boot_complete is not None:
+                row["reproducibility"] = (boot_complete[:, i, j, o] == value).mean()
+            complete.append(row)
+    return {"general": pd.DataFrame(general), "conditional": pd.DataFrame(conditional),
+            "complete": pd.DataFrame(complete), "N": len(sample),
+            "n_boot": 0 if boot_general is None else len(boot_general)}
+
+
+def plot_general_dominance(general, path):
+    """General dominance (share of R²) per predictor and outcome, with bootstrap CIs."""
+    outcome_names = list(dict.fromkeys(general["outcome"]))
+    fig, axes = plt.subplots(1, len(outcome_names), figsize=(7 * len(outcome_names), 5), squeeze=False)
+    for ax, outcome in zip(axes[0], outcome_names):
+        part = general[general["outcome"] == outcome].sort_values("share")
+        y = np.arange(len(part))
+        xerr = None
+        if "share_ci_lower" in part:
+            xerr = [part["share"] - part["share_ci_lower"], part["share_ci_upper"] - part["share"]]
+        ax.barh(y, part["share"], xerr=xerr, color="steelblue", edgecolor="black", capsize=3)
+        ax.set_yticks(y)
+        ax.set_yticklabels(part["predictor"])
+        ax.set_xlabel("Share of R² (general dominance)")
+        ax.set_title(f"{outcome} (R² = {part['model_R2'].iloc[0]:.3f})")
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches="tight")
+    plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--predictors", nargs="+", default=model_predictors)
+    parser.add_argument("--outcomes", nargs="+", default=outcomes)
+    parser.add_argument("--n-boot", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("DOMINANCE ANALYSIS (ALL-SUBSETS R²)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    result = dominance_analysis(adf, args.predictors, args.outcomes, args.n_boot, args.seed, args.n_jobs)
+    print(f"✓ N = {result['N']} (listwise), {len(args.predictors)} predictors, "
+          f"{2 ** len(args.predictors)} subsets; {result['n_boot']} bootstrap resamples")
+
+    general = result["general"]
+    for outcome in args.outcomes:
+        part = general[general["outcome"] == outcome].sort_values("rank")
+        print(f"\n{outcome} (R² = {part['model_R2'].iloc[0]:.4f}):")
+        columns = ["predictor", "general_dominance", "share", "rank"]
+        columns += [c for c in ("ci_lower", "ci_upper") if c in part]
+        print(part[columns].round(4).to_string(index=False))
+
+    complete = result["complete"]
+    focal = complete[(complete["predictor_i"] == args.predictors[0])]
+    print(f"\nComplete dominance of {args.predictors[0]}:")
+    columns = ["outcome", "predictor_j", "designation"] + [c for c in ("reproducibility",) if c in focal]
+    print(focal[columns].round(3).to_string(index=False))
+
+    os.makedirs("tables", exist_ok=True)
+    general.to_csv("tables/dominance_general.csv", index=False)
+    result["conditional"].to_csv("tables/dominance_conditional.csv", index=False)
+    complete.to_csv("tables/dominance_complete.csv", index=False)
+    print("\n✓ Exported: tables/dominance_general.csv")
+    print("✓ Exported: tables/dominance_conditional.csv")
+    print("✓ Exported: tables/dominance_complete.csv")
+
+    if HAS_PLOTTING:
+        os.makedirs("figures", exist_ok=True)
+        plot_general_dominance(general, "figures/dominance_general.png")
+        print("✓ Exported: figures/dominance_general.png")
+    else:
+        print("⚠ Figure skipped (matplotlib not available)")
+
+
+if __name__ == "__main__":
+    main()
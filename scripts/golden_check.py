@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Golden-output regression harness for the analysis code paths.
+
+Every code path that reproduces STEPS 1-5 is re-run on v4_data.csv:
+  api           analysis_api step functions (STEPS 1-5 and the robust block)
+  column_store  convert + block-wise scoring and statistics (float32 store)
+  sharded       map-reduce over one shard
+  watch         ExportTail + RunningStatistics (incremental refresh)
+  query         query_service correlate / regress handlers
+Each path's outputs are flattened to the metric rows of results_store
+((table, entity, term, statistic) -> value) and compared with
+tables/*.csv, tables/regression_results.json and
+archive/v4_analysis_results.json as committed at --golden-ref (HEAD by
+default, read with git show), so outputs rewritten in the working tree
+cannot move the goldens. Every golden statistic of the tables a path covers
+must be reproduced within that path's tolerance, and a covered table with
+no golden statistics at all is a failure.
+
+The reference scripts (final_analysis_v4.py, analyze_v4_data.py) are the
+source of the goldens and are not re-run here; the check covers only the
+code paths above.
+
+Each stage is timed on the export repeated --scale times (so costs that
+grow with N show up; minimum over --repeat runs) and its peak traced
+allocation (tracemalloc, numpy buffers included; memory maps are not) is
+measured in one extra run. Both are compared with the stored baseline
+(scripts/golden_baseline.json); a stage is flagged when it is more than
+--max-slowdown slower (and at least --min-seconds in absolute terms) or
+uses more than --max-memory-growth extra memory. Re-record the baseline
+with --update-baseline after an intended change or on new hardware.
+
+The exit status is 1 on any drift, so the check can gate CI. Flagged stages
+are only reported unless --check-perf is given: timings on shared runners
+are too noisy to fail a correctness check on.
+
+Usage:
+    python scripts/golden_check.py [--data v4_data.csv] [--paths api sharded] [--repeat 5] [--golden-ref HEAD]
+    python scripts/golden_check.py --check-perf
+    python scripts/golden_check.py --update-baseline
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from survey_data import load_analysis_frame, corr_vars, model_specs, INTERACTION_TERM
+from results_store import output_rows, frame_rows, matrix_rows, document_rows, step6_tables
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_baseline.json")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_FILE = os.path.join("results", "golden_check.json")
+
+TABLE1 = "table1_descriptives_reliability"
+TABLE2 = "table2_correlation_matrix"
+TABLE3 = "table3_regression_summary"
+TABLE4 = "table4_cluster_profiles"
+REGRESSION = "regression_results"
+# HC0-HC3 / M-estimation block inside regression_results.json, covered separately
+ROBUST = "regression_results.robust"
+V4_SUMMARY = "v4_analysis_results"
+
+
+# ----------------------------------------------------------------------------
+# Timing and memory per stage
+# ----------------------------------------------------------------------------
+
+class StageClock:
+    """Seconds and (when tracing) peak extra traced MB of each named stage."""
+
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.seconds = {}
+        self.peak_mb = {}
+
+    @contextmanager
+    def __call__(self, stage):
+        if self.trace:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        yield
+        self.seconds[stage] = time.perf_counter() - start
+        if self.trace:
+            _, peak = tracemalloc.get_traced_memory()
+            self.peak_mb[stage] = (peak - before) / 2 ** 20
+
+
+# ----------------------------------------------------------------------------
+# Output layouts shared by the paths
+# ----------------------------------------------------------------------------
+
+def model_entry(key, N, R2, coefficients):
+    """
+    One model in the regression_results.json layout.
+
+    Parameters:
+    -----------
+    key : str
+        model_a, model_b or model_c
+    N, R2 : sample size and R-squared
+    coefficients : dict
+        term -> (B, SE, p)
+    """
+    spec = model_specs[key]
+    entry = {"model_name": spec["model_name"], "outcome_name": spec["outcome_name"], "N": int(N), "R2": R2}
+    if INTERACTION_TERM in spec["terms"]:
+        B, SE, p = coefficients[INTERACTION_TERM]
+        entry.update({"interaction_B": B, "interaction_SE": SE, "interaction_p": p})
+    else:
+        B, SE, p = coefficients["AI_USE_SCORE"]
+        entry.update({"AI_USE_SCORE_B": B, "AI_USE_SCORE_SE": SE, "AI_USE_SCORE_p": p})
+    return entry
+
+
+def results_from_long(reg):
+    """regression_results layout from a long coefficient table (column_store.regression_table)."""
+    out = {}
+    for key, spec in model_specs.items():
+        rows = reg[reg["model"] == spec["model_name"]].set_index("term")
+        first = rows.iloc[0]
+        coefficients = {term: (r["B"], r["SE"], r["p"]) for term, r in rows.iterrows()}
+        out[key] = model_entry(key, first["N"], first["R2"], coefficients)
+    return out
+
+
+def table3_from_results(results):
+    """Table 3 layout from the regression_results layout."""
+    return pd.DataFrame([{"Model": m["model_name"], "Outcome": m["outcome_name"], "N": m["N"], "R2": m["R2"],
+                          "AI_USE_B": m["AI_USE_SCORE_B"], "AI_USE_SE": m["AI_USE_SCORE_SE"],
+                          "AI_USE_p": m["AI_USE_SCORE_p"]}
+                         for key, m in results.items() if key in ("model_a", "model_b")])
+
+
+def summary_rows(table1=None, table2=None, results=None, table4=None, v4_summary=None):
+    """Metric rows (results_store layout) for whichever outputs a path produced."""
+    rows = []
+    if table1 is not None:
+        rows += frame_rows(TABLE1, table1, "variable_name")
+    if table2 is not None:
+        rows += matrix_rows(TABLE2, table2)
+    if results is not None:
+        rows += frame_rows(TABLE3, table3_from_results(results), "Model")
+        rows += document_rows(REGRESSION, results)
+    if table4 is not None:
+        rows += frame_rows(TABLE4, table4, "cluster")
+    if v4_summary is not None:
+        rows += document_rows(V4_SUMMARY, v4_summary)
+    return rows
+
+
+# ----------------------------------------------------------------------------
+# Code paths
+# ----------------------------------------------------------------------------
+
+def api_path(data, clock, workdir):
+    import analysis_api as api
+    from survey_data import regression_data
+
+    config = api.AnalysisConfig()
+    with clock("step1_load"):
+        adf = api.prepare_frame(data)
+    with clock("step2_descriptives"):
+        desc = api.descriptives(adf)
+    with clock("step3_correlations"):
+        corr_matrix, corr_n, key = api.correlations(adf)
+    with clock("step4_regression"):
+        reg_data = regression_data(adf)
+        models = {m: api.fit_model(reg_data, m) for m in config.models}
+    with clock("step4_robust"):
+        for m, entry in api.robust_entries(reg_data, tuple(models)).items():
+            models[m].robust = entry
+    with clock("step5_clustering"):
+        clusters = api.cluster_profiles(adf, config)
+    result = api.AnalysisResult(data, len(adf), desc, corr_matrix, corr_n, key, models, clusters, config)
+    return summary_rows(result.table1(), result.correlation_matrix, result.regression_results(),
+                        result.clusters, result.v4_summary())
+
+
+def column_store_path(data, clock, workdir):
+    import column_store as cs
+
+    store_dir = os.path.join(workdir, "column_store")
+    with clock("convert"):
+        cs.convert(data, store_dir)
+    with clock("score"):
+        store = cs.ColumnStore(store_dir)
+        cs.score_store(store)
+    with clock("statistics"):
+        stats = cs.streaming_statistics(store)
+        table1 = cs.descriptives_table(stats)
+        corr = cs.correlation_table(stats)
+        reg = cs.regression_table(stats)
+    return summary_rows(table1, corr, results_from_long(reg))
+
+
+def sharded_path(data, clock, workdir):
+    from sharded_analysis import run_shards
+    from column_store import descriptives_table, correlation_table, regression_table
+
+    with clock("map_reduce"):
+        total, shards = run_shards([data], n_jobs=1)
+    errors = [s["error"] for s in shards if "error" in s]
+    if errors:
+        raise RuntimeError(f"shard failed: {errors[0]}")
+    with clock("tables"):
+        table1 = descriptives_table(total)
+        corr = correlation_table(total)
+        reg = regression_table(total)
+    return summary_rows(table1, corr, results_from_long(reg))
+
+
+def watch_path(data, clock, workdir):
+    from watch_export import ExportTail, RunningStatistics
+
+    with clock("tail_read"):
+        frames, _ = ExportTail(data).read_new(final=True)
+    with clock("update"):
+        stats = RunningStatistics()
+        for adf in frames:
+            stats.update(adf)
+    with clock("tables"):
+        table1 = stats.table1()
+        corr = stats.correlation_matrix()
+        results = stats.regression_results()
+    return summary_rows(table1, corr, results)
+
+
+def query_path(data, clock, workdir):
+    import query_service as qs
+
+    with clock("load"):
+        adf = load_analysis_frame(data)
+        columns = set(adf.columns)
+    with clock("correlate"):
+        request = qs.normalize_request("correlate", {"variables": corr_vars}, columns)
+        answer = qs.correlate(adf, request)
+        corr = pd.DataFrame(answer["r"], index=answer["variables"], columns=answer["variables"])
+    with clock("regress"):
+        results = {}
+        for key in model_specs:
+            answer = qs.regress(adf, qs.normalize_request("regress", {"model": key}, columns))
+            coefficients = {c["term"]: (c["B"], c["SE"], c["p"]) for c in answer["coefficients"]}
+            results[key] = model_entry(key, answer["N"], answer["R2"], coefficients)
+    return summary_rows(table2=corr, results=results)
+
+
+# Path -> function, golden tables it must reproduce, and tolerance (|a - b| <= atol + rtol * |b|)
+code_paths = {
+    "api": {"run": api_path, "covers": [TABLE1, TABLE2, TABLE3, TABLE4, REGRESSION, ROBUST, V4_SUMMARY],
+            "rtol": 1e-9, "atol": 1e-12},
+    # Composites are stored as float32, so agreement is to single precision
+    "column_store": {"run": column_store_path, "covers": [TABLE1, TABLE2, TABLE3, REGRESSION],
+                     "rtol": 1e-5, "atol": 1e-7},
+    "sharded": {"run": sharded_path, "covers": [TABLE1, TABLE2, TABLE3, REGRESSION],
+                "rtol": 1e-9, "atol": 1e-12},
+    "watch": {"run": watch_path, "covers": [TABLE1, TABLE2, TABLE3, REGRESSION],
+              "rtol": 1e-9, "atol": 1e-12},
+    "query": {"run": query_path, "covers": [TABLE2, TABLE3, REGRESSION],
+              "rtol": 1e-9, "atol": 1e-12},
+}
+
+
+# ----------------------------------------------------------------------------
+# Comparison
+# ----------------------------------------------------------------------------
+
+def frozen_outputs(ref, workdir, tables_dir="tables", json_paths=("archive/v4_analysis_results.json",)):
+    """
+    Write the golden files as committed at a git revision into workdir.
+
+    Paths are relative to the repository root; files missing at ref are
+    skipped (the coverage check then reports their tables).
+
+    Returns:
+    --------
+    tuple : (tables directory, JSON paths) inside workdir
+    """
+    files = [f"{tables_dir}/{name}" for name in list(step6_tables) + ["regression_results.json"]]
+    for path in files + list(json_paths):
+        result = subprocess.run(["git", "-C", REPO_ROOT, "show", f"{ref}:{path}"], capture_output=True)
+        if result.returncode != 0:
+            continue
+        target = os.path.join(workdir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(result.stdout)
+    return os.path.join(workdir, tables_dir), [os.path.join(workdir, path) for path in json_paths]
+
+
+def golden_metrics(tables_dir="tables", json_paths=("archive/v4_analysis_results.json",), ref=None):
+    """
+    (table, entity, term, statistic) -> (value, text) of the golden outputs.
+
+    With ref the files are read as committed at that git revision, otherwise
+    from the working tree.
+    """
+    if ref is None:
+        return {tuple(row[:4]): row[4:] for row in output_rows(tables_dir, list(json_paths))}
+    with tempfile.TemporaryDirectory() as workdir:
+        tables_dir, json_paths = frozen_outputs(ref, workdir, tables_dir, json_paths)
+        return {tuple(row[:4]): row[4:] for row in output_rows(tables_dir, json_paths)}
+
+
+def golden_table(key):
+    """Table a golden metric belongs to for the covers lists (ROBUST is split out)."""
+    if key[0] == REGRESSION and key[2] == "robust":
+        return ROBUST
+    return key[0]
+
+
+def compare_metrics(golden, rows, covers, rtol, atol):
+    """
+    Compare a path's metric rows with the golden metrics of the tables it covers.
+
+    Returns:
+    --------
+    tuple : (number of statistics checked, list of mismatch dicts)
+    """
+    produced = {tuple(row[:4]): row[4:] for row in rows}
+    checked, mismatches = 0, []
+    available = {golden_table(key) for key in golden}
+    for table in covers:
+        if table not in available:
+            mismatches.append({"metric": table, "golden": None, "value": None,
+                               "reason": "no golden statistics"})
+    for key, (value, text) in golden.items():
+        if golden_table(key) not in covers:
+            continue
+        checked += 1
+        metric = "/".join(k for k in key if k)
+        if key not in produced:
+            mismatches.append({"metric": metric, "golden": value if text is None else text,
+                               "value": None, "reason": "not produced"})
+            continue
+        new_value, new_text = produced[key]
+        if text is not None or new_text is not None:
+            ok = text == new_text
+        elif value is None or new_value is None:
+            ok = value is None and new_value is None
+        else:
+            ok = abs(new_value - value) <= atol + rtol * abs(value)
+        if not ok:
+            mismatches.append({"metric": metric, "golden": value if text is None else text,
+                               "value": new_value if new_text is None else new_text, "reason": "drift"})
+    return checked, mismatches
+
+
+def replicate_export(data, scale, path):
+    """Write the export with its rows repeated scale times (for timing at a larger N)."""
+    raw = pd.read_csv(data, index_col=0, dtype=str, keep_default_na=False)
+    big = pd.concat([raw] * scale)
+    big.index = pd.RangeIndex(len(big))
+    big.to_csv(path)
+    return path
+
+
+def run_path(name, data, timing_data, repeat):
+    """
+    Run one code path on data (outputs), then repeat times on timing_data
+    (seconds) and once more under tracemalloc (memory).
+
+    Returns:
+    --------
+    tuple : (metric rows, {stage: min seconds}, {stage: peak MB})
+    """
+    run = code_paths[name]["run"]
+    with tempfile.TemporaryDirectory() as workdir:
+        rows = run(data, StageClock(), workdir)
+    seconds = {}
+    for _ in range(repeat):
+        clock = StageClock()
+        with tempfile.TemporaryDirectory() as workdir:
+            run(timing_data, clock, workdir)
+        for stage, s in clock.seconds.items():
+            seconds[stage] = min(s, seconds.get(stage, np.inf))
+    clock = StageClock(trace=True)
+    tracemalloc.start()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run(timing_data, clock, workdir)
+    finally:
+        tracemalloc.stop()
+    return rows, seconds, clock.peak_mb
+
+
+def check_path(name, golden, data, timing_data, repeat):
+    """
+    Run one path and print its comparison with the golden metrics.
+
+    Returns:
+    --------
+    tuple : (drift entry, {"path/stage": {"seconds", "peak_mb"}})
+    """
+    spec = code_paths[name]
+    rows, seconds, peak_mb = run_path(name, data, timing_data, repeat)
+    checked, mismatches = compare_metrics(golden, rows, spec["covers"], spec["rtol"], spec["atol"])
+    status = "✓" if not mismatches else "✗"
+    missing = [m for m in mismatches if m["reason"] == "no golden statistics"]
+    drifted = [m for m in mismatches if m["reason"] != "no golden statistics"]
+    print(f"\n{status} {name}: {checked - len(drifted)}/{checked} statistics match "
+          f"(rtol={spec['rtol']:g}, atol={spec['atol']:g})")
+    for m in missing:
+        print(f"    {m['metric']}: no golden statistics to compare against")
+    for m in drifted[:10]:
+        print(f"    {m['metric']}: golden {m['golden']!r}, got {m['value']!r} ({m['reason']})")
+    if len(drifted) > 10:
+        print(f"    ... {len(drifted) - 10} more")
+    stages = {f"{name}/{stage}": {"seconds": seconds[stage], "peak_mb": peak_mb[stage]} for stage in seconds}
+    return {"checked": checked, "mismatches": mismatches}, stages
+
+
+# ----------------------------------------------------------------------------
+# Performance baseline
+# ----------------------------------------------------------------------------
+
+def machine_info():
+    return {"platform": platform.platform(), "machine": platform.machine(),
+            "python": platform.python_version(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__}
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return {"machine": {}, "stages": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_stage(measured, base, max_slowdown, min_seconds, max_memory_growth, min_mb=1.0):
+    """'ok', 'new' (no comparable baseline), 'slower' or 'memory' for one stage."""
+    if base is None:
+        return "new"
+    if measured["seconds"] > base["seconds"] * (1 + max_slowdown) \
+            and measured["seconds"] - base["seconds"] > min_seconds:
+        return "slower"
+    if measured["peak_mb"] > base["peak_mb"] * (1 + max_memory_growth) \
+            and measured["peak_mb"] - base["peak_mb"] > min_mb:
+        return "memory"
+    return "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--tables-dir", default="tables")
+    parser.add_argument("--archive", default="archive/v4_analysis_results.json")
+    parser.add_argument("--golden-ref", default="HEAD",
+                        help="Git revision to read the golden files from; '' reads --tables-dir "
+                             "and --archive from the working tree")
+    parser.add_argument("--paths", nargs="+", choices=list(code_paths), default=list(code_paths))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per path (the minimum is kept)")
+    parser.add_argument("--scale", type=int, default=20,
+                        help="Time the paths on the export repeated this many times")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--max-slowdown", type=float, default=0.5,
+                        help="Allowed fractional slowdown per stage (0.5 = 50%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.25,
+                        help="Slowdowns smaller than this many seconds are treated as noise")
+    parser.add_argument("--max-memory-growth", type=float, default=0.5)
+    parser.add_argument("--check-perf", action="store_true",
+                        help="Fail on stages that are slower or use more memory than the baseline")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Record this run's timings and memory as the new baseline")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("GOLDEN-OUTPUT REGRESSION CHECK")
+    print("=" * 70)
+
+    golden = golden_metrics(args.tables_dir, [args.archive], args.golden_ref or None)
+    source = f" at {args.golden_ref}" if args.golden_ref else " (working tree)"
+    print(f"✓ Loaded {len(golden)} golden statistics from {args.tables_dir}/ and {args.archive}{source}")
+    print("  Reference scripts (final_analysis_v4.py, analyze_v4_data.py) are not re-run")
+    baseline = load_baseline(args.baseline)
+    if baseline["stages"] and baseline["machine"] != machine_info():
+        print(f"  ⚠ baseline was recorded on a different setup: {baseline['machine']}")
+
+    comparable = baseline.get("scale") == args.scale and baseline.get("repeat") == args.repeat
+    if baseline["stages"] and not comparable:
+        print(f"  ⚠ baseline used --scale {baseline.get('scale')} --repeat {baseline.get('repeat')}; "
+              "stage timings are reported but not checked")
+
+    drift, stages = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        timing_data = args.data
+        if args.scale > 1:
+            timing_data = replicate_export(args.data, args.scale, os.path.join(tmp, "timing_export.csv"))
+        for name in args.paths:
+            drift[name], path_stages = check_path(name, golden, args.data, timing_data, args.repeat)
+            stages.update(path_stages)
+
+    n_drift = sum(len(d["mismatches"]) for d in drift.values())
+    rows = []
+    for stage, measured in stages.items():
+        base = baseline["stages"].get(stage) if comparable else None
+        rows.append({"stage": stage, "seconds": measured["seconds"],
+                     "baseline_s": base["seconds"] if base else np.nan,
+                     "peak_mb": measured["peak_mb"], "baseline_mb": base["peak_mb"] if base else np.nan,
+                     "status": check_stage(measured, base, args.max_slowdown, args.min_seconds,
+                                           args.max_memory_growth)})
+    perf = pd.DataFrame(rows)
+    print(f"\nStage timings (min of {args.repeat}) and peak traced memory:")
+    print(perf.round({"seconds": 4, "baseline_s": 4, "peak_mb": 1, "baseline_mb": 1}).to_string(index=False))
+    regressions = perf[perf["status"].isin(["slower", "memory"])]
+
+    os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+    with open(REPORT_FILE, "w") as f:
+        json.dump({"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                   "data": args.data, "machine": machine_info(), "drift": drift,
+                   "stages": perf.to_dict("records")}, f, indent=2, default=float)
+    print(f"\n✓ Exported: {REPORT_FILE}")
+
+    if args.update_baseline:
+        if n_drift:
+            print("✗ Outputs drifted from the golden files; baseline not updated")
+            sys.exit(1)
+        # A partial run keeps the other paths' baseline entries
+        partial = comparable and set(args.paths) != set(code_paths)
+        recorded = {**baseline["stages"], **stages} if partial else stages
+        with open(args.baseline, "w") as f:
+            json.dump({"recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                       "data": args.data, "scale": args.scale, "repeat": args.repeat,
+                       "machine": machine_info(),
+                       "stages": recorded}, f, indent=2)
+        print(f"✓ Exported: {args.baseline}")
+        return
+
+    if n_drift or (args.check_perf and len(regressions)):
+        print(f"\n✗ FAILED: {n_drift} golden checks failed, {len(regressions)} stages regressed")
+        sys.exit(1)
+    if not args.check_perf:
+        if len(regressions):
+            print(f"\n⚠ {len(regressions)} stages flagged against the baseline (not checked without --check-perf)")
+        print("\n✓ All covered outputs match the golden files")
+        return
+    print("\n✓ All covered outputs match the golden files and no stage regressed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Graded Response Model (Samejima) for the AI-use, creativity and authorship item banks.
+
+Marginal maximum likelihood via Bock-Aitkin EM on a fixed quadrature grid,
+written entirely in NumPy. Response patterns are collapsed first, the E-step
+runs as two dense matrix products per block of patterns (blocks are spread
+over a thread pool, BLAS releases the GIL), and the M-step is one batched
+Fisher-scoring update for all items at once.
+
+Produces item parameters, test information curves and EAP person scores that
+can stand in for the mean composites (AI_USE_SCORE_IRT, AUTHORSHIP_SCORE_IRT, ...).
+
+Usage:
+    python scripts/irt_grm.py [--data v4_data.csv] [--n-jobs 4]
+"""
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+from survey_data import (
+    load_analysis_frame, ai_items, creativity_general_items, authorship_core_items,
+)
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    HAS_PLOTTING = True
+except ImportError:
+    HAS_PLOTTING = False
+
+# Scales scored by the GRM; authorship uses the reverse-coded items so that
+# every bank is keyed in the same direction as its mean composite.
+irt_scales = {
+    "AI_USE_SCORE": ai_items,
+    "CREATIVITY_GENERAL": creativity_general_items,
+    "AUTHORSHIP_SCORE": authorship_core_items,
+}
+
+
+def _encode_responses(responses, n_categories=None, min_category=1):
+    """Convert a 1..K response matrix (NaN = missing) to 0-based int8 codes (-1 = missing)."""
+    X = np.asarray(responses, dtype=float)
+    observed = ~np.isnan(X)
+    codes = np.full(X.shape, -1, dtype=np.int8)
+    codes[observed] = np.rint(X[observed] - min_category).astype(np.int8)
+    if n_categories is None:
+        n_categories = int(codes.max()) + 1
+    if codes.min() < -1 or codes.max() >= n_categories:
+        raise ValueError(f"Responses must lie in {min_category}..{min_category + n_categories - 1}")
+    return codes, n_categories
+
+
+def _collapse_patterns(codes):
+    """Unique response patterns, their frequencies and the row -> pattern map."""
+    patterns, inverse, counts = np.unique(codes, axis=0, return_inverse=True, return_counts=True)
+    return patterns, counts.astype(float), inverse.ravel()
+
+
+def _one_hot(codes, n_categories):
+    """(n, J*K) indicator matrix; missing responses give an all-zero item block."""
+    n, J = codes.shape
+    H = np.zeros((n, J * n_categories))
+    rows, cols = np.nonzero(codes >= 0)
+    H[rows, cols * n_categories + codes[rows, cols]] = 1.0
+    return H
+
+
+def _category_probs(a, d, theta):
+    """
+    Category probabilities and boundary slopes for all items on a theta grid.
+
+    Returns:
+    --------
+    tuple : (P, W_upper, W_lower), each (J, K, Q); P[j, c] = P*_c - P*_{c+1}
+    """
+    J = a.shape[0]
+    Q = theta.shape[0]
+    pstar = expit(a[:, None, None] * theta[None, None, :] + d[:, :, None])
+    ones = np.ones((J, 1, Q))
+    zeros = np.zeros((J, 1, Q))
+    P = np.concatenate([ones, pstar], axis=1) - np.concatenate([pstar, zeros], axis=1)
+    W = pstar * (1.0 - pstar)
+    W_upper = np.concatenate([zeros, W], axis=1)
+    W_lower = np.concatenate([W, zeros], axis=1)
+    return np.clip(P, 1e-12, 1.0), W_upper, W_lower
+
+
+def _score_block(codes, counts, log_p_flat, log_prior, n_categories):
+    """E-step for one block of patterns: expected category counts and log-likelihood."""
+    H = _one_hot(codes, n_categories)
+    ll = H @ log_p_flat
+    ll += log_prior
+    m = ll.max(axis=1, keepdims=True)
+    post = np.exp(ll - m)
+    s = post.sum(axis=1, keepdims=True)
+    loglik = float(np.sum(counts * (np.log(s[:, 0]) + m[:, 0])))
+    post *= (counts[:, None] / s)
+    return H.T @ post, loglik
+
+
+def _m_step(a, d, r, theta, n_steps=3, max_step=1.0):
+    """Batched Fisher scoring for every item's (a, d_1..d_{K-1}) given expected counts r (J, K, Q)."""
+    J, K, Q = r.shape
+    N = r.sum(axis=1)
+    for _ in range(n_steps):
+        P, Wu, Wl = _category_probs(a, d, theta)
+        D = np.zeros((J, K, Q, K))
+        D[..., 0] = theta[None, None, :] * (Wu - Wl)
+        for s in range(1, K):
+            D[:, s, :, s] += Wu[:, s, :]
+            D[:, s - 1, :, s] -= Wl[:, s - 1, :]
+        grad = np.einsum("jcq,jcqp->jp", r / P, D)
+        info = np.einsum("jq,jcqp,jcqr->jpr", N, D / P[..., None], D)
+        info += 1e-8 * np.eye(K)
+        step = np.linalg.solve(info, grad[..., None])[..., 0]
+        norm = np.abs(step).max(axis=1, keepdims=True)
+        step *= np.minimum(1.0, max_step / np.maximum(norm, 1e-12))
+        a = np.clip(a + step[:, 0], 0.05, 20.0)
+        d = np.clip(d + step[:, 1:], -20.0, 20.0)
+        # Keep thresholds ordered (d_1 > d_2 > ... )
+        d = -np.sort(-d, axis=1)
+    return a, d
+
+
+def _initial_values(codes, n_categories):
+    """Start values: a = 1, d from the logits of the marginal cumulative proportions."""
+    J = codes.shape[1]
+    d = np.zeros((J, n_categories - 1))
+    for j in range(J):
+        obs = codes[:, j][codes[:, j] >= 0]
+        for s in range(1, n_categories):
+            p = np.clip(np.mean(obs >= s) if obs.size else 0.5, 0.01, 0.99)
+            d[j, s - 1] = np.log(p / (1 - p)) * 1.7
+    return np.ones(J), -np.sort(-d, axis=1)
+
+
+def _blocks(n, chunk_size):
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+def fit_grm(responses, item_names=None, n_categories=None, min_category=1,
+            n_quad=41, max_iter=500, tol=1e-4, n_jobs=None, chunk_size=20000):
+    """
+    Fit a unidimensional Graded Response Model by marginal ML (EM).
+
+    Parameters:
+    -----------
+    responses : array-like or DataFrame
+        (n, J) item responses coded min_category..min_category+K-1, NaN = missing
+    item_names : list, optional
+        Item labels (taken from the DataFrame columns when available)
+    n_categories : int, optional
+        Number of response categories K (default: inferred from the data)
+    n_quad : int
+        Number of Gauss-Hermite quadrature nodes for the N(0, 1) ability prior
+    max_iter, tol : int, float
+        EM stops when the largest parameter change falls below tol
+    n_jobs : int, optional
+        Threads used for the E-step pattern blocks (default: os.cpu_count())
+    chunk_size : int
+        Response patterns per E-step block
+
+    Returns:
+    --------
+    dict : item table, raw parameters, quadrature grid and convergence info
+    """
+    if item_names is None:
+        item_names = list(responses.columns) if hasattr(responses, "columns") else \
+            [f"item_{j + 1}" for j in range(np.shape(responses)[1])]
+    codes, K = _encode_responses(responses, n_categories, min_category)
+    patterns, counts, _ = _collapse_patterns(codes)
+    J = codes.shape[1]
+
+    nodes, weights = np.polynomial.hermite_e.hermegauss(n_quad)
+    weights = weights / weights.sum()
+    log_prior = np.log(weights)[None, :]
+
+    a, d = _initial_values(codes, K)
+    blocks = _blocks(len(patterns), chunk_size)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    loglik = -np.inf
+    converged = False
+    n_iter = 0
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        for n_iter in range(1, max_iter + 1):
+            P, _, _ = _category_probs(a, d, nodes)
+            log_p_flat = np.log(P).reshape(J * K, n_quad)
+            parts = list(pool.map(
+                lambda b: _score_block(patterns[b[0]:b[1]], counts[b[0]:b[1]],
+                                       log_p_flat, log_prior, K),
+                blocks,
+            ))
+            r = sum(part[0] for part in parts).reshape(J, K, n_quad)
+            loglik = sum(part[1] for part in parts)
+
+            a_new, d_new = _m_step(a, d, r, nodes)
+            change = max(np.abs(a_new - a).max(), np.abs(d_new - d).max())
+            a, d = a_new, d_new
+            if change < tol:
+                converged = True
+                break
+
+    b = -d / a[:, None]
+    item_table = pd.DataFrame({"item": item_names, "a": a})
+    for s in range(K - 1):
+        item_table[f"b{s + 1}"] = b[:, s]
+    for s in range(K - 1):
+        item_table[f"d{s + 1}"] = d[:, s]
+    item_table["converged"] = converged
+    item_table["n_iter"] = n_iter
+
+    return {
+        "items": item_table,
+        "item_names": list(item_names),
+        "a": a,
+        "d": d,
+        "n_categories": K,
+        "min_category": min_category,
+        "nodes": nodes,
+        "weights": weights,
+        "loglik": loglik,
+        "n_iter": n_iter,
+        "converged": converged,
+        "n_patterns": len(patterns),
+        "N": codes.shape[0],
+    }
+
+
+def test_information(fit, theta=None):
+    """
+    Item and test information curves for a fitted GRM.
+
+    Returns:
+    --------
+    DataFrame : theta, one information column per item, TEST_INFO and SE
+    """
+    if theta is None:
+        theta = np.linspace(-4, 4, 81)
+    theta = np.asarray(theta, dtype=float)
+    P, Wu, Wl = _category_probs(fit["a"], fit["d"], theta)
+    item_info = fit["a"][:, None] ** 2 * ((Wu - Wl) ** 2 / P).sum(axis=1)
+    out = pd.DataFrame({"theta": theta})
+    for j, name in enumerate(fit["item_names"]):
+        out[name] = item_info[j]
+    out["TEST_INFO"] = item_info.sum(axis=0)
+    out["SE"] = 1.0 / np.sqrt(out["TEST_INFO"])
+    return out
+
+
+def eap_scores(fit, responses, n_jobs=None, chunk_size=20000):
+    """
+    Expected a posteriori ability estimates and posterior SDs.
+
+    Returns:
+    --------
+    tuple : (theta_eap, theta_se) arrays of length n
+    """
+    codes, K = _encode_responses(responses, fit["n_categories"], fit["min_category"])
+    patterns, _, inverse = _collapse_patterns(codes)
+    J = codes.shape[1]
+    nodes = fit["nodes"]
+    P, _, _ = _category_probs(fit["a"], fit["d"], nodes)
+    log_p_flat = np.log(P).reshape(J * K, len(nodes))
+    log_prior = np.log(fit["weights"])[None, :]
+
+    def score(block):
+        H = _one_hot(patterns[block[0]:block[1]], K)
+        ll = H @ log_p_flat + log_prior
+        post = np.exp(ll - ll.max(axis=1, keepdims=True))
+        post /= post.sum(axis=1, keepdims=True)
+        mean = post @ nodes
+        var = post @ nodes ** 2 - mean ** 2
+        return mean, np.sqrt(np.maximum(var, 0.0))
+
+    with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as pool:
+        parts = list(pool.map(score, _blocks(len(patterns), chunk_size)))
+    theta = np.concatenate([p[0] for p in parts])
+    se = np.concatenate([p[1] for p in parts])
+    return theta[inverse], se[inverse]
+
+
+def simulate_grm(a, b, n, seed=None):
+    """Simulate 1..K responses from GRM parameters (a: (J,), b: (J, K-1)) with theta ~ N(0, 1)."""
+    rng = np.random.default_rng(seed)
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    theta = rng.standard_normal(n)
+    pstar = expit(a[None, :, None] * (theta[:, None, None] - b[None, :, :]))
+    u = rng.random((n, a.shape[0], 1))
+    return (u < pstar).sum(axis=2) + 1, theta
+
+
+def irt_scale_scores(adf, scales=None, n_jobs=None, require_converged=True):
+    """
+    Fit one GRM per scale and return EAP scores aligned with adf.
+
+    With require_converged, scales whose EM did not converge get NaN scores
+    instead of EAPs computed from unstable item parameters.
+
+    Returns:
+    --------
+    tuple : (scores DataFrame with <SCALE>_IRT and <SCALE>_IRT_SE columns, dict of fits)
+    """
+    scales = scales or irt_scales
+    scores = pd.DataFrame(index=adf.index)
+    fits = {}
+    for scale, items in scales.items():
+        fit = fit_grm(adf[items], n_jobs=n_jobs)
+        if fit["converged"] or not require_converged:
+            theta, se = eap_scores(fit, adf[items], n_jobs=n_jobs)
+        else:
+            theta = se = np.full(len(adf), np.nan)
+        scores[scale + "_IRT"] = theta
+        scores[scale + "_IRT_SE"] = se
+        fits[scale] = fit
+    return scores, fits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--allow-unconverged", action="store_true",
+                        help="Export EAP scores even for scales whose EM did not converge")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("GRADED RESPONSE MODEL (IRT)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    print(f"✓ Loaded {len(adf)} participants from {args.data}")
+
+    scores, fits = irt_scale_scores(adf, n_jobs=args.n_jobs, require_converged=not args.allow_unconverged)
+
+    item_tables = []
+    info_tables = []
+    for scale, fit in fits.items():
+        status = "converged" if fit["converged"] else "NOT converged"
+        print(f"\n{scale}: {len(fit['item_names'])} items, {fit['n_iter']} EM iterations ({status}), "
+              f"logL = {fit['loglik']:.2f}")
+        print(fit["items"][["item", "a"] + [c for c in fit["items"].columns if c.startswith("b")]]
+              .round(3).to_string(index=False))
+        if scores[scale + "_IRT"].isna().all():
+            print(f"  ⚠ EM did not converge after {fit['n_iter']} iterations; "
+                  "EAP scores set to NaN (use --allow-unconverged to export them)")
+        else:
+            r = np.corrcoef(scores[scale + "_IRT"], adf[scale])[0, 1]
+            print(f"  r(EAP, mean composite) = {r:.3f}")
+
+        table = fit["items"].copy()
+        table.insert(0, "scale", scale)
+        item_tables.append(table)
+        info = test_information(fit)[["theta", "TEST_INFO", "SE"]]
+        info.insert(0, "scale", scale)
+        info_tables.append(info)
+
+    os.makedirs("tables", exist_ok=True)
+    os.makedirs("data", exist_ok=True)
+    pd.concat(item_tables).to_csv("tables/irt_item_parameters.csv", index=False)
+    print("\n✓ Exported: tables/irt_item_parameters.csv")
+    pd.concat(info_tables).to_csv("tables/irt_test_information.csv", index=False)
+    print("✓ Exported: tables/irt_test_information.csv")
+    scores.to_csv("data/irt_person_scores.csv", index=True)
+    print("✓ Exported: data/irt_person_scores.csv")
+
+    if HAS_PLOTTING:
+        os.makedirs("figures", exist_ok=True)
+        fig, ax = plt.subplots(figsize=(7, 4))
+        for info in info_tables:
+            ax.plot(info["theta"], info["TEST_INFO"], label=info["scale"].iloc[0])
+        ax.set_xlabel("θ")
+        ax.set_ylabel("Test information")
+        ax.set_title("GRM test information curves")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig("figures/irt_test_information.png", dpi=300, bbox_inches="tight")
+        plt.close()
+        print("✓ Exported: figures/irt_test_information.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Latent profile analysis (Gaussian mixtures) as an alternative to the STEP 5 KMeans.
+
+Fits 1..K-profile mixtures on the five standardized STEP 5 features under
+four covariance structures (mclust naming):
+
+    EEI  equal variances, zero covariances  (the closest analogue of KMeans)
+    VVI  class-varying variances, zero covariances
+    EEE  equal full covariance matrix
+    VVV  class-varying full covariance matrices
+
+Each model gets many random EM restarts, fanned out over worker processes.
+EM never holds the full (n, K) responsibility matrix: every iteration walks
+the data in row blocks, computes responsibilities for the block in float32
+and only accumulates the float64 sufficient statistics (N_k, sum r x,
+sum r x x'), so 1M respondents fit in a few tens of MB.
+
+Reports logL, AIC, BIC, sample-size adjusted BIC and relative entropy per
+solution, posterior class probabilities, and a profile table in the
+table4_cluster_profiles.csv layout for the BIC-preferred solution. The fit
+table counts, per solution, the starts that ran, stayed non-degenerate
+(finite logL) and met the EM tolerance; solutions whose every start
+degenerated keep a row with empty indices and a note.
+
+Usage:
+    python scripts/latent_profiles.py [--data v4_data.csv] [--max-profiles 6] [--n-starts 20] [--n-jobs 4]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.special import logsumexp
+
+from survey_data import load_analysis_frame, cluster_vars
+from parallel import parallel_map
+
+covariance_structures = ["EEI", "VVI", "EEE", "VVV"]
+
+BLOCK_SIZE = 65536
+REG_COVAR = 1e-6
+# Likert-based features are discrete, so a profile can sit on a single
+# response value and its variance collapse to zero (unbounded likelihood).
+# Starts that drive any covariance eigenvalue below this floor (standardized
+# units) are discarded as degenerate.
+MIN_VARIANCE = 0.05
+
+
+def n_parameters(n_profiles, n_features, structure):
+    """Free parameters of a mixture: means, mixing weights and covariances."""
+    K, d = n_profiles, n_features
+    cov = {
+        "EEI": d,
+        "VVI": K * d,
+        "EEE": d * (d + 1) // 2,
+        "VVV": K * d * (d + 1) // 2,
+    }[structure]
+    return K * d + (K - 1) + cov
+
+
+def _precision_factors(covs):
+    """Per-class matrices P with P'P = inverse covariance, and log|P|."""
+    factors = []
+    log_dets = []
+    for cov in covs:
+        L = np.linalg.cholesky(cov)
+        P = np.linalg.inv(L).T
+        factors.append(P)
+        log_dets.append(-np.log(np.diag(L)).sum())
+    return np.array(factors), np.array(log_dets)
+
+
+def _log_weighted_density(block, weights, means, factors, log_dets):
+    """(b, K) float32 matrix of log(pi_k) + log N(x | mu_k, Sigma_k)."""
+    b, d = block.shape
+    K = len(weights)
+    out = np.empty((b, K), dtype=np.float32)
+    const = -0.5 * d * np.log(2 * np.pi)
+    for k in range(K):
+        z = (block - means[k].astype(np.float32)) @ factors[k].astype(np.float32)
+        out[:, k] = np.log(weights[k]) + const + log_dets[k] - 0.5 * np.einsum("ij,ij->i", z, z)
+    return out
+
+
+def _e_step(X, params, block_size=BLOCK_SIZE, keep_posterior=False):
+    """
+    Blockwise E-step.
+
+    Returns:
+    --------
+    dict : log-likelihood, N_k, sum r x, sum r x x' (float64), entropy term
+           and, when requested, the float32 posterior matrix
+    """
+    n, d = X.shape
+    K = len(params["weights"])
+    factors, log_dets = _precision_factors(params["covs"])
+    stats = {
+        "loglik": 0.0,
+        "nk": np.zeros(K),
+        "sx": np.zeros((K, d)),
+        "sxx": np.zeros((K, d, d)),
+        "entropy": 0.0,
+    }
+    posterior = np.empty((n, K), dtype=np.float32) if keep_posterior else None
+    for start in range(0, n, block_size):
+        block = X[start:start + block_size]
+        logp = _log_weighted_density(block, params["weights"], params["means"], factors, log_dets)
+        norm = logsumexp(logp, axis=1, keepdims=True)
+        resp = np.exp(logp - norm)
+        stats["loglik"] += float(norm.sum(dtype=np.float64))
+        stats["nk"] += resp.sum(axis=0, dtype=np.float64)
+        stats["sx"] += (resp.T @ block).astype(np.float64)
+        for k in range(K):
+            stats["sxx"][k] += ((block * resp[:, k:k + 1]).T @ block).astype(np.float64)
+        stats["entropy"] -= float(np.sum(resp * np.log(np.maximum(resp, 1e-30)), dtype=np.float64))
+        if keep_posterior:
+            posterior[start:start + block_size] = resp
+    stats["posterior"] = posterior
+    return stats
+
+
+def _m_step(stats, structure, n):
+    """Mixture parameters from accumulated sufficient statistics."""
+    nk = np.maximum(stats["nk"], 1e-10)
+    K, d = stats["sx"].shape
+    means = stats["sx"] / nk[:, None]
+    covs = stats["sxx"] / nk[:, None, None] - np.einsum("ki,kj->kij", means, means)
+    if structure in ("EEI", "EEE"):
+        pooled = np.einsum("k,kij->ij", nk, covs) / n
+        covs = np.repeat(pooled[None], K, axis=0)
+    if structure in ("EEI", "VVI"):
+        covs = np.einsum("kii->ki", covs)[:, :, None] * np.eye(d)[None]
+    covs = covs + REG_COVAR * np.eye(d)[None]
+    return {"weights": nk / n, "means": means, "covs": covs}
+
+
+def fit_mixture(X, n_profiles, structure, seed=0, max_iter=500, tol=1e-7, block_size=BLOCK_SIZE):
+    """
+    One EM run from a random start (K random respondents as means, pooled covariance).
+
+    Collapsed or degenerate starts come back with logL = -inf.
+
+    Returns:
+    --------
+    dict : parameters, log-likelihood, iterations and convergence flag
+    """
+    rng = np.random.default_rng(seed)
+    n, d = X.shape
+    start_rows = np.sort(rng.choice(n, size=n_profiles, replace=False))
+    X64 = X[start_rows].astype(np.float64)
+    cov = np.cov(X[rng.choice(n, size=min(n, 10000), replace=False)].astype(np.float64), rowvar=False)
+    params = {
+        "weights": np.full(n_profiles, 1.0 / n_profiles),
+        "means": X64 + 1e-3 * rng.standard_normal(X64.shape),
+        "covs": np.repeat(np.atleast_2d(cov)[None] + REG_COVAR * np.eye(d)[None], n_profiles, axis=0),
+    }
+
+    loglik = -np.inf
+    converged = False
+    n_iter = 0
+    for n_iter in range(1, max_iter + 1):
+        try:
+            stats = _e_step(X, params, block_size)
+        except np.linalg.LinAlgError:
+            return {"params": params, "loglik": -np.inf, "n_iter": n_iter, "converged": False}
+        if stats["nk"].min() < d + 1:
+            # A profile collapsed onto too few respondents; discard this start
+            return {"params": params, "loglik": -np.inf, "n_iter": n_iter, "converged": False}
+        params = _m_step(stats, structure, n)
+        if np.linalg.eigvalsh(params["covs"]).min() < MIN_VARIANCE:
+            return {"params": params, "loglik": -np.inf, "n_iter": n_iter, "converged": False}
+        if abs(stats["loglik"] - loglik) < tol * abs(stats["loglik"]):
+            loglik = stats["loglik"]
+            converged = True
+            break
+        loglik = stats["loglik"]
+    return {"params": params, "loglik": loglik, "n_iter": n_iter, "converged": converged}
+
+
+_WORKER = {}
+
+
+def _init_worker(X, block_size):
+    _WORKER["X"] = X
+    _WORKER["block_size"] = block_size
+
+
+def _run_start(task):
+    n_profiles, structure, seed = task
+    fit = fit_mixture(_WORKER["X"], n_profiles, structure, seed=seed, block_size=_WORKER["block_size"])
+    fit.update({"n_profiles": n_profiles, "structure": structure, "seed": seed})
+    return fit
+
+
+def latent_profile_analysis(X, max_profiles=6, structures=None, n_starts=20, seed=42,
+                            n_jobs=None, block_size=BLOCK_SIZE):
+    """
+    Fit every (n_profiles, structure) combination with n_starts random EM restarts.
+
+    Parameters:
+    -----------
+    X : ndarray
+        (n, d) standardized features; converted to float32
+    max_profiles : int
+        Largest number of profiles tried (from 1 upwards)
+    structures : list, optional
+        Covariance structures (default: EEI, VVI, EEE, VVV)
+    n_starts : int
+        Random restarts per model, run concurrently across processes
+
+    Returns:
+    --------
+    tuple : (fit-index DataFrame, dict of best non-degenerate fits keyed by (n_profiles, structure))
+    """
+    structures = structures or covariance_structures
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    n, d = X.shape
+    rng = np.random.default_rng(seed)
+    tasks = []
+    for K in range(1, max_profiles + 1):
+        for structure in structures:
+            starts = 1 if K == 1 else n_starts
+            tasks.extend((K, structure, int(s)) for s in rng.integers(0, 2 ** 31 - 1, size=starts))
+
+    runs = parallel_map(_run_start, tasks, n_jobs=n_jobs, chunksize=max(1, n_starts // 4),
+                        initializer=_init_worker, initargs=(X, block_size))
+
+    best = {}
+    counts = {}
+    for run in runs:
+        key = (run["n_profiles"], run["structure"])
+        count = counts.setdefault(key, {"n_starts": 0, "n_starts_finite": 0, "n_starts_converged": 0})
+        count["n_starts"] += 1
+        count["n_starts_finite"] += int(np.isfinite(run["loglik"]))
+        count["n_starts_converged"] += int(run["converged"])
+        if key not in best or run["loglik"] > best[key]["loglik"]:
+            best[key] = run
+
+    rows = []
+    for (K, structure), run in sorted(best.items()):
+        if not np.isfinite(run["loglik"]):
+            # Keep the cell in the table so a missing solution is visible
+            rows.append({"n_profiles": K, "structure": structure,
+                         "n_parameters": n_parameters(K, d, structure), **counts[(K, structure)],
+                         "best_converged": False, "note": "all starts degenerate"})
+            continue
+        stats = _e_step(X, run["params"], block_size, keep_posterior=True)
+        run["posterior"] = stats["posterior"]
+        k_params = n_parameters(K, d, structure)
+        loglik = stats["loglik"]
+        classes = stats["posterior"].argmax(axis=1)
+        rows.append({
+            "n_profiles": K,
+            "structure": structure,
+            "logL": loglik,
+            "n_parameters": k_params,
+            "AIC": -2 * loglik + 2 * k_params,
+            "BIC": -2 * loglik + np.log(n) * k_params,
+            "SABIC": -2 * loglik + np.log((n + 2) / 24) * k_params,
+            "entropy": 1 - stats["entropy"] / (n * np.log(K)) if K > 1 else 1.0,
+            "smallest_class_prop": np.bincount(classes, minlength=K).min() / n,
+            **counts[(K, structure)],
+            "best_converged": bool(run["converged"]),
+            "note": "" if run["converged"] else "best start hit max_iter",
+        })
+    columns = ["n_profiles", "structure", "logL", "n_parameters", "AIC", "BIC", "SABIC", "entropy",
+               "smallest_class_prop", "n_starts", "n_starts_finite", "n_starts_converged",
+               "best_converged", "note"]
+    best = {key: run for key, run in best.items() if np.isfinite(run["loglik"])}
+    table = pd.DataFrame(rows, columns=columns).astype({"n_parameters": int})
+    return table, best
+
+
+def profile_table(features, posterior):
+    """Profile means in the table4_cluster_profiles.csv layout (modal class assignment)."""
+    classes = np.asarray(posterior).argmax(axis=1)
+    profiles = features.assign(cluster=classes)
+    means = profiles.groupby("cluster").mean()
+    sizes = profiles["cluster"].value_counts().sort_index()
+    table = means.reset_index()
+    table.insert(1, "N", sizes.loc[means.index].to_numpy())
+    return table[["cluster", "N"] + list(features.columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--max-profiles", type=int, default=6)
+    parser.add_argument("--n-starts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("LATENT PROFILE ANALYSIS (Gaussian mixtures)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    features = adf[cluster_vars].dropna()
+    print(f"Profiling {len(features)} participants with complete data")
+
+    values = features.to_numpy(dtype=float)
+    X = (values - values.mean(axis=0)) / values.std(axis=0)
+
+    fit_indices, best = latent_profile_analysis(
+        X, max_profiles=args.max_profiles, n_starts=args.n_starts, seed=args.seed, n_jobs=args.n_jobs,
+    )
+    print()
+    print(fit_indices.drop(columns="note").round(3).to_string(index=False))
+    for _, row in fit_indices[fit_indices["note"] != ""].iterrows():
+        print(f"⚠ {row['n_profiles']} profiles, {row['structure']}: {row['note']}")
+
+    chosen = fit_indices.loc[fit_indices["BIC"].idxmin()]
+    key = (int(chosen["n_profiles"]), chosen["structure"])
+    print(f"\nBIC-preferred solution: {key[0]} profiles, {key[1]} "
+          f"(BIC = {chosen['BIC']:.1f}, entropy = {chosen['entropy']:.3f})")
+
+    posterior = best[key]["posterior"]
+    profiles = profile_table(features, posterior)
+    print()
+    print(profiles.round(3).to_string(index=False))
+
+    os.makedirs("tables", exist_ok=True)
+    os.makedirs("data", exist_ok=True)
+    fit_indices.to_csv("tables/lpa_fit_indices.csv", index=False)
+    print("\n✓ Exported: tables/lpa_fit_indices.csv")
+    profiles.to_csv("tables/table4_lpa_profiles.csv", index=False)
+    print("✓ Exported: tables/table4_lpa_profiles.csv")
+    post = pd.DataFrame(posterior, index=features.index,
+                        columns=[f"p_profile_{k}" for k in range(posterior.shape[1])])
+    post["profile"] = posterior.argmax(axis=1)
+    post.to_csv("data/lpa_posterior_probabilities.csv", index=True)
+    print("✓ Exported: data/lpa_posterior_probabilities.csv")
+
+
+if __name__ == "__main__":
+    main()
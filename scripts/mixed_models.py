@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Multilevel (mixed-effects) versions of Models A and B for clustered samples.
+
+Students nested in schools (or grades, classes, ...) are not independent, and
+predictors such as overall_policy_num are really cluster-level. This script
+refits Models A and B with
+  - a random intercept per cluster
+  - a random intercept and a random AI_USE_SCORE slope per cluster
+by REML, plus an intercept-only null model per outcome for the unconditional
+ICC.
+
+The solver works on the block structure of V = sigma² (I + Z Lambda Lambda' Z'),
+never on N x N matrices. One grouped cross-product pass over [Z, X, y] gives
+per-cluster Z'Z, Z'X, Z'y (q x q, q x p, q with q = 1 or 2). Every likelihood
+evaluation then applies Woodbury with batched q x q solves over the clusters:
+
+    X'H^-1 X = X'X - sum_i (Lambda'Z_i'X_i)' T_i^-1 (Lambda'Z_i'X_i),   T_i = Lambda'Z_i'Z_i Lambda + I
+    log|H|   = sum_i log|T_i|
+
+and the profiled REML deviance is minimized over the relative Cholesky
+factor Lambda (lme4 parameterization). Cost is one O(N) pass plus O(m q³)
+per iteration for m clusters, so thousands of schools and millions of
+students fit in seconds to minutes.
+
+Fixed effects are reported in the reg_results format of final_analysis_v4.py
+(N, R2, AI_USE_SCORE_B/SE/p) with R2 the marginal (fixed-effects) R²
+of Nakagawa & Schielzeth. Tests are Wald z tests.
+
+The v4 export has no school identifier, so --group defaults to the grade
+column; deployments pass their school column instead. Several --group
+columns are cross-classified into one cluster id (e.g. school x grade).
+
+Usage:
+    python scripts/mixed_models.py [--data v4_data.csv] [--group school_id] [--slope AI_USE_SCORE] [--n-jobs 4]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import minimize
+from scipy.stats import norm, chi2
+
+from survey_data import load_analysis_frame, reg_vars, build_design, model_specs
+from subgroup_analysis import grouped_cross_products
+
+RANDOM_SLOPE = "AI_USE_SCORE"
+
+
+def cluster_codes(data, group):
+    """Integer cluster id per row (cross-classified over the group columns) and the cluster labels."""
+    grouper = data.groupby(list(group), sort=True)
+    codes = grouper.ngroup().to_numpy()
+    labels = [" | ".join(str(v) for v in key) for key in grouper.size().index.to_frame().itertuples(index=False)]
+    return codes, labels
+
+
+def cluster_statistics(X, y, Z, codes, n_groups, n_jobs=None):
+    """
+    Sufficient statistics of a two-level linear model from one grouped pass.
+
+    Returns:
+    --------
+    dict : global X'X, X'y, y'y and per-cluster Z'Z (m, q, q), Z'[X, y] (m, q, p + 1), sizes
+    """
+    q, p = Z.shape[1], X.shape[1]
+    W = np.column_stack([Z, X, y])
+    C = grouped_cross_products(W, codes, n_groups, n_jobs)
+    total = C.sum(axis=0)
+    return {
+        "n_obs": len(y),
+        "XtX": total[q:q + p, q:q + p],
+        "Xty": total[q:q + p, -1],
+        "yty": total[-1, -1],
+        "ZtZ": C[:, :q, :q],
+        "ZtXy": C[:, :q, q:],
+        "sizes": np.bincount(codes, minlength=n_groups),
+        # Within-cluster sum of squares of each fixed-effect column (0 -> cluster-level)
+        "within_ss": np.einsum("mjj->j", C[:, q:q + p, q:q + p])
+                     - (C[:, 0, q:q + p] ** 2 / np.maximum(C[:, 0, 0], 1)[:, None]).sum(axis=0),
+    }
+
+
+def _lambda(theta, q):
+    L = np.zeros((q, q))
+    L[np.tril_indices(q)] = theta
+    return L
+
+
+def _reml_parts(theta, stats):
+    """Woodbury pieces of the profiled REML criterion for one Lambda."""
+    q = stats["ZtZ"].shape[1]
+    p = stats["XtX"].shape[0]
+    L = _lambda(theta, q)
+    T = L.T @ stats["ZtZ"] @ L + np.eye(q)
+    LB = L.T @ stats["ZtXy"]                          # (m, q, p + 1)
+    chol = np.linalg.cholesky(T)
+    logdet_T = 2 * np.log(np.diagonal(chol, axis1=1, axis2=2)).sum()
+    solved = np.linalg.solve(T, LB)
+    correction = np.einsum("mqa,mqb->ab", LB, solved)
+    XtHX = stats["XtX"] - correction[:p, :p]
+    XtHy = stats["Xty"] - correction[:p, p]
+    ytHy = stats["yty"] - correction[p, p]
+    return L, T, LB, XtHX, XtHy, ytHy, logdet_T
+
+
+def reml_deviance(theta, stats):
+    """-2 x profiled REML log-likelihood (sigma² and the fixed effects profiled out)."""
+    p = stats["XtX"].shape[0]
+    dof = stats["n_obs"] - p
+    _, _, _, XtHX, XtHy, ytHy, logdet_T = _reml_parts(theta, stats)
+    chol = np.linalg.cholesky(XtHX)
+    beta = np.linalg.solve(XtHX, XtHy)
+    r2 = ytHy - beta @ XtHy
+    logdet_X = 2 * np.log(np.diag(chol)).sum()
+    return dof * np.log(2 * np.pi * r2 / dof) + dof + logdet_T + logdet_X
+
+
+def fit_mixed(stats, terms, random_terms, max_iter=500):
+    """
+    REML fit of y = X b + Z u + e with u_i ~ N(0, G) per cluster.
+
+    Parameters:
+    -----------
+    stats : dict
+        Output of cluster_statistics
+    terms : list
+        Fixed-effect names (columns of X)
+    random_terms : list
+        Random-effect names (columns of Z), intercept first
+
+    Returns:
+    --------
+    dict : fixed effects (B, SE, z, p), G, sigma², BLUPs and the REML deviance
+    """
+    q = len(random_terms)
+    p = len(terms)
+    dof = stats["n_obs"] - p
+    # G = sigma² Lambda Lambda' is unchanged by flipping the sign of a column of
+    # Lambda, so the search is unconstrained; variances on the boundary (0)
+    # are reached from either side instead of stalling against a bound
+    rows, cols = np.tril_indices(q)
+    theta0 = np.where(rows == cols, 1.0, 0.0)
+    opt = minimize(reml_deviance, theta0, args=(stats,), method="BFGS", options={"maxiter": max_iter})
+    # Finite-difference BFGS often stops on precision loss when the deviance is
+    # large (millions of rows); a derivative-free polish settles the optimum
+    opt = minimize(reml_deviance, opt.x, args=(stats,), method="Nelder-Mead",
+                   options={"maxiter": max_iter * len(theta0), "xatol": 1e-7, "fatol": 1e-9})
+
+    L, T, LB, XtHX, XtHy, ytHy, _ = _reml_parts(opt.x, stats)
+    XtHX_inv = np.linalg.inv(XtHX)
+    beta = XtHX_inv @ XtHy
+    sigma2 = (ytHy - beta @ XtHy) / dof
+    se = np.sqrt(sigma2 * np.diag(XtHX_inv))
+    z = beta / se
+    G = sigma2 * L @ L.T
+
+    # BLUPs: u_i = Lambda T_i^-1 Lambda' Z_i'(y_i - X_i b)
+    rhs = LB[:, :, p] - LB[:, :, :p] @ beta
+    blups = (L @ np.linalg.solve(T, rhs[..., None]))[..., 0]
+
+    return {
+        "terms": list(terms),
+        "random_terms": list(random_terms),
+        "B": beta,
+        "SE": se,
+        "z": z,
+        "p": 2 * norm.sf(np.abs(z)),
+        "cov_B": sigma2 * XtHX_inv,
+        "G": G,
+        "sigma2": sigma2,
+        "blups": blups,
+        "deviance": opt.fun,
+        "converged": bool(opt.success),
+        "n_iter": int(opt.nit),
+    }
+
+
+def variance_summary(fit, stats):
+    """Variance components, ICC and marginal/conditional R² (Nakagawa & Schielzeth)."""
+    n = stats["n_obs"]
+    beta = fit["B"]
+    # var(X b) from X'X; the first column of X is the intercept, so X'X[0] holds the column sums
+    fitted_ss = beta @ stats["XtX"] @ beta
+    fitted_sum = stats["XtX"][0] @ beta
+    var_fixed = (fitted_ss - fitted_sum ** 2 / n) / (n - 1)
+    # Mean over rows of z_i' G z_i = tr(G sum Z'Z) / n
+    var_random = np.trace(fit["G"] @ stats["ZtZ"].sum(axis=0)) / n
+    total = var_fixed + var_random + fit["sigma2"]
+    out = {
+        "sigma2_residual": fit["sigma2"],
+        "tau2_intercept": fit["G"][0, 0],
+        "ICC": fit["G"][0, 0] / (fit["G"][0, 0] + fit["sigma2"]),
+        "R2_marginal": var_fixed / total,
+        "R2_conditional": (var_fixed + var_random) / total,
+    }
+    if len(fit["random_terms"]) > 1:
+        slope = fit["random_terms"][1]
+        out[f"tau2_{slope}"] = fit["G"][1, 1]
+        denom = np.sqrt(fit["G"][0, 0] * fit["G"][1, 1])
+        out[f"corr_intercept_{slope}"] = fit["G"][0, 1] / denom if denom > 0 else np.nan
+    return out
+
+
+def _reg_result(model_key, fit, stats, n_groups, focus="AI_USE_SCORE"):
+    """Fixed effects in the reg_results layout, plus the multilevel extras."""
+    j = fit["terms"].index(focus)
+    variance = variance_summary(fit, stats)
+    cluster_level = [t for t, ss in zip(fit["terms"], stats["within_ss"])
+                     if t != "Intercept" and ss < 1e-9 * max(stats["n_obs"], 1)]
+    return {
+        "model_name": model_specs[model_key]["model_name"],
+        "outcome_name": model_specs[model_key]["outcome_name"],
+        "N": int(stats["n_obs"]),
+        "R2": variance["R2_marginal"],
+        f"{focus}_B": fit["B"][j],
+        f"{focus}_SE": fit["SE"][j],
+        f"{focus}_p": fit["p"][j],
+        "n_groups": int(n_groups),
+        "random_effects": fit["random_terms"],
+        "variance_components": variance,
+        "cluster_level_predictors": cluster_level,
+        "REML_deviance": fit["deviance"],
+        "converged": fit["converged"],
+    }
+
+
+def multilevel_models(adf, group, model_keys=("model_a", "model_b"), slope=RANDOM_SLOPE, n_jobs=None):
+    """
+    Null, random-intercept and random-slope fits of each model.
+
+    Parameters:
+    -----------
+    adf : DataFrame
+        Scored analysis dataframe (see survey_data.load_analysis_frame)
+    group : list
+        Cluster column(s); several are cross-classified into one cluster id
+    slope : str or None
+        Predictor given a random slope; None fits random intercepts only
+
+    Returns:
+    --------
+    tuple : (results dict keyed by structure then model, long coefficient table)
+    """
+    group = list(group)
+    data = adf[reg_vars + [g for g in group if g not in reg_vars]].dropna()
+    codes, labels = cluster_codes(data, group)
+    m = len(labels)
+
+    structures = {"random_intercept": ["Intercept"]}
+    if slope:
+        structures["random_slope"] = ["Intercept", slope]
+
+    results = {"null": {}, **{name: {} for name in structures}}
+    rows = []
+    for key in model_keys:
+        X, y, terms = build_design(data, key)
+        outcome = model_specs[key]["outcome_name"]
+        if outcome not in results["null"]:
+            ones = np.ones((len(y), 1))
+            null_stats = cluster_statistics(ones, y, ones, codes, m, n_jobs)
+            null_fit = fit_mixed(null_stats, ["Intercept"], ["Intercept"])
+            results["null"][outcome] = {
+                "N": len(y),
+                "n_groups": m,
+                "tau2_intercept": null_fit["G"][0, 0],
+                "sigma2_residual": null_fit["sigma2"],
+                "ICC": null_fit["G"][0, 0] / (null_fit["G"][0, 0] + null_fit["sigma2"]),
+            }
+
+        deviances = {}
+        for name, random_terms in structures.items():
+            Z = np.column_stack([np.ones(len(y))] + [data[t].to_numpy(dtype=float) for t in random_terms[1:]])
+            stats = cluster_statistics(X, y, Z, codes, m, n_jobs)
+            fit = fit_mixed(stats, terms, random_terms)
+            deviances[name] = fit["deviance"]
+            results[name][key] = _reg_result(key, fit, stats, m)
+            for term, b, se, z, p in zip(terms, fit["B"], fit["SE"], fit["z"], fit["p"]):
+                rows.append({"Model": model_specs[key]["model_name"], "Outcome": outcome,
+                             "structure": name, "term": term, "B": b, "SE": se, "z": z, "p": p})
+
+        if "random_slope" in structures:
+            # Same fixed effects, so REML deviances compare; 50:50 chi-bar² mixture of df 1 and 2
+            lr = max(deviances["random_intercept"] - deviances["random_slope"], 0.0)
+            results["random_slope"][key]["slope_LR"] = lr
+            results["random_slope"][key]["slope_LR_p"] = 0.5 * chi2.sf(lr, 1) + 0.5 * chi2.sf(lr, 2)
+    return results, pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--group", nargs="+", default=["grade"],
+                        help="Cluster column(s), e.g. school_id; default is grade (no school id in v4)")
+    parser.add_argument("--slope", default=RANDOM_SLOPE, help="Predictor with a random slope ('none' to skip)")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+    slope = None if args.slope.lower() == "none" else args.slope
+
+    print("=" * 70)
+    print("MULTILEVEL MODELS (REML, random intercept / slope)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    missing = [g for g in args.group if g not in adf.columns]
+    if missing:
+        raise SystemExit(f"Cluster column(s) not in {args.data}: {missing}")
+
+    results, coefficients = multilevel_models(adf, args.group, slope=slope, n_jobs=args.n_jobs)
+
+    for outcome, null in results["null"].items():
+        print(f"\n{outcome}: {null['n_groups']} clusters, N = {null['N']}, "
+              f"unconditional ICC = {null['ICC']:.3f}")
+    for structure in [s for s in results if s != "null"]:
+        print(f"\n{structure.replace('_', ' ').capitalize()}:")
+        for m in results[structure].values():
+            vc = m["variance_components"]
+            print(f"  {m['model_name']} ({m['outcome_name']}): AI_USE_SCORE B = {m['AI_USE_SCORE_B']:.3f}, "
+                  f"SE = {m['AI_USE_SCORE_SE']:.3f}, p = {m['AI_USE_SCORE_p']:.4f}; "
+                  f"ICC = {vc['ICC']:.3f}, R2m = {vc['R2_marginal']:.3f}, R2c = {vc['R2_conditional']:.3f}")
+            if m["cluster_level_predictors"]:
+                print(f"    cluster-level predictors: {', '.join(m['cluster_level_predictors'])}")
+            if "slope_LR_p" in m:
+                print(f"    random slope LR = {m['slope_LR']:.2f}, p = {m['slope_LR_p']:.4f}")
+
+    os.makedirs("tables", exist_ok=True)
+    coefficients.to_csv("tables/mixed_model_coefficients.csv", index=False)
+    print("\n✓ Exported: tables/mixed_model_coefficients.csv")
+    with open("tables/mixed_model_results.json", "w") as f:
+        json.dump(results, f, indent=2, default=str)
+    print("✓ Exported: tables/mixed_model_results.json")
+
+
+if __name__ == "__main__":
+    main()
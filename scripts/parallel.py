@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Process-pool helper shared by the add-on analysis scripts.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def resolve_n_jobs(n_jobs=None):
+    """Number of worker processes: None or <= 0 means one per CPU."""
+    if n_jobs is None or n_jobs <= 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def parallel_map(func, tasks, n_jobs=None, chunksize=1, initializer=None, initargs=()):
+    """
+    Map func over tasks in a process pool, preserving order.
+
+    Runs in-process when n_jobs == 1 or there is at most one task, so small
+    jobs do not pay for starting workers. func must be a module-level
+    function so it can be pickled. initializer(*initargs) runs once per
+    worker, which is the place to hand over large shared arrays instead of
+    pickling them into every task.
+    """
+    tasks = list(tasks)
+    n_jobs = min(resolve_n_jobs(n_jobs), max(len(tasks), 1))
+    if n_jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [func(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(func, tasks, chunksize=chunksize))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo power and sample-size planner for Models A-C.
+
+Simulates many datasets per candidate N from the cleaned data:
+  - predictors ~ multivariate normal with the empirical mean and covariance
+    of AI_USE_SCORE and the STEP 4 covariates (Model C's interaction is
+    formed from the simulated AI_USE_SCORE and writing_ability_num)
+  - outcome = X b + e, with b and the residual SD taken from the fitted
+    model unless an effect size is overridden on the command line
+
+Each simulated dataset is reduced to one cross-product matrix shared by
+Models A-C, drawn without materializing the full predictor matrix: only the
+interaction's two factors are simulated row by row (stacked (sims, N)
+arrays, in chunks so memory stays bounded), and the other predictors enter
+through exact matrix-normal / Wishart draws of their cross-products (see
+moment_sampler). Given X'X, the focus estimate and residual variance are
+drawn from their exact normal / scaled chi-square laws, so no outcomes are
+simulated and no per-dataset regressions are run. Each N runs in its own
+worker process; the default grid (25 Ns x 2000 simulations) takes about
+10 s on one core, most of it drawing the 2 x N x sims normals.
+
+Usage:
+    python scripts/power_analysis.py [--data v4_data.csv] [--sims 2000] [--effect-c -0.05] [--n-jobs 4]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from survey_data import (
+    load_analysis_frame, regression_data, build_design, model_specs, model_predictors, INTERACTION_TERM,
+)
+from parallel import parallel_map
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    HAS_PLOTTING = True
+except ImportError:
+    HAS_PLOTTING = False
+
+# Coefficient whose power is estimated in each model
+power_terms = {
+    "model_a": "AI_USE_SCORE",
+    "model_b": "AI_USE_SCORE",
+    "model_c": INTERACTION_TERM,
+}
+
+DEFAULT_N_GRID = np.unique(np.round(np.geomspace(100, 10000, 25)).astype(int))
+MAX_CHUNK_ELEMENTS = 20_000_000
+
+
+def simulation_setup(reg_data, model_key, effect=None):
+    """
+    Population values for one model: predictor moments, coefficients and residual SD.
+
+    Parameters:
+    -----------
+    reg_data : DataFrame
+        Listwise-deleted regression sample
+    model_key : str
+        "model_a", "model_b" or "model_c"
+    effect : float, optional
+        Override for the focus coefficient (raw B); default is the observed estimate
+    """
+    X, y, terms = build_design(reg_data, model_key)
+    coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+    resid = y - X @ coef
+    sigma = np.sqrt(resid @ resid / (len(y) - X.shape[1]))
+    term = power_terms[model_key]
+    j = terms.index(term)
+    if effect is not None:
+        coef = coef.copy()
+        coef[j] = effect
+    base = reg_data[model_predictors].to_numpy(dtype=float)
+    return {
+        "model_key": model_key,
+        "terms": terms,
+        "term": term,
+        "term_index": j,
+        "coef": coef,
+        "sigma": sigma,
+        "mean": base.mean(axis=0),
+        "chol": np.linalg.cholesky(np.cov(base, rowvar=False)),
+    }
+
+
+def moment_sampler(setup):
+    """
+    Constants for drawing X'X of [1, predictors, interaction] without the full predictor matrix.
+
+    Only AI_USE_SCORE and writing_ability_num (the interaction's factors)
+    are drawn row by row. The other predictors are their regression on those
+    two plus MVN noise e, so their cross-products follow exactly from
+    F = [1, ai, wa, ai * wa]: F'e is matrix normal with row covariance F'F,
+    and e'e = (F'e)'(F'F)^-1(F'e) + Wishart(n - 4).
+    """
+    cov = setup["chol"] @ setup["chol"].T
+    mean = setup["mean"]
+    a = [model_predictors.index("AI_USE_SCORE"), model_predictors.index("writing_ability_num")]
+    r = [j for j in range(len(model_predictors)) if j not in a]
+    slope = cov[np.ix_(r, a)] @ np.linalg.inv(cov[np.ix_(a, a)])
+    resid_cov = cov[np.ix_(r, r)] - slope @ cov[np.ix_(a, r)]
+    k = len(model_predictors)
+    # Map [F (4 columns), e (k - 2 columns)] onto [1, predictors in model order, interaction]
+    T = np.zeros((k + 2, 4 + len(r)))
+    T[0, 0] = 1.0
+    T[1 + a[0], 1] = T[1 + a[1], 2] = 1.0
+    T[k + 1, 3] = 1.0
+    for i, j in enumerate(r):
+        T[1 + j, 0] = mean[j] - slope[i] @ mean[a]
+        T[1 + j, 1:3] = slope[i]
+        T[1 + j, 4 + i] = 1.0
+    return {"mean": mean[a], "chol": np.linalg.cholesky(cov[np.ix_(a, a)]),
+            "resid_chol": np.linalg.cholesky(resid_cov), "T": T}
+
+
+def _moment_matrices(sampler, rng, sims, n):
+    """
+    Raw cross-product matrices of [1, predictors, interaction] for sims simulated datasets.
+
+    Any Model A-C design is a row/column subset (see _term_positions), so one
+    (sims, k + 2, k + 2) stack serves all three models.
+    """
+    (c00, _), (c10, c11) = sampler["chol"]
+    z1, z2 = rng.standard_normal((2, sims, n))
+    ai = sampler["mean"][0] + c00 * z1
+    wa = sampler["mean"][1] + c10 * z1 + c11 * z2
+    # F'F of F = [1, ai, wa, ai * wa] only needs the power sums of ai^i wa^j, i, j <= 2
+    ai2, wa2 = ai * ai, wa * wa
+    power_sum = {(0, 0): n, (1, 0): ai.sum(axis=1), (0, 1): wa.sum(axis=1),
+                 (2, 0): ai2.sum(axis=1), (0, 2): wa2.sum(axis=1), (1, 1): (ai * wa).sum(axis=1),
+                 (2, 1): (ai2 * wa).sum(axis=1), (1, 2): (ai * wa2).sum(axis=1),
+                 (2, 2): (ai2 * wa2).sum(axis=1)}
+    exponents = [(0, 0), (1, 0), (0, 1), (1, 1)]
+    FtF = np.empty((sims, 4, 4))
+    for p, (i1, j1) in enumerate(exponents):
+        for q, (i2, j2) in enumerate(exponents):
+            FtF[:, p, q] = power_sum[(i1 + i2, j1 + j2)]
+    L = sampler["resid_chol"]
+    m = len(L)
+    Fte = np.linalg.cholesky(FtF) @ rng.standard_normal((sims, 4, m)) @ L.T
+    # Bartlett decomposition of a Wishart(I, n - 4) draw
+    bartlett = np.tril(rng.standard_normal((sims, m, m)), -1)
+    idx = np.arange(m)
+    bartlett[:, idx, idx] = np.sqrt(rng.chisquare(n - 4 - idx, size=(sims, m)))
+    ete = (Fte.transpose(0, 2, 1) @ np.linalg.solve(FtF, Fte)
+           + L @ bartlett @ bartlett.transpose(0, 2, 1) @ L.T)
+    EtE = np.block([[FtF, Fte], [Fte.transpose(0, 2, 1), ete]])
+    return sampler["T"] @ EtE @ sampler["T"].T
+
+
+def _term_positions(terms):
+    """Rows of the _moment_matrices stack that make up a model's design."""
+    lookup = {"Intercept": 0, INTERACTION_TERM: len(model_predictors) + 1}
+    return [lookup[term] if term in lookup else 1 + model_predictors.index(term) for term in terms]
+
+
+def _focus_estimates(xtx, setup, rng):
+    """
+    Estimate and SE of the focus coefficient drawn from their exact sampling law.
+
+    With normal errors and X fixed, B_j ~ N(b_j, sigma^2 [(X'X)^-1]_jj) and
+    s^2 ~ sigma^2 chi2(n - p) / (n - p) independently, so no outcome vector
+    or residuals have to be simulated.
+    """
+    n, p = int(xtx[0, 0, 0]), xtx.shape[-1]
+    j = setup["term_index"]
+    v = np.linalg.inv(xtx)[:, j, j]
+    sims = len(xtx)
+    b = setup["coef"][j] + setup["sigma"] * np.sqrt(v) * rng.standard_normal(sims)
+    s2 = setup["sigma"] ** 2 * rng.chisquare(n - p, size=sims) / (n - p)
+    return b, np.sqrt(s2 * v)
+
+
+def simulate_power(setups, n, sims=2000, alpha=0.05, seed=0):
+    """
+    Power for every model's focus coefficient at sample size n.
+
+    The predictor draws are shared by all models (they have the same
+    population moments): each simulated dataset is reduced once to its
+    cross-product matrix, and Models A, B and C read their X'X from it.
+
+    Returns:
+    --------
+    dict : {model_key: power, Monte Carlo SE, mean estimate and mean SE}
+    """
+    rng = np.random.default_rng(seed)
+    sampler = moment_sampler(next(iter(setups.values())))
+    chunk = max(1, min(sims, MAX_CHUNK_ELEMENTS // (n * 6)))
+    positions = {key: _term_positions(setup["terms"]) for key, setup in setups.items()}
+    acc = {key: {"rejections": 0, "B": [], "SE": []} for key in setups}
+    done = 0
+    while done < sims:
+        s = min(chunk, sims - done)
+        M = _moment_matrices(sampler, rng, s, n)
+        for key, setup in setups.items():
+            idx = positions[key]
+            b, se = _focus_estimates(M[:, idx][:, :, idx], setup, rng)
+            pvals = 2 * t_dist.sf(np.abs(b / se), n - len(idx))
+            acc[key]["rejections"] += int((pvals < alpha).sum())
+            acc[key]["B"].append(b)
+            acc[key]["SE"].append(se)
+        done += s
+
+    results = {}
+    for key, a in acc.items():
+        power = a["rejections"] / sims
+        results[key] = {
+            "power": power,
+            "mcse": np.sqrt(power * (1 - power) / sims),
+            "mean_B": float(np.concatenate(a["B"]).mean()),
+            "mean_SE": float(np.concatenate(a["SE"]).mean()),
+        }
+    return results
+
+
+def _power_cell(task):
+    setups, n, sims, alpha, seed = task
+    rows = []
+    for key, result in simulate_power(setups, n, sims, alpha, seed).items():
+        setup = setups[key]
+        result.update({
+            "Model": model_specs[key]["model_name"],
+            "Outcome": model_specs[key]["outcome_name"],
+            "term": setup["term"],
+            "B": setup["coef"][setup["term_index"]],
+            "N": n,
+        })
+        rows.append(result)
+    return rows
+
+
+def power_curves(reg_data, n_grid=None, sims=2000, alpha=0.05, effects=None, seed=42, n_jobs=None):
+    """
+    Power curves for Models A-C over a grid of sample sizes.
+
+    Parameters:
+    -----------
+    effects : dict, optional
+        {model_key: B} overrides for the focus coefficients
+
+    Returns:
+    --------
+    DataFrame : one row per model x N
+    """
+    n_grid = DEFAULT_N_GRID if n_grid is None else n_grid
+    effects = effects or {}
+    setups = {key: simulation_setup(reg_data, key, effects.get(key)) for key in power_terms}
+    rng = np.random.default_rng(seed)
+    # Largest N first so the slow cells do not trail at the end
+    tasks = [(setups, int(n), sims, alpha, int(rng.integers(0, 2 ** 31 - 1)))
+             for n in sorted(n_grid, reverse=True)]
+    results = parallel_map(_power_cell, tasks, n_jobs=n_jobs)
+    table = pd.DataFrame([row for rows in results for row in rows])
+    columns = ["Model", "Outcome", "term", "B", "N", "power", "mcse", "mean_B", "mean_SE"]
+    return table[columns].sort_values(["Model", "N"]).reset_index(drop=True)
+
+
+def required_n(curves, target=0.80):
+    """Smallest N on the grid reaching the target power, per model (NaN if none does)."""
+    rows = []
+    for model, group in curves.groupby("Model"):
+        reached = group[group["power"] >= target]
+        rows.append({"Model": model, "term": group["term"].iloc[0],
+                     "N_required": reached["N"].min() if len(reached) else np.nan})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--sims", type=int, default=2000)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--target", type=float, default=0.80)
+    parser.add_argument("--effect-a", type=float, default=None, help="AI_USE_SCORE B in Model A")
+    parser.add_argument("--effect-b", type=float, default=None, help="AI_USE_SCORE B in Model B")
+    parser.add_argument("--effect-c", type=float, default=None, help="Interaction B in Model C")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("MONTE CARLO POWER ANALYSIS (Models A-C)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    reg_data = regression_data(adf)
+    print(f"Population values from N = {len(reg_data)} (listwise deletion)")
+
+    effects = {key: value for key, value in
+               [("model_a", args.effect_a), ("model_b", args.effect_b), ("model_c", args.effect_c)]
+               if value is not None}
+    curves = power_curves(reg_data, sims=args.sims, alpha=args.alpha, effects=effects,
+                          seed=args.seed, n_jobs=args.n_jobs)
+
+    needed = required_n(curves, args.target)
+    print(f"\nSmallest N with power >= {args.target:.2f} ({args.sims} simulations per N):")
+    for _, row in needed.iterrows():
+        B = curves.loc[curves["Model"] == row["Model"], "B"].iloc[0]
+        n_text = f"N = {int(row['N_required'])}" if pd.notna(row["N_required"]) else \
+            f"not reached by N = {curves['N'].max()}"
+        print(f"  {row['Model']} ({row['term']}, B = {B:.3f}): {n_text}")
+
+    os.makedirs("tables", exist_ok=True)
+    curves.to_csv("tables/power_curves.csv", index=False)
+    print("\n✓ Exported: tables/power_curves.csv")
+
+    if HAS_PLOTTING:
+        os.makedirs("figures", exist_ok=True)
+        fig, ax = plt.subplots(figsize=(8, 5))
+        for model, group in curves.groupby("Model"):
+            ax.plot(group["N"], group["power"], marker="o", markersize=3,
+                    label=f"{model} ({group['term'].iloc[0]})")
+        ax.axhline(args.target, color="grey", linestyle="--", linewidth=1)
+        ax.set_xscale("log")
+        ax.set_xlabel("Sample size (N)")
+        ax.set_ylabel("Power")
+        ax.set_title("Simulated power by sample size")
+        ax.legend()
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig("figures/power_curves.png", dpi=300, bbox_inches="tight")
+        plt.close()
+        print("✓ Exported: figures/power_curves.png")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Local HTTP query service for on-demand subgroup statistics and models.
+
+Answers requests such as "the correlation for 11th-grade girls" or "Model B
+without the policy covariate" without a manual script run. The scored
+dataset is loaded once and held in memory; every request is a JSON POST:
+
+  POST /describe   {"filters": {...}, "variables": [...]}
+  POST /correlate  {"filters": {...}, "variables": [...]}
+  POST /regress    {"filters": {...}, "formula": "AUTHORSHIP_SCORE ~ AI_USE_SCORE + grade_num"}
+                   or {"model": "model_b", "drop": ["overall_policy_num"]}
+  GET  /health, GET /cache
+
+Filters map a column to a value ({"grade_num": 11, "gender": "Female"}), a
+list of allowed values, or comparisons ({"AI_USE_SCORE": {">=": 3}}).
+Ordering comparisons (<, <=, >, >=) are only accepted on numeric columns,
+and numeric columns only compare against numbers.
+
+Requests are normalized (sorted filters and value lists, parsed formula
+terms) and the result is memoized in a bounded LRU keyed on that normal
+form; concurrent identical requests share one computation. Descriptives and
+correlations use a single cross-product of the filtered rows and run on the
+event loop; regressions are sent to a process pool whose workers hold their
+own copy of the dataset, so the loop stays responsive. Built on asyncio
+streams only (no web framework); it binds to localhost by default.
+
+Usage:
+    python scripts/query_service.py [--data v4_data.csv] [--port 8765] [--cache-size 256] [--n-jobs 2]
+
+    curl -s localhost:8765/correlate -d '{"filters": {"grade_num": 11, "gender": "Female"},
+         "variables": ["AI_USE_SCORE", "AUTHORSHIP_SCORE"]}'
+"""
+
+import argparse
+import asyncio
+import json
+import math
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from survey_data import load_analysis_frame, model_specs
+from parallel import resolve_n_jobs
+
+MAX_BODY_BYTES = 1 << 20
+COMPARISONS = {"==": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+               ">": np.greater, ">=": np.greater_equal}
+ORDERING = {"<", "<=", ">", ">="}
+
+
+class RequestError(ValueError):
+    """Invalid request; reported to the client as 400."""
+
+
+# ----------------------------------------------------------------------------
+# Request normalization
+# ----------------------------------------------------------------------------
+
+def _json_scalar(value):
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    raise RequestError(f"Unsupported filter value: {value!r}")
+
+
+def _check_comparison(column, op, value, numeric):
+    """Reject comparisons that cannot be evaluated on the column's type."""
+    if numeric is None:
+        return
+    if column in numeric:
+        if not isinstance(value, (bool, int, float)):
+            raise RequestError(f"{column} is numeric; {op!r} needs a number, got {value!r}")
+    elif op in ORDERING:
+        raise RequestError(f"Comparison {op!r} needs a numeric column; {column} is text")
+
+
+def normalize_filters(filters, columns, numeric=None):
+    """
+    Canonical filter list [(column, op, value or sorted values)].
+
+    numeric is the set of numeric columns; when given, comparisons are
+    checked against the column types.
+    """
+    if filters is None:
+        return []
+    if not isinstance(filters, dict):
+        raise RequestError("filters must be an object")
+    out = []
+    for column in sorted(filters):
+        if column not in columns:
+            raise RequestError(f"Unknown filter column: {column}")
+        spec = filters[column]
+        if isinstance(spec, dict):
+            for op in sorted(spec):
+                if op not in COMPARISONS:
+                    raise RequestError(f"Unknown comparison {op!r} for {column}")
+                value = _json_scalar(spec[op])
+                _check_comparison(column, op, value, numeric)
+                out.append([column, op, value])
+        elif isinstance(spec, list):
+            values = sorted({_json_scalar(v) for v in spec}, key=lambda v: (str(type(v)), v))
+            out.append([column, "in", values])
+        else:
+            value = _json_scalar(spec)
+            _check_comparison(column, "==", value, numeric)
+            out.append([column, "==", value])
+    return out
+
+
+def parse_formula(formula):
+    """'y ~ a + b*c' -> (y, [a, b, c, b:c]) with '*' expanded and duplicates dropped."""
+    if not isinstance(formula, str) or formula.count("~") != 1:
+        raise RequestError("formula must look like 'outcome ~ term + term'")
+    left, right = (side.strip() for side in formula.split("~"))
+    terms = []
+    for piece in right.split("+"):
+        piece = piece.strip()
+        if not piece or piece == "1":
+            continue
+        if "*" in piece:
+            parts = [p.strip() for p in piece.split("*")]
+            expanded = parts + [":".join(parts)]
+        else:
+            expanded = [":".join(p.strip() for p in piece.split(":"))]
+        terms += [t for t in expanded if t not in terms]
+    if not left or not terms:
+        raise RequestError("formula needs an outcome and at least one term")
+    return left, terms
+
+
+def _statsmodels_terms(spec_terms):
+    return [t for t in spec_terms if t != "Intercept"]
+
+
+def normalize_request(endpoint, body, columns, numeric=None):
+    """Canonical, hashable form of a request; raises RequestError on bad input."""
+    if not isinstance(body, dict):
+        raise RequestError("request body must be a JSON object")
+    request = {"endpoint": endpoint, "filters": normalize_filters(body.get("filters"), columns, numeric)}
+    if endpoint in ("describe", "correlate"):
+        variables = body.get("variables")
+        if not isinstance(variables, list) or not variables:
+            raise RequestError("variables must be a non-empty list")
+        unknown = [v for v in variables if v not in columns]
+        if unknown:
+            raise RequestError(f"Unknown variables: {unknown}")
+        # Output follows the requested order, so it is part of the key
+        request["variables"] = list(dict.fromkeys(variables))
+        if endpoint == "correlate" and len(request["variables"]) < 2:
+            raise RequestError("correlate needs at least two variables")
+    elif endpoint == "regress":
+        if "formula" in body:
+            outcome, terms = parse_formula(body["formula"])
+        elif body.get("model") in model_specs:
+            spec = model_specs[body["model"]]
+            outcome, terms = spec["outcome_name"], _statsmodels_terms(spec["terms"])
+        else:
+            raise RequestError(f"regress needs a formula or a model in {sorted(model_specs)}")
+        drop = body.get("drop", [])
+        terms = [t for t in terms if t not in drop and not any(part in drop for part in t.split(":"))]
+        unknown = [v for v in {outcome, *(p for t in terms for p in t.split(":"))} if v not in columns]
+        if unknown:
+            raise RequestError(f"Unknown variables: {sorted(unknown)}")
+        if not terms:
+            raise RequestError("no terms left in the model")
+        # Term order only changes the output order, so the key uses the sorted set
+        request["outcome"] = outcome
+        request["terms"] = sorted(terms)
+    else:
+        raise RequestError(f"Unknown endpoint: /{endpoint}")
+    return request
+
+
+def request_key(request):
+    return json.dumps(request, sort_keys=True, separators=(",", ":"))
+
+
+# ----------------------------------------------------------------------------
+# Statistics (pure functions of a dataframe and a normalized request)
+# ----------------------------------------------------------------------------
+
+def apply_filters(adf, filters):
+    mask = np.ones(len(adf), dtype=bool)
+    for column, op, value in filters:
+        values = adf[column]
+        if op == "in":
+            mask &= values.isin(value).to_numpy()
+        else:
+            mask &= COMPARISONS[op](values.to_numpy(), value) & values.notna().to_numpy()
+    return adf[mask]
+
+
+def _numeric(data, variables):
+    try:
+        return data[variables].to_numpy(dtype=float)
+    except (TypeError, ValueError):
+        raise RequestError("variables must be numeric")
+
+
+def describe(adf, request):
+    """N, mean, SD, min and max of each variable (pairwise available cases)."""
+    data = apply_filters(adf, request["filters"])
+    X = _numeric(data, request["variables"])
+    ok = ~np.isnan(X)
+    n = ok.sum(axis=0)
+    Z = np.where(ok, X, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = Z.sum(axis=0) / n
+        sd = np.sqrt(((np.where(ok, X - mean, 0.0)) ** 2).sum(axis=0) / (n - 1))
+        lo = np.where(ok, X, np.inf).min(axis=0)
+        hi = np.where(ok, X, -np.inf).max(axis=0)
+    rows = [{"variable": v, "N": int(n[i]), "mean": mean[i], "sd": sd[i],
+             "min": lo[i] if n[i] else None, "max": hi[i] if n[i] else None}
+            for i, v in enumerate(request["variables"])]
+    return {"n_rows": len(data), "statistics": rows}
+
+
+def correlate(adf, request):
+    """Listwise Pearson correlations with two-sided p-values from one cross-product."""
+    data = apply_filters(adf, request["filters"])
+    X = _numeric(data, request["variables"])
+    X = X[~np.isnan(X).any(axis=1)]
+    n = len(X)
+    if n < 3:
+        raise RequestError(f"only {n} complete cases after filtering")
+    Xc = X - X.mean(axis=0)
+    cross = Xc.T @ Xc
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(np.diag(cross))
+        r = cross / np.outer(sd, sd)
+        t = r * np.sqrt((n - 2) / np.maximum(1 - r ** 2, 1e-300))
+    p = 2 * t_dist.sf(np.abs(t), n - 2)
+    variables = request["variables"]
+    pairs = [{"x": variables[i], "y": variables[j], "r": r[i, j], "p": p[i, j]}
+             for i in range(len(variables)) for j in range(i + 1, len(variables))]
+    return {"N": n, "variables": variables, "r": r.tolist(), "pairs": pairs}
+
+
+def regress(adf, request):
+    """OLS with intercept for the request's outcome and terms (listwise deletion)."""
+    data = apply_filters(adf, request["filters"])
+    base = sorted({request["outcome"], *(p for t in request["terms"] for p in t.split(":"))})
+    data = data[base]
+    values = _numeric(data, base)
+    data = data[~np.isnan(values).any(axis=1)]
+    columns = [np.ones(len(data))]
+    for term in request["terms"]:
+        col = np.ones(len(data))
+        for part in term.split(":"):
+            col = col * data[part].to_numpy(dtype=float)
+        columns.append(col)
+    X = np.column_stack(columns)
+    y = data[request["outcome"]].to_numpy(dtype=float)
+    n, k = X.shape
+    if n <= k:
+        raise RequestError(f"only {n} complete cases for {k} parameters")
+    Q, R = np.linalg.qr(X)
+    if np.abs(np.diag(R)).min() < 1e-10 * np.abs(np.diag(R)).max():
+        raise RequestError("design is rank deficient for this subgroup (a term is constant or collinear)")
+    coef = np.linalg.solve(R, Q.T @ y)
+    resid = y - X @ coef
+    dof = n - k
+    s2 = resid @ resid / dof
+    R_inv = np.linalg.inv(R)
+    se = np.sqrt(s2 * (R_inv ** 2).sum(axis=1))
+    t = coef / se
+    sst = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - resid @ resid / sst
+    names = ["Intercept"] + request["terms"]
+    return {
+        "N": n,
+        "outcome": request["outcome"],
+        "R2": r2,
+        "adj_R2": 1 - (1 - r2) * (n - 1) / dof,
+        "coefficients": [{"term": name, "B": coef[i], "SE": se[i], "t": t[i],
+                          "p": 2 * t_dist.sf(abs(t[i]), dof)} for i, name in enumerate(names)],
+    }
+
+
+handlers = {"describe": describe, "correlate": correlate, "regress": regress}
+# Endpoints sent to the process pool; the rest run on the event loop
+offloaded = {"regress"}
+
+_WORKER = {}
+
+
+def _init_worker(path):
+    _WORKER["adf"] = load_analysis_frame(path)
+
+
+def _run_in_worker(request):
+    return handlers[request["endpoint"]](_WORKER["adf"], request)
+
+
+# ----------------------------------------------------------------------------
+# Cache and HTTP plumbing
+# ----------------------------------------------------------------------------
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and hit/miss counters."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def discard(self, key):
+        self.data.pop(key, None)
+
+    def info(self):
+        return {"size": len(self.data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+def _clean(value):
+    """JSON-safe copy: numpy scalars to Python, NaN/inf to null."""
+    if isinstance(value, dict):
+        return {k: _clean(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class QueryService:
+    """In-memory dataset, result cache and process pool behind the HTTP handler."""
+
+    def __init__(self, data_path, cache_size=256, n_jobs=None):
+        self.data_path = data_path
+        self.adf = load_analysis_frame(data_path)
+        self.columns = set(self.adf.columns)
+        self.numeric = set(self.adf.select_dtypes("number").columns)
+        self.cache = LRUCache(cache_size)
+        self.pool = ProcessPoolExecutor(max_workers=resolve_n_jobs(n_jobs),
+                                        initializer=_init_worker, initargs=(data_path,))
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    async def answer(self, endpoint, body):
+        """Result for one request, from the cache when possible."""
+        request = normalize_request(endpoint, body, self.columns, self.numeric)
+        key = request_key(request)
+        cached = self.cache.get(key)
+        if cached is None:
+            # Cache the future itself so identical in-flight requests share one computation
+            cached = asyncio.ensure_future(self._compute(request))
+            self.cache.put(key, cached)
+            try:
+                await cached
+            except Exception:
+                self.cache.discard(key)
+                raise
+        return await cached
+
+    async def _compute(self, request):
+        if request["endpoint"] in offloaded:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.pool, _run_in_worker, request)
+        else:
+            result = handlers[request["endpoint"]](self.adf, request)
+        return _clean({"request": request, "result": result})
+
+    async def route(self, method, path, body):
+        """(status, payload) for one HTTP request."""
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {"status": "ok", "rows": len(self.adf), "data": self.data_path}
+        if method == "GET" and path == "/cache":
+            return HTTPStatus.OK, self.cache.info()
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST with a JSON body"}
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": f"invalid JSON: {exc}"}
+        try:
+            return HTTPStatus.OK, await self.answer(path.lstrip("/"), payload)
+        except RequestError as exc:
+            status = HTTPStatus.NOT_FOUND if str(exc).startswith("Unknown endpoint") else HTTPStatus.BAD_REQUEST
+            return status, {"error": str(exc)}
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+            method, path = parts[0].upper(), parts[1]
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value.strip() or 0)
+            if length > MAX_BODY_BYTES:
+                status, payload = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "request body too large"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self.route(method, path, body)
+                except Exception as exc:  # report, keep serving
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}
+            data = json.dumps(payload).encode()
+            writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                         f"Content-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\n"
+                         f"Connection: close\r\n\r\n".encode() + data)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(service, host="127.0.0.1", port=8765):
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"✓ Serving {len(service.adf)} rows from {service.data_path} on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-size", type=int, default=256)
+    parser.add_argument("--n-jobs", type=int, default=None, help="Worker processes for model fits")
+    args = parser.parse_args()
+
+    service = QueryService(args.data, args.cache_size, args.n_jobs)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
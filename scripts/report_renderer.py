@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Render the results summary and APA-style tables from saved results bundles.
+
+A bundle is a directory of Step 6 outputs: tables/table1-4 CSVs and
+tables/regression_results.json, plus v4_analysis_results.json for the
+pairwise key correlations (analysis_api.write_outputs writes exactly this
+layout; for the repository root the JSON is found in archive/). Nothing
+is recomputed. A bundle is named after its directory, except the repository
+root, which is always labelled "final_analysis_v4" whatever the checkout
+is called. The bundle is formatted into template variables and
+substituted into scripts/report_templates/report.{md,tex,txt}
+(string.Template, so $name is a value and $$ a literal dollar sign).
+
+Template variables:
+  source, n_final
+  {ai_use,creativity,authorship}_{n,mean,sd,min,max,alpha}
+  r_{pair}, p_{pair}     pair = ai_use_creativity, ai_use_authorship,
+                         creativity_authorship ("< .001" / "= .642")
+  {model_a,model_b}_{n,r2,b,se,p}   AI use coefficient
+  model_c_{n,r2,b,se,p}             AI use x writing ability interaction
+  table1 ... table4, clusters       rendered tables / cluster list
+Missing statistics render as "n/a" and missing tables as a short note.
+
+Templates are read once, and each variant (wave, subgroup, school bundle)
+takes a few milliseconds, so a whole directory of bundles renders in one
+batch.
+
+Usage:
+    python scripts/report_renderer.py [--bundle .] [--format markdown latex text] [--out-dir reports]
+    python scripts/report_renderer.py --bundle "batch_outputs/*" --format text
+    python scripts/report_renderer.py --bundle . --format text --stdout
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+from dataclasses import dataclass
+from string import Template
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_templates")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_BUNDLE = "final_analysis_v4"
+SUMMARY_FILES = ["v4_analysis_results.json", os.path.join("archive", "v4_analysis_results.json")]
+
+short_names = {"AI_USE_SCORE": "ai_use", "CREATIVITY_GENERAL": "creativity", "AUTHORSHIP_SCORE": "authorship"}
+labels = {
+    "AI_USE_SCORE": "AI use",
+    "CREATIVITY_GENERAL": "Creativity (general)",
+    "AUTHORSHIP_SCORE": "Authorship",
+    "writing_ability_num": "Writing ability",
+    "artificial_intelligence_instruction_num": "AI instruction",
+    "overall_policy_num": "AI policy",
+}
+key_pairs = ["ai_use_creativity", "ai_use_authorship", "creativity_authorship"]
+
+
+# ----------------------------------------------------------------------------
+# Bundles
+# ----------------------------------------------------------------------------
+
+@dataclass
+class ResultsBundle:
+    name: str
+    path: str
+    table1: pd.DataFrame
+    table2: pd.DataFrame
+    table3: Optional[pd.DataFrame]
+    regression: Optional[dict]
+    clusters: Optional[pd.DataFrame]
+    summary: Optional[dict]
+
+
+def bundle_name(path):
+    """Report name of a bundle: its directory name, or ROOT_BUNDLE for the repository root."""
+    path = os.path.abspath(path)
+    return ROOT_BUNDLE if path == REPO_ROOT else os.path.basename(path)
+
+
+def load_bundle(path, name=None):
+    """
+    Read one bundle directory (see module docstring).
+
+    Table 1 and Table 2 are required; the regression, cluster and summary
+    files are optional.
+    """
+    tables = os.path.join(path, "tables")
+    if not os.path.isdir(tables):
+        tables = path
+
+    def optional(filename, reader):
+        file = os.path.join(tables, filename)
+        return reader(file) if os.path.exists(file) else None
+
+    def read_json(file):
+        with open(file) as f:
+            return json.load(f)
+
+    table1 = pd.read_csv(os.path.join(tables, "table1_descriptives_reliability.csv"))
+    table2 = pd.read_csv(os.path.join(tables, "table2_correlation_matrix.csv"), index_col=0)
+    summary = next((read_json(os.path.join(path, f)) for f in SUMMARY_FILES
+                    if os.path.exists(os.path.join(path, f))), None)
+    return ResultsBundle(
+        name=name or bundle_name(path),
+        path=path,
+        table1=table1,
+        table2=table2,
+        table3=optional("table3_regression_summary.csv", pd.read_csv),
+        regression=optional("regression_results.json", read_json),
+        clusters=optional("table4_cluster_profiles.csv", pd.read_csv),
+        summary=summary,
+    )
+
+
+# ----------------------------------------------------------------------------
+# Output styles
+# ----------------------------------------------------------------------------
+
+class TextStyle:
+    name = "text"
+    ext = ".txt"
+    minus = "-"
+    dash = "—"
+
+    def escape(self, text):
+        return text
+
+    def bullets(self, items):
+        return "\n".join(f"  • {item}" for item in items)
+
+    def missing(self, what):
+        return f"{what}: not available in this bundle"
+
+    def table(self, header, rows, align):
+        cells = [header] + rows
+        widths = [max(len(row[j]) for row in cells) for j in range(len(header))]
+
+        def line(row):
+            return "  ".join(c.ljust(w) if a == "l" else c.rjust(w) for c, w, a in zip(row, widths, align)).rstrip()
+
+        rule = "-" * (sum(widths) + 2 * (len(widths) - 1))
+        return "\n".join([rule, line(header), rule] + [line(r) for r in rows] + [rule])
+
+
+class MarkdownStyle(TextStyle):
+    name = "markdown"
+    ext = ".md"
+
+    def escape(self, text):
+        return text.replace("|", "\\|").replace("_", "\\_").replace("*", "\\*")
+
+    def bullets(self, items):
+        return "\n".join(f"- {item}" for item in items)
+
+    def missing(self, what):
+        return f"*{what}: not available in this bundle.*"
+
+    def table(self, header, rows, align):
+        rule = ["---:" if a == "r" else ":---" for a in align]
+        return "\n".join("| " + " | ".join(row) + " |" for row in [header, rule] + rows)
+
+
+class LatexStyle(TextStyle):
+    name = "latex"
+    ext = ".tex"
+    minus = "$-$"
+    dash = "---"
+    _special = {"\\": r"\textbackslash{}", "&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#",
+                "_": r"\_", "{": r"\{", "}": r"\}", "~": r"\textasciitilde{}", "^": r"\textasciicircum{}"}
+
+    def escape(self, text):
+        return "".join(self._special.get(c, c) for c in text)
+
+    def bullets(self, items):
+        return "\n".join([r"\begin{itemize}"] + [rf"  \item {item}" for item in items] + [r"\end{itemize}"])
+
+    def missing(self, what):
+        return rf"\textit{{{what}: not available in this bundle.}}"
+
+    def table(self, header, rows, align):
+        lines = [rf"\begin{{tabular}}{{{''.join(align)}}}", r"\toprule", " & ".join(header) + r" \\", r"\midrule"]
+        lines += [" & ".join(row) + r" \\" for row in rows]
+        return "\n".join(lines + [r"\bottomrule", r"\end{tabular}"])
+
+
+styles = {style.name: style for style in (MarkdownStyle(), LatexStyle(), TextStyle())}
+
+
+# ----------------------------------------------------------------------------
+# APA number formatting
+# ----------------------------------------------------------------------------
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def apa_number(value, style, digits=2, leading_zero=True):
+    """Fixed decimals; leading_zero=False for statistics bounded by 1 (r, alpha, R2, p)."""
+    if _missing(value):
+        return "n/a"
+    text = f"{abs(value):.{digits}f}"
+    if not leading_zero and text.startswith("0"):
+        text = text[1:]
+    return (style.minus if value < 0 and float(text) != 0 else "") + text
+
+
+def apa_p(value, style):
+    """'< .001' or '= .642' (the caller writes the p)."""
+    if _missing(value):
+        return "n/a"
+    if value < 0.001:
+        return "< .001"
+    return "= " + apa_number(value, style, 3, leading_zero=False)
+
+
+def apa_count(value):
+    return "n/a" if _missing(value) else str(int(value))
+
+
+# ----------------------------------------------------------------------------
+# Context and tables
+# ----------------------------------------------------------------------------
+
+def table1_text(bundle, style):
+    header = ["Variable", "N", "M", "SD", "Min", "Max", "α" if style.name != "latex" else r"$\alpha$"]
+    rows = [[style.escape(labels.get(r["variable_name"], r["variable_name"])), apa_count(r["N"]),
+             apa_number(r["mean"], style), apa_number(r["sd"], style), apa_number(r["min"], style),
+             apa_number(r["max"], style), apa_number(r["alpha"], style, leading_zero=False)]
+            for _, r in bundle.table1.iterrows()]
+    return style.table(header, rows, ["l"] + ["r"] * 6)
+
+
+def table2_text(bundle, style):
+    """Lower triangle with numbered variables, APA layout."""
+    corr = bundle.table2
+    n = len(corr)
+    header = ["Variable"] + [str(j + 1) for j in range(n)]
+    rows = []
+    for i, var in enumerate(corr.index):
+        cells = [apa_number(corr.iloc[i, j], style, leading_zero=False) if j < i else style.dash if j == i else ""
+                 for j in range(n)]
+        rows.append([f"{i + 1}. " + style.escape(labels.get(var, var))] + cells)
+    return style.table(header, rows, ["l"] + ["r"] * n)
+
+
+def table3_text(bundle, style):
+    if bundle.table3 is None:
+        return style.missing("Table 3")
+    header = ["Model", "Outcome", "N", "R²" if style.name != "latex" else "$R^2$", "B", "SE", "p"]
+    rows = [[style.escape(r["Model"]), style.escape(labels.get(r["Outcome"], r["Outcome"])), apa_count(r["N"]),
+             apa_number(r["R2"], style, leading_zero=False), apa_number(r["AI_USE_B"], style),
+             apa_number(r["AI_USE_SE"], style), apa_p(r["AI_USE_p"], style).lstrip("= ")]
+            for _, r in bundle.table3.iterrows()]
+    return style.table(header, rows, ["l", "l"] + ["r"] * 5)
+
+
+def table4_text(bundle, style):
+    if bundle.clusters is None:
+        return style.missing("Table 4")
+    variables = [c for c in bundle.clusters.columns if c not in ("cluster", "N")]
+    header = ["Cluster", "N"] + [style.escape(labels.get(v, v)) for v in variables]
+    rows = [[str(int(r["cluster"])), apa_count(r["N"])] + [apa_number(r[v], style) for v in variables]
+            for _, r in bundle.clusters.iterrows()]
+    return style.table(header, rows, ["l"] + ["r"] * (len(variables) + 1))
+
+
+def report_context(bundle, style):
+    """Template variables for one bundle in one output style (see module docstring)."""
+    ctx = {"source": style.escape(bundle.name)}
+    summary = bundle.summary or {}
+    n_final = summary.get("sample_size", bundle.table1["N"].max())
+    ctx["n_final"] = apa_count(n_final)
+
+    rows = bundle.table1.set_index("variable_name")
+    for var, short in short_names.items():
+        r = rows.loc[var] if var in rows.index else {}
+        ctx[f"{short}_n"] = apa_count(r.get("N"))
+        for stat in ("mean", "sd", "min", "max"):
+            ctx[f"{short}_{stat}"] = apa_number(r.get(stat), style)
+        ctx[f"{short}_alpha"] = apa_number(r.get("alpha"), style, leading_zero=False)
+
+    correlations = summary.get("correlations", {})
+    for pair in key_pairs:
+        c = correlations.get(pair, {})
+        ctx[f"r_{pair}"] = apa_number(c.get("r"), style, leading_zero=False)
+        ctx[f"p_{pair}"] = apa_p(c.get("p"), style)
+
+    regression = bundle.regression or {}
+    for key in ("model_a", "model_b", "model_c"):
+        m = regression.get(key, {})
+        prefix = "interaction" if key == "model_c" else "AI_USE_SCORE"
+        ctx[f"{key}_n"] = apa_count(m.get("N"))
+        ctx[f"{key}_r2"] = apa_number(m.get("R2"), style, leading_zero=False)
+        ctx[f"{key}_b"] = apa_number(m.get(f"{prefix}_B"), style)
+        ctx[f"{key}_se"] = apa_number(m.get(f"{prefix}_SE"), style)
+        ctx[f"{key}_p"] = apa_p(m.get(f"{prefix}_p"), style)
+
+    ctx["table1"] = table1_text(bundle, style)
+    ctx["table2"] = table2_text(bundle, style)
+    ctx["table3"] = table3_text(bundle, style)
+    ctx["table4"] = table4_text(bundle, style)
+    if bundle.clusters is None:
+        ctx["clusters"] = style.missing("Cluster profiles")
+    else:
+        ctx["clusters"] = style.bullets(
+            f"Cluster {int(r['cluster'])}: N = {int(r['N'])}, AI use = {apa_number(r['AI_USE_SCORE'], style)}, "
+            f"creativity = {apa_number(r['CREATIVITY_GENERAL'], style)}, "
+            f"authorship = {apa_number(r['AUTHORSHIP_SCORE'], style)}"
+            for _, r in bundle.clusters.iterrows())
+    return ctx
+
+
+# ----------------------------------------------------------------------------
+# Rendering
+# ----------------------------------------------------------------------------
+
+_templates = {}
+
+
+def load_template(fmt, template_dir=TEMPLATE_DIR):
+    """string.Template for one format, read once per process."""
+    key = (fmt, template_dir)
+    if key not in _templates:
+        with open(os.path.join(template_dir, "report" + styles[fmt].ext), encoding="utf-8") as f:
+            _templates[key] = Template(f.read())
+    return _templates[key]
+
+
+def render_report(bundle, fmt, template_dir=TEMPLATE_DIR):
+    """
+    Render one bundle in one format.
+
+    Parameters:
+    -----------
+    bundle : ResultsBundle
+    fmt : str
+        'markdown', 'latex' or 'text'
+    template_dir : str
+        Directory holding report.md / report.tex / report.txt
+
+    Returns:
+    --------
+    str
+    """
+    try:
+        return load_template(fmt, template_dir).substitute(report_context(bundle, styles[fmt]))
+    except KeyError as exc:
+        raise KeyError(f"report{styles[fmt].ext} uses unknown template variable {exc}") from None
+
+
+def render_batch(paths, formats, out_dir, template_dir=TEMPLATE_DIR):
+    """
+    Render every bundle in every format into out_dir/<bundle name><ext>.
+
+    Returns:
+    --------
+    pd.DataFrame : one row per bundle with the written paths, seconds and any error
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    names = [bundle_name(p) for p in paths]
+    rows = []
+    for path, name in zip(paths, names):
+        # Bundles from different parents can share a directory name
+        if names.count(name) > 1:
+            name = os.path.relpath(path).replace(os.sep, "_")
+        start = time.perf_counter()
+        row = {"bundle": name, "path": path, "written": "", "error": ""}
+        try:
+            bundle = load_bundle(path, name)
+            written = []
+            for fmt in formats:
+                out = os.path.join(out_dir, name + styles[fmt].ext)
+                with open(out, "w", encoding="utf-8") as f:
+                    f.write(render_report(bundle, fmt, template_dir))
+                written.append(out)
+            row["written"] = " ".join(written)
+        except (OSError, KeyError, ValueError, pd.errors.ParserError) as exc:
+            row["error"] = f"{type(exc).__name__}: {exc}"
+        row["seconds"] = time.perf_counter() - start
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def expand_bundles(patterns):
+    """Bundle directories for a list of paths and glob patterns, in order."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(p for p in glob.glob(pattern) if os.path.isdir(p)) or [pattern]
+        paths += [p for p in matches if p not in paths]
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--bundle", nargs="+", default=["."],
+                        help="Bundle directories or glob patterns (one report per bundle)")
+    parser.add_argument("--format", nargs="+", choices=list(styles), default=list(styles))
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--template-dir", default=TEMPLATE_DIR)
+    parser.add_argument("--stdout", action="store_true", help="Print the first bundle's first format instead")
+    args = parser.parse_args()
+
+    paths = expand_bundles(args.bundle)
+    if args.stdout:
+        print(render_report(load_bundle(paths[0]), args.format[0], args.template_dir))
+        return
+
+    print("=" * 70)
+    print("REPORT RENDERING FROM RESULTS BUNDLES")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    manifest = render_batch(paths, args.format, args.out_dir, args.template_dir)
+    elapsed = time.perf_counter() - start
+    failed = manifest["error"] != ""
+    print(f"✓ Rendered {(~failed).sum()} of {len(manifest)} bundles x {len(args.format)} formats "
+          f"in {elapsed * 1000:.0f} ms")
+    for _, row in manifest[failed].iterrows():
+        print(f"  ⚠ {row['path']}: {row['error']}")
+    for _, row in manifest[~failed].head(10).iterrows():
+        for path in row["written"].split():
+            print(f"✓ Exported: {path}")
+    if (~failed).sum() > 10:
+        print(f"  ... and {(~failed).sum() - 10} more bundles")
+
+
+if __name__ == "__main__":
+    main()
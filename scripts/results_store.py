@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Versioned results store (SQLite) for the analysis outputs.
+
+Step 6 of final_analysis_v4.py overwrites tables/*.csv and
+regression_results.json on every run, and analyze_v4_data.py writes
+v4_analysis_results.json in its own schema. Both scripts now also record
+each run here, so earlier runs and survey waves stay queryable.
+
+Schema (one database file, default results/results.sqlite):
+  runs        one row per run: source script, label (e.g. wave), input path
+              and SHA-256, config JSON, code version, total seconds
+  run_timings per-stage seconds of a run
+  metrics     one row per distinct statistic: (table, entity, term, statistic),
+              e.g. ("regression_results", "model_b", "", "AI_USE_SCORE_B")
+  estimates   (metric_id, run_id) -> numeric value or text
+
+Every table, matrix or nested JSON document is flattened to metric rows and
+written with executemany in a single transaction. estimates is keyed by
+(metric_id, run_id), so pulling one statistic across all runs, or joining
+two runs, is an index range scan rather than a diff of CSV files.
+
+Usage:
+    python scripts/results_store.py ingest [--tables-dir tables] [--json archive/v4_analysis_results.json] [--label wave1]
+    python scripts/results_store.py runs
+    python scripts/results_store.py compare RUN_A RUN_B [--table regression_results]
+    python scripts/results_store.py history regression_results model_b AI_USE_SCORE_B
+"""
+
+import argparse
+import hashlib
+import json
+import numbers
+import os
+import sqlite3
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DB = os.path.join("results", "results.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        INTEGER PRIMARY KEY,
+    created_at    TEXT NOT NULL,
+    source        TEXT NOT NULL,
+    label         TEXT,
+    input_path    TEXT,
+    input_sha256  TEXT,
+    config        TEXT,
+    code_version  TEXT,
+    total_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_input ON runs (input_sha256);
+CREATE INDEX IF NOT EXISTS runs_by_label ON runs (label, source);
+
+CREATE TABLE IF NOT EXISTS run_timings (
+    run_id  INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    stage   TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (run_id, stage)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS metrics (
+    metric_id  INTEGER PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    entity     TEXT NOT NULL,
+    term       TEXT NOT NULL DEFAULT '',
+    statistic  TEXT NOT NULL,
+    UNIQUE (table_name, entity, term, statistic)
+);
+
+CREATE TABLE IF NOT EXISTS estimates (
+    metric_id INTEGER NOT NULL REFERENCES metrics (metric_id),
+    run_id    INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    value     REAL,
+    text      TEXT,
+    PRIMARY KEY (metric_id, run_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS estimates_by_run ON estimates (run_id);
+"""
+
+# Committed Step 6 outputs: file -> (table name, key column; None = matrix with row labels)
+step6_tables = {
+    "table1_descriptives_reliability.csv": ("table1_descriptives_reliability", "variable_name"),
+    "table2_correlation_matrix.csv": ("table2_correlation_matrix", None),
+    "table3_regression_summary.csv": ("table3_regression_summary", "Model"),
+    "table4_cluster_profiles.csv": ("table4_cluster_profiles", "cluster"),
+}
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def code_version(root=None):
+    """Git commit of the working tree (with '-dirty' if modified), or None outside git."""
+    root = root or os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def _cell(value):
+    """(numeric value, text) for one statistic."""
+    if value is None:
+        return None, None
+    if isinstance(value, (bool, np.bool_)):
+        return float(value), None
+    if isinstance(value, numbers.Number):
+        value = float(value)
+        return (None, None) if np.isnan(value) else (value, None)
+    return None, str(value)
+
+
+def frame_rows(table_name, frame, key):
+    """Metric rows of a table with one row per entity (key column) and one column per statistic."""
+    rows = []
+    for record in frame.to_dict("records"):
+        entity = str(record.pop(key))
+        for statistic, value in record.items():
+            rows.append((table_name, entity, "", str(statistic), *_cell(value)))
+    return rows
+
+
+def matrix_rows(table_name, matrix, statistic="r"):
+    """Metric rows of a labelled matrix (e.g. Table 2): entity = row label, term = column label."""
+    rows = []
+    for entity, series in matrix.iterrows():
+        for term, value in series.items():
+            rows.append((table_name, str(entity), str(term), statistic, *_cell(value)))
+    return rows
+
+
+def document_rows(table_name, document):
+    """
+    Metric rows of a nested JSON-style dict.
+
+    The top-level key is the entity, the leaf key the statistic and any keys
+    in between are joined with '.' into the term, so
+    {"correlations": {"ai_use_creativity": {"r": ...}}} becomes
+    ("correlations", "ai_use_creativity", "r").
+    """
+    rows = []
+
+    def walk(value, path):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                walk(child, path + [str(key)])
+        elif isinstance(value, (list, tuple)):
+            for i, child in enumerate(value):
+                walk(child, path + [str(i)])
+        else:
+            entity = path[0]
+            statistic = path[-1] if len(path) > 1 else "value"
+            term = ".".join(path[1:-1])
+            rows.append((table_name, entity, term, statistic, *_cell(value)))
+
+    for key, value in document.items():
+        walk(value, [str(key)])
+    return rows
+
+
+class ResultsStore:
+    """Connection to a results database; creates the schema on first use."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record_run(self, source, rows, input_path=None, config=None, timings=None, label=None,
+                   total_seconds=None):
+        """
+        Store one run and all of its statistics in a single transaction.
+
+        Parameters:
+        -----------
+        source : str
+            Producing script, e.g. "final_analysis_v4.py"
+        rows : list
+            Metric rows from frame_rows / matrix_rows / document_rows
+        input_path : str, optional
+            Input data file; its SHA-256 is recorded
+        config : dict, optional
+            Settings of the run, stored as JSON
+        timings : dict, optional
+            {stage: seconds}
+        label : str, optional
+            Free-form tag such as a survey wave
+
+        Returns:
+        --------
+        int : run_id
+        """
+        sha = file_sha256(input_path) if input_path and os.path.exists(input_path) else None
+        if total_seconds is None and timings:
+            total_seconds = float(sum(timings.values()))
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO runs (created_at, source, label, input_path, input_sha256, config, "
+                "code_version, total_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now(timezone.utc).isoformat(timespec="seconds"), source, label, input_path, sha,
+                 json.dumps(config or {}, sort_keys=True, default=str), code_version(), total_seconds))
+            run_id = cur.lastrowid
+            if timings:
+                self.conn.executemany("INSERT INTO run_timings (run_id, stage, seconds) VALUES (?, ?, ?)",
+                                      [(run_id, stage, float(sec)) for stage, sec in timings.items()])
+            keys = [row[:4] for row in rows]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO metrics (table_name, entity, term, statistic) VALUES (?, ?, ?, ?)", keys)
+            ids = self._metric_ids({row[0] for row in rows})
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO estimates (metric_id, run_id, value, text) VALUES (?, ?, ?, ?)",
+                [(ids[row[:4]], run_id, row[4], row[5]) for row in rows])
+        return run_id
+
+    def _metric_ids(self, table_names):
+        ids = {}
+        for name in table_names:
+            for metric_id, *key in self.conn.execute(
+                    "SELECT metric_id, table_name, entity, term, statistic FROM metrics WHERE table_name = ?",
+                    (name,)):
+                ids[tuple(key)] = metric_id
+        return ids
+
+    def runs(self, source=None, label=None):
+        """All runs (newest last), optionally filtered by source script or label."""
+        query = "SELECT * FROM runs WHERE (? IS NULL OR source = ?) AND (? IS NULL OR label = ?) ORDER BY run_id"
+        return pd.read_sql_query(query, self.conn, params=(source, source, label, label))
+
+    def timings(self, run_id):
+        return pd.read_sql_query("SELECT stage, seconds FROM run_timings WHERE run_id = ?",
+                                 self.conn, params=(run_id,))
+
+    def estimates(self, run_id, table_name=None):
+        """All statistics of one run in long format."""
+        query = """
+            SELECT m.table_name, m.entity, m.term, m.statistic, e.value, e.text
+            FROM estimates e JOIN metrics m USING (metric_id)
+            WHERE e.run_id = ? AND (? IS NULL OR m.table_name = ?)
+            ORDER BY m.table_name, m.entity, m.term, m.statistic"""
+        return pd.read_sql_query(query, self.conn, params=(run_id, table_name, table_name))
+
+    def compare(self, run_a, run_b, table_name=None):
+        """
+        Side-by-side numeric estimates of two runs with their difference.
+
+        Full outer comparison: a statistic recorded by only one of the runs
+        is listed with NULL on the other side.
+        """
+        query = """
+            SELECT m.table_name, m.entity, m.term, m.statistic,
+                   a.value AS run_a, b.value AS run_b, b.value - a.value AS difference
+            FROM (SELECT metric_id FROM estimates WHERE run_id IN (?, ?)) ids
+            JOIN metrics m ON m.metric_id = ids.metric_id
+            LEFT JOIN estimates a ON a.metric_id = ids.metric_id AND a.run_id = ?
+            LEFT JOIN estimates b ON b.metric_id = ids.metric_id AND b.run_id = ?
+            WHERE (? IS NULL OR m.table_name = ?)
+              AND (a.value IS NOT NULL OR b.value IS NOT NULL)
+            GROUP BY ids.metric_id
+            ORDER BY m.table_name, m.entity, m.term, m.statistic"""
+        params = (run_a, run_b, run_a, run_b, table_name, table_name)
+        return pd.read_sql_query(query, self.conn, params=params)
+
+    def history(self, table_name, entity, statistic, term=""):
+        """One statistic across every run that recorded it."""
+        query = """
+            SELECT r.run_id, r.created_at, r.source, r.label, r.input_sha256, r.code_version, e.value, e.text
+            FROM metrics m
+            JOIN estimates e ON e.metric_id = m.metric_id
+            JOIN runs r ON r.run_id = e.run_id
+            WHERE m.table_name = ? AND m.entity = ? AND m.term = ? AND m.statistic = ?
+            ORDER BY r.run_id"""
+        return pd.read_sql_query(query, self.conn, params=(table_name, entity, term, statistic))
+
+
+def output_rows(tables_dir="tables", json_paths=()):
+    """
+    Metric rows for the Step 6 files found in tables_dir plus any JSON documents.
+
+    regression_results.json in tables_dir is always included when present.
+    """
+    rows = []
+    for filename, (table_name, key) in step6_tables.items():
+        path = os.path.join(tables_dir, filename)
+        if not os.path.exists(path):
+            continue
+        if key is None:
+            rows += matrix_rows(table_name, pd.read_csv(path, index_col=0))
+        else:
+            rows += frame_rows(table_name, pd.read_csv(path), key)
+    paths = [os.path.join(tables_dir, "regression_results.json")] + list(json_paths)
+    for path in paths:
+        if os.path.exists(path):
+            with open(path) as f:
+                rows += document_rows(os.path.splitext(os.path.basename(path))[0], json.load(f))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--db", default=DEFAULT_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Record the current output files as a run")
+    ingest.add_argument("--tables-dir", default="tables")
+    ingest.add_argument("--json", nargs="*", default=[], help="Extra JSON results, e.g. v4_analysis_results.json")
+    ingest.add_argument("--data", default="v4_data.csv", help="Input file to hash")
+    ingest.add_argument("--label", default=None)
+    ingest.add_argument("--source", default="final_analysis_v4.py")
+
+    sub.add_parser("runs", help="List recorded runs")
+
+    compare = sub.add_parser("compare", help="Compare two runs")
+    compare.add_argument("run_a", type=int)
+    compare.add_argument("run_b", type=int)
+    compare.add_argument("--table", default=None)
+    compare.add_argument("--changed", action="store_true", help="Only rows whose value differs")
+
+    history = sub.add_parser("history", help="One statistic across runs")
+    history.add_argument("table")
+    history.add_argument("entity")
+    history.add_argument("statistic")
+    history.add_argument("--term", default="")
+
+    args = parser.parse_args()
+    with ResultsStore(args.db) as store:
+        if args.command == "ingest":
+            start = time.perf_counter()
+            rows = output_rows(args.tables_dir, args.json)
+            run_id = store.record_run(args.source, rows, input_path=args.data, label=args.label,
+                                      config={"tables_dir": args.tables_dir, "json": args.json})
+            print(f"✓ Recorded run {run_id}: {len(rows)} statistics "
+                  f"in {time.perf_counter() - start:.2f} s ({args.db})")
+        elif args.command == "runs":
+            runs = store.runs()
+            print(runs[["run_id", "created_at", "source", "label", "input_sha256", "code_version",
+                        "total_seconds"]].to_string(index=False) if len(runs) else "No runs recorded")
+        elif args.command == "compare":
+            table = store.compare(args.run_a, args.run_b, args.table)
+            if args.changed:
+                a, b = table["run_a"].astype(float), table["run_b"].astype(float)
+                table = table[~np.isclose(a, b, rtol=1e-9, atol=0, equal_nan=True)]
+            with pd.option_context("display.max_rows", None, "display.width", 200):
+                print(table.to_string(index=False))
+        elif args.command == "history":
+            print(store.history(args.table, args.entity, args.statistic, args.term).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Heteroskedasticity-robust and M-estimation inference for Models A-C.
+
+The composites are bounded 1-5 means (AUTHORSHIP_SCORE piles up at the
+ends), so the constant-variance assumption behind the STEP 4 standard errors
+is doubtful. Two checks, both built on one QR factorization per distinct
+design (Models A and B share theirs, so one X = QR serves both outcomes):
+
+  HC0-HC3   sandwich covariances R^-1 Q' diag(w) Q R^-T with
+            w = e^2, e^2 n/(n-p), e^2/(1-h), e^2/(1-h)^2 and leverages
+            h = rowwise |Q|^2; no refits. p-values use t(n - p).
+  Huber / bisquare
+            M-estimates by iteratively reweighted least squares, started at
+            OLS, with the scale re-estimated each step as MAD(resid)/0.6745
+            (tuning constants 1.345 and 4.685, 95% efficiency at the
+            normal). Every (model, method) system is one slice of a
+            batched solve, so each IRLS step is a single np.linalg.solve
+            over all outcomes. Standard errors use Huber's H1 correction
+            with (X'X)^-1 = R^-1 R^-T from the same factorization, and
+            p-values use the normal distribution (as statsmodels RLM).
+
+robust_entries() gives the per-model "robust" block that STEP 6 writes into
+tables/regression_results.json next to the classical estimates.
+
+Usage:
+    python scripts/robust_regression.py [--data v4_data.csv]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm, t as t_dist
+
+from survey_data import load_analysis_frame, regression_data, build_design, model_specs, INTERACTION_TERM
+
+HC_TYPES = ["HC0", "HC1", "HC2", "HC3"]
+TUNING = {"huber": 1.345, "bisquare": 4.685}
+MAD_NORMAL = norm.ppf(0.75)
+IRLS_TOL = 1e-10
+IRLS_MAX_ITER = 100
+FIT_COLUMNS = ["model", "outcome", "term", "method", "B", "SE", "stat", "p", "iterations"]
+
+
+def focal_term(model_key):
+    """Coefficient reported in regression_results.json for a model."""
+    return INTERACTION_TERM if INTERACTION_TERM in model_specs[model_key]["terms"] else "AI_USE_SCORE"
+
+
+def shared_factorizations(reg_data, model_keys=tuple(model_specs)):
+    """
+    One QR per distinct design, with OLS fits of every outcome that uses it.
+
+    Predictors that are constant in the sample are dropped as in
+    analysis_api.fit_model, and models with no residual degrees of freedom
+    are skipped.
+
+    Returns:
+    --------
+    list of dict : X, Q, R, R_inv, terms, models (keys), Y (n, m), B (p, m), E (n, m)
+    """
+    groups = {}
+    for key in model_keys:
+        X, y, terms = build_design(reg_data, key)
+        keep = [0] + [j for j in range(1, X.shape[1]) if len(X) and np.ptp(X[:, j]) > 0]
+        X, terms = X[:, keep], [terms[j] for j in keep]
+        if len(X) <= X.shape[1]:
+            continue
+        group = groups.setdefault(tuple(terms), {"X": X, "terms": terms, "models": [], "ys": []})
+        group["models"].append(key)
+        group["ys"].append(y)
+    out = []
+    for group in groups.values():
+        Q, R = np.linalg.qr(group["X"])
+        Y = np.column_stack(group.pop("ys"))
+        B = np.linalg.solve(R, Q.T @ Y)
+        out.append({**group, "Q": Q, "R": R, "R_inv": np.linalg.inv(R), "Y": Y, "B": B, "E": Y - group["X"] @ B})
+    return out
+
+
+def sandwich_covariances(Q, R_inv, E):
+    """
+    HC0-HC3 covariance matrices for every outcome of one design.
+
+    Returns:
+    --------
+    dict : HC type -> array (m, p, p)
+    """
+    n, p = Q.shape
+    h = (Q ** 2).sum(axis=1)[:, None]
+    E2 = E ** 2
+    weights = {"HC0": E2, "HC1": E2 * n / (n - p), "HC2": E2 / (1 - h), "HC3": E2 / (1 - h) ** 2}
+    out = {}
+    for hc, w in weights.items():
+        meat = (Q.T * w.T[:, None, :]) @ Q
+        out[hc] = R_inv @ meat @ R_inv.T
+    return out
+
+
+def _psi(u, method):
+    c = TUNING[method]
+    if method == "huber":
+        return np.clip(u, -c, c), (np.abs(u) <= c).astype(float)
+    inside = np.abs(u) < c
+    v = (u / c) ** 2
+    return np.where(inside, u * (1 - v) ** 2, 0.0), np.where(inside, (1 - v) * (1 - 5 * v), 0.0)
+
+
+def _weights(u, method):
+    c = TUNING[method]
+    if method == "huber":
+        au = np.abs(u)
+        return np.where(au <= c, 1.0, c / np.maximum(au, 1e-300))
+    return np.where(np.abs(u) < c, (1 - (u / c) ** 2) ** 2, 0.0)
+
+
+def batched_irls(systems, tol=IRLS_TOL, max_iter=IRLS_MAX_ITER):
+    """
+    Huber / bisquare IRLS for many (design, outcome, method) systems at once.
+
+    Parameters:
+    -----------
+    systems : list of dict
+        X (n, p), y (n,), b0 (p,) OLS start, method ('huber' or 'bisquare');
+        all systems share the same rows, p may differ
+    tol : float
+        Convergence when no coefficient moves more than tol * (1 + |b|)
+
+    Returns:
+    --------
+    tuple : (list of coefficient arrays, scales (S,), iterations (S,), residuals (S, n))
+    """
+    S = len(systems)
+    n = len(systems[0]["y"])
+    p_max = max(s["X"].shape[1] for s in systems)
+    X = np.zeros((S, n, p_max))
+    padded = np.zeros((S, p_max))
+    b = np.zeros((S, p_max))
+    for i, s in enumerate(systems):
+        p = s["X"].shape[1]
+        X[i, :, :p] = s["X"]
+        padded[i, p:] = 1.0
+        b[i, :p] = s["b0"]
+    y = np.stack([s["y"] for s in systems])
+    methods = [s["method"] for s in systems]
+    Xt = X.transpose(0, 2, 1)
+
+    resid = y - (X @ b[..., None])[..., 0]
+    scale = np.median(np.abs(resid), axis=1) / MAD_NORMAL
+    iterations = np.zeros(S, dtype=int)
+    active = np.ones(S, dtype=bool)
+    for it in range(1, max_iter + 1):
+        u = resid / scale[:, None]
+        w = np.stack([_weights(u[i], m) for i, m in enumerate(methods)])
+        # Padded coefficients get an identity block and solve to 0
+        XtW = Xt * w[:, None, :]
+        XtWX = XtW @ X + padded[:, :, None] * np.eye(p_max)
+        XtWy = (XtW @ y[..., None])[..., 0]
+        b_new = np.linalg.solve(XtWX, XtWy[..., None])[..., 0]
+        moved = np.abs(b_new - b).max(axis=1) > tol * (1 + np.abs(b).max(axis=1))
+        b[active] = b_new[active]
+        resid = y - (X @ b[..., None])[..., 0]
+        scale = np.where(active, np.median(np.abs(resid), axis=1) / MAD_NORMAL, scale)
+        iterations[active] = it
+        active &= moved
+        if not active.any():
+            break
+    return [b[i, :s["X"].shape[1]] for i, s in enumerate(systems)], scale, iterations, resid
+
+
+def m_estimate_covariance(resid, scale, R_inv, method):
+    """Huber's H1 covariance of an M-estimate (statsmodels RLM default)."""
+    n, p = len(resid), R_inv.shape[0]
+    psi, dpsi = _psi(resid / scale, method)
+    m = dpsi.mean()
+    k = 1 + p / n * dpsi.var() / m ** 2
+    return k ** 2 * (psi @ psi / (n - p)) * scale ** 2 / m ** 2 * (R_inv @ R_inv.T)
+
+
+def robust_fits(reg_data, model_keys=tuple(model_specs)):
+    """
+    Classical, HC0-HC3 and Huber/bisquare estimates for every coefficient.
+
+    Returns:
+    --------
+    DataFrame : model, outcome, term, method, B, SE, stat, p, iterations
+    """
+    factorizations = shared_factorizations(reg_data, model_keys)
+    rows, systems, owners = [], [], []
+    for f in factorizations:
+        n, p = f["X"].shape
+        dof = n - p
+        s2 = (f["E"] ** 2).sum(axis=0) / dof
+        classical = s2[:, None, None] * (f["R_inv"] @ f["R_inv"].T)
+        covs = {"OLS": classical, **sandwich_covariances(f["Q"], f["R_inv"], f["E"])}
+        for j, key in enumerate(f["models"]):
+            spec = model_specs[key]
+            for method, cov in covs.items():
+                se = np.sqrt(np.diag(cov[j]))
+                stat = f["B"][:, j] / se
+                pvals = 2 * t_dist.sf(np.abs(stat), dof)
+                rows += [{"model": spec["model_name"], "outcome": spec["outcome_name"], "term": term,
+                          "method": method, "B": f["B"][i, j], "SE": se[i], "stat": stat[i],
+                          "p": pvals[i], "iterations": 0}
+                         for i, term in enumerate(f["terms"])]
+            for method in TUNING:
+                systems.append({"X": f["X"], "y": f["Y"][:, j], "b0": f["B"][:, j], "method": method})
+                owners.append((f, key))
+
+    if not systems:
+        return pd.DataFrame(rows, columns=FIT_COLUMNS)
+    coefs, scales, iterations, resid = batched_irls(systems)
+    for (f, key), system, b, scale, its, e in zip(owners, systems, coefs, scales, iterations, resid):
+        spec = model_specs[key]
+        se = np.sqrt(np.diag(m_estimate_covariance(e, scale, f["R_inv"], system["method"])))
+        z = b / se
+        pvals = 2 * norm.sf(np.abs(z))
+        rows += [{"model": spec["model_name"], "outcome": spec["outcome_name"], "term": term,
+                  "method": system["method"], "B": b[i], "SE": se[i], "stat": z[i],
+                  "p": pvals[i], "iterations": int(its)}
+                 for i, term in enumerate(f["terms"])]
+    return pd.DataFrame(rows, columns=FIT_COLUMNS)
+
+
+def robust_entries(reg_data, model_keys=tuple(model_specs), fits=None):
+    """
+    Per-model "robust" blocks for regression_results.json (focal coefficient only).
+
+    Returns:
+    --------
+    dict : model key -> {'term', 'HC0_SE', 'HC0_p', ..., 'huber_B', 'huber_SE',
+           'huber_p', 'huber_iterations', 'bisquare_...'}
+    """
+    fits = robust_fits(reg_data, model_keys) if fits is None else fits
+    out = {}
+    for key in model_keys:
+        term = focal_term(key)
+        rows = fits[(fits["model"] == model_specs[key]["model_name"]) & (fits["term"] == term)]
+        if rows.empty:
+            continue
+        rows = rows.set_index("method")
+        entry = {"term": term}
+        for hc in HC_TYPES:
+            entry.update({f"{hc}_SE": float(rows.loc[hc, "SE"]), f"{hc}_p": float(rows.loc[hc, "p"])})
+        for method in TUNING:
+            entry.update({f"{method}_B": float(rows.loc[method, "B"]), f"{method}_SE": float(rows.loc[method, "SE"]),
+                          f"{method}_p": float(rows.loc[method, "p"]),
+                          f"{method}_iterations": int(rows.loc[method, "iterations"])})
+        out[key] = entry
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("ROBUST INFERENCE FOR MODELS A-C")
+    print("=" * 70)
+
+    reg = regression_data(load_analysis_frame(args.data))
+    fits = robust_fits(reg)
+    print(f"✓ N = {len(reg)}; {len(shared_factorizations(reg))} QR factorizations for {len(model_specs)} models")
+
+    for key in model_specs:
+        term = focal_term(key)
+        rows = fits[(fits["model"] == model_specs[key]["model_name"]) & (fits["term"] == term)]
+        print(f"\n{model_specs[key]['model_name']} ({model_specs[key]['outcome_name']}), {term}:")
+        print(rows[["method", "B", "SE", "stat", "p", "iterations"]].round(4).to_string(index=False))
+
+    os.makedirs("tables", exist_ok=True)
+    fits.to_csv("tables/robust_regression.csv", index=False)
+    print("\n✓ Exported: tables/robust_regression.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Declarative composite scoring compiled to one matrix product.
+
+Scales are declared in scripts/scales.json (items, reverse-keyed items,
+response range, minimum observed items, mean or sum), together with the
+reverse-worded items that belong to no scale. CompiledScales turns
+the definitions into a single (2J x 2S) scoring matrix for J items and S
+scales:
+
+    [X0 | M] @ [[W, 0],      X0 = items with NaN set to 0, M = observed mask
+                [O, A]]      W = +1 / -1 item weights (-1 = reverse keyed)
+                             O = low + high offsets of the reverse-keyed items
+                             A = item membership
+
+The left half of the product is each scale's keyed item total over the
+observed items, the right half the number of observed items, so every
+composite and its missingness come out of the same NaN-aware pass. Scores
+with fewer than min_items observed items are set to NaN.
+
+Usage:
+    python scripts/scale_scoring.py [--data v4_data.csv] [--scales scripts/scales.json]
+"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SCALES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scales.json")
+
+
+def load_scales(path=SCALES_FILE):
+    """
+    Read and validate scale definitions.
+
+    Returns:
+    --------
+    dict : scale name -> {'items', 'reverse', 'range', 'min_items', 'method'}
+    """
+    with open(path) as f:
+        scales = json.load(f)["scales"]
+    for name, spec in scales.items():
+        items = spec["items"]
+        spec.setdefault("reverse", [])
+        spec.setdefault("range", [1, 5])
+        spec.setdefault("min_items", len(items))
+        spec.setdefault("method", "mean")
+        lo, hi = spec["range"]
+        if not items or len(set(items)) != len(items):
+            raise ValueError(f"{name}: items must be a non-empty list without duplicates")
+        if not set(spec["reverse"]) <= set(items):
+            raise ValueError(f"{name}: reverse-keyed items {sorted(set(spec['reverse']) - set(items))} "
+                             "are not in the scale")
+        if not lo < hi:
+            raise ValueError(f"{name}: range must be [low, high] with low < high")
+        if not 1 <= spec["min_items"] <= len(items):
+            raise ValueError(f"{name}: min_items must be between 1 and {len(items)}")
+        if spec["method"] not in ("mean", "sum"):
+            raise ValueError(f"{name}: method must be 'mean' or 'sum'")
+    return scales
+
+
+def load_unscored_reverse(path=SCALES_FILE):
+    """
+    Reverse-worded items outside every scale.
+
+    Returns:
+    --------
+    dict : item -> low + high of its response range
+    """
+    with open(path) as f:
+        extra = json.load(f).get("unscored_reverse", {})
+    return {item: lo + hi for item, (lo, hi) in extra.items()}
+
+
+class CompiledScales:
+    """Scoring matrix for a set of scale definitions (see module docstring)."""
+
+    def __init__(self, scales, unscored_reverse=None):
+        self.scales = scales
+        self.unscored_reverse = dict(unscored_reverse or {})
+        self.names = list(scales)
+        self.items = list(dict.fromkeys(item for spec in scales.values() for item in spec["items"]))
+        J, S = len(self.items), len(self.names)
+        index = {item: j for j, item in enumerate(self.items)}
+
+        matrix = np.zeros((2 * J, 2 * S))
+        self.reverse = {}
+        for s, spec in enumerate(scales.values()):
+            lo, hi = spec["range"]
+            for item in spec["items"]:
+                j = index[item]
+                if item in spec["reverse"]:
+                    matrix[j, s] = -1.0
+                    matrix[J + j, s] = lo + hi
+                    self.reverse[item] = lo + hi
+                else:
+                    matrix[j, s] = 1.0
+                matrix[J + j, S + s] = 1.0
+        self.matrix = matrix
+        self.n_items = np.array([len(spec["items"]) for spec in scales.values()])
+        self.min_items = np.array([spec["min_items"] for spec in scales.values()])
+        self.use_mean = np.array([spec["method"] == "mean" for spec in scales.values()])
+
+    def keyed_items(self, name):
+        """Items of a scale, reverse-keyed ones as their '<item>_REV' columns."""
+        reverse = self.scales[name]["reverse"]
+        return [item + "_REV" if item in reverse else item for item in self.scales[name]["items"]]
+
+    def score(self, X):
+        """
+        Score a block of raw item responses (columns in self.items order).
+
+        Returns:
+        --------
+        tuple : (scores (n, S) with NaN below min_items, observed item counts (n, S),
+                 missing responses per item (J,))
+        """
+        observed = ~np.isnan(X)
+        product = np.hstack([np.where(observed, X, 0.0), observed]) @ self.matrix
+        S = len(self.names)
+        total, count = product[:, :S], product[:, S:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(self.use_mean, total / count, total)
+        scores[count < self.min_items] = np.nan
+        return scores, count, (~observed).sum(axis=0)
+
+    def missingness(self, count, item_missing, n_rows):
+        """Per-scale and per-item missingness table from one score() pass."""
+        rows = []
+        for s, name in enumerate(self.names):
+            c = count[:, s]
+            rows.append({"level": "scale", "name": name, "n_rows": n_rows,
+                         "complete": int((c == self.n_items[s]).sum()),
+                         "partial_scored": int(((c >= self.min_items[s]) & (c < self.n_items[s])).sum()),
+                         "below_min_items": int((c < self.min_items[s]).sum()),
+                         "min_items": int(self.min_items[s])})
+        for j, item in enumerate(self.items):
+            rows.append({"level": "item", "name": item, "n_rows": n_rows,
+                         "missing": int(item_missing[j])})
+        return pd.DataFrame(rows)
+
+
+_compiled = {}
+
+
+def compiled_scales(path=SCALES_FILE):
+    """CompiledScales for a definitions file, compiled once per process."""
+    if path not in _compiled:
+        _compiled[path] = CompiledScales(load_scales(path), load_unscored_reverse(path))
+    return _compiled[path]
+
+
+def score_frame(adf, scoring=None):
+    """
+    Score the composites of a renamed item frame.
+
+    Returns:
+    --------
+    tuple : (DataFrame of composite scores on adf's index, missingness DataFrame)
+    """
+    scoring = scoring or compiled_scales()
+    X = adf[scoring.items].to_numpy(dtype=float)
+    scores, count, item_missing = scoring.score(X)
+    return (pd.DataFrame(scores, index=adf.index, columns=scoring.names),
+            scoring.missingness(count, item_missing, len(adf)))
+
+
+def main():
+    from survey_data import rename_columns
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--scales", default=SCALES_FILE)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("COMPOSITE SCORING FROM SCALE DEFINITIONS")
+    print("=" * 70)
+
+    scoring = CompiledScales(load_scales(args.scales), load_unscored_reverse(args.scales))
+    print(f"✓ Compiled {len(scoring.names)} scales over {len(scoring.items)} items "
+          f"into a {scoring.matrix.shape[0]} x {scoring.matrix.shape[1]} scoring matrix")
+
+    adf = rename_columns(pd.read_csv(args.data, index_col=0))
+    scores, missing = score_frame(adf, scoring)
+    print(f"\nScored {len(adf)} participants from {args.data}:")
+    print(scores.describe().T[["count", "mean", "std", "min", "max"]].round(3))
+    print("\nMissingness:")
+    counts = ["n_rows", "complete", "partial_scored", "below_min_items", "min_items"]
+    print(missing.loc[missing["level"] == "scale", ["name"] + counts].astype({c: int for c in counts})
+          .to_string(index=False))
+    item_missing = missing[(missing["level"] == "item") & (missing["missing"] > 0)]
+    for _, row in item_missing.iterrows():
+        print(f"  {row['name']}: {row['missing']} missing")
+
+    os.makedirs("tables", exist_ok=True)
+    missing.to_csv("tables/scale_missingness.csv", index=False)
+    print("\n✓ Exported: tables/scale_missingness.csv")
+
+
+if __name__ == "__main__":
+    main()
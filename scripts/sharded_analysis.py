@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Sharded map-reduce STEPS 2-4 over many exports (e.g. one CSV per school).
+
+Instead of concatenating every export before STEP 1, each file is a shard:
+  map     a worker resolves the file's header against the questionnaire
+          (rename_columns, including the known wording variants), streams it
+          in row chunks, scores it and accumulates sufficient statistics:
+          per-variable counts, means and squared deviations, min/max, and the
+          count, mean vector and centred co-moment matrix of each complete-case
+          rule (item sets for alpha, STEP 3 variables, Models A-C regressors,
+          from which X'X and X'y follow);
+  reduce  the partial results are merged with the pairwise update of Chan et
+          al., which is exact up to rounding, giving the global Table 1,
+          Table 2 and Model A-C estimates.
+Shards are scheduled largest first across the worker pool; each worker only
+returns a few small matrices, so the work scales with the number of cores.
+Per-shard statistics are kept and exported next to the global ("ALL") rows
+for drill-down. Files that lack required columns are reported and skipped.
+
+Usage:
+    python scripts/sharded_analysis.py --data exports/ [--n-jobs 4] [--chunk-rows 100000]
+    python scripts/sharded_analysis.py --data "exports/school_*.csv" v4_data.csv
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from survey_data import rename_columns, score_composites, likert_items, INTERACTION_TERM
+from column_store import (
+    read_export_chunks, text_fields, stat_variables, new_statistics, update_statistics,
+    merge_statistics, descriptives_table, correlation_table, regression_table, CONVERT_CHUNK_ROWS,
+)
+from parallel import parallel_map
+
+required_columns = likert_items + text_fields
+
+
+def expand_paths(patterns):
+    """Files for a list of paths, directories (their *.csv) and glob patterns, in order."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, "*.csv")))
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+        paths += [p for p in matches if p not in paths]
+    return paths
+
+
+def shard_labels(paths):
+    """File stems, or relative paths where stems collide."""
+    stems = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    return [s if stems.count(s) == 1 else os.path.relpath(p) for s, p in zip(stems, paths)]
+
+
+def frame_matrix(adf, variables):
+    """float64 matrix of the variables; 'a:b' is the product of two columns."""
+    columns = []
+    for var in variables:
+        if ":" in var:
+            left, right = var.split(":")
+            columns.append(adf[left].to_numpy(dtype=float) * adf[right].to_numpy(dtype=float))
+        else:
+            columns.append(adf[var].to_numpy(dtype=float))
+    return np.column_stack(columns)
+
+
+def missing_columns(path):
+    """Required questionnaire columns that the file's header does not resolve to."""
+    header = rename_columns(pd.read_csv(path, index_col=0, nrows=0))
+    return [c for c in required_columns if c not in header.columns]
+
+
+def shard_statistics(task):
+    """
+    Map step for one file.
+
+    Returns:
+    --------
+    dict : path, rows, seconds, and either 'stats' (see column_store.new_statistics)
+           or 'error'
+    """
+    path, chunk_rows = task
+    start = time.perf_counter()
+    result = {"path": path, "rows": 0}
+    try:
+        missing = missing_columns(path)
+        if missing:
+            raise KeyError(f"missing columns {missing}")
+        stats = new_statistics()
+        for adf in read_export_chunks(path, chunk_rows):
+            score_composites(adf)
+            update_statistics(stats, frame_matrix(adf, stat_variables))
+            result["rows"] += len(adf)
+        result["stats"] = stats
+    except (OSError, KeyError, ValueError, pd.errors.ParserError) as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run_shards(paths, n_jobs=None, chunk_rows=CONVERT_CHUNK_ROWS):
+    """
+    Map every file through the pool and reduce into global statistics.
+
+    Returns:
+    --------
+    tuple : (global stats, list of per-shard results in input order)
+    """
+    # Largest files first so one big shard does not finish last on its own
+    sizes = [os.path.getsize(p) if os.path.exists(p) else 0 for p in paths]
+    order = sorted(range(len(paths)), key=lambda i: -sizes[i])
+    mapped = parallel_map(shard_statistics, [(paths[i], chunk_rows) for i in order], n_jobs=n_jobs)
+    shards = [None] * len(paths)
+    for i, result in zip(order, mapped):
+        shards[i] = result
+
+    total = new_statistics()
+    for result in shards:
+        if "stats" in result:
+            merge_statistics(total, result["stats"])
+    return total, shards
+
+
+def statistics_tables(stats):
+    """(descriptives, long correlations, regression) for one set of statistics."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table1 = descriptives_table(stats)
+        corr = correlation_table(stats)
+        try:
+            reg = regression_table(stats)
+        except np.linalg.LinAlgError:
+            reg = pd.DataFrame()
+    pairs = [{"var1": a, "var2": b, "r": corr.loc[a, b], "N": int(stats["correlations"].n)}
+             for i, a in enumerate(corr.index) for b in corr.columns[i + 1:]]
+    return table1, pd.DataFrame(pairs), reg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", nargs="+", default=["v4_data.csv"],
+                        help="CSV files, directories or glob patterns; each file is one shard")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=CONVERT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SHARDED MAP-REDUCE ANALYSIS (STEPS 2-4)")
+    print("=" * 70)
+
+    paths = expand_paths(args.data)
+    start = time.perf_counter()
+    total, shards = run_shards(paths, args.n_jobs, args.chunk_rows)
+    elapsed = time.perf_counter() - start
+
+    labels = shard_labels(paths)
+    manifest = pd.DataFrame([{"shard": label, "path": r["path"], "rows": r["rows"],
+                              "seconds": r["seconds"], "error": r.get("error", "")}
+                             for label, r in zip(labels, shards)])
+    ok = manifest["error"] == ""
+    print(f"✓ {ok.sum()} of {len(paths)} shards mapped, {manifest['rows'].sum()} rows in {elapsed:.1f}s")
+    for _, row in manifest[~ok].iterrows():
+        print(f"  ⚠ skipped {row['path']}: {row['error']}")
+
+    outputs = {"descriptives": [], "correlations": [], "regression": []}
+    for label, stats in [("ALL", total)] + [(label, r["stats"]) for label, r in zip(labels, shards) if "stats" in r]:
+        for name, table in zip(outputs, statistics_tables(stats)):
+            outputs[name].append(table.assign(shard=label))
+
+    reg = pd.concat(outputs["regression"], ignore_index=True)
+    key = reg[(reg["shard"] == "ALL") & reg["term"].isin(["AI_USE_SCORE", INTERACTION_TERM])]
+    print("\nGlobal key coefficients:")
+    print(key[["model", "term", "B", "SE", "p", "N", "R2"]].round(4).to_string(index=False))
+    for _, row in reg[reg["note"] != ""].drop_duplicates(["shard", "model"]).iterrows():
+        print(f"  ⚠ {row['shard']} {row['model']}: not estimated ({row['note']})")
+
+    os.makedirs("tables", exist_ok=True)
+    for name, tables in outputs.items():
+        out = pd.concat(tables, ignore_index=True)
+        out = out[["shard"] + [c for c in out.columns if c != "shard"]]
+        path = f"tables/sharded_{name}.csv"
+        out.to_csv(path, index=False)
+        print(f"✓ Exported: {path}")
+    manifest.to_csv("tables/sharded_manifest.csv", index=False)
+    print("✓ Exported: tables/sharded_manifest.csv")
+
+
+if __name__ == "__main__":
+    main()
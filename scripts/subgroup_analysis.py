@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Subgroup analysis: STEP 2-4 statistics for every group in one grouped pass.
+
+For one or more grouping columns (cross-classified when several are given)
+the script computes, per group:
+  - Table 1: N, mean, SD, min, max and Cronbach's alpha of the composites
+  - Table 2: the correlation matrix of the STEP 3 variables
+  - Models A and B: every coefficient with SE and p, plus R²
+
+Each STEP keeps its own missing-data rule (complete items, complete
+correlation variables, listwise regression sample). The rows of each rule
+are masked into one wide matrix [1, x, 1, x, ...], so a single
+cross-product per group yields counts, sums and X'X for all three STEPs.
+Large groupings are split into batches of groups across worker processes.
+Groups smaller than --min-cell are suppressed.
+
+Usage:
+    python scripts/subgroup_analysis.py [--data v4_data.csv] [--by grade_num gender] [--min-cell 10] [--n-jobs 4]
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from survey_data import (
+    load_analysis_frame, ai_items, creativity_general_items, authorship_core_items,
+    desc_vars, scale_items, corr_vars, reg_vars, model_predictors, model_specs,
+)
+from parallel import parallel_map
+
+# One block per STEP, each with its own complete-case rule
+sections = {
+    "descriptives": desc_vars + ai_items + creativity_general_items + authorship_core_items,
+    "correlations": corr_vars,
+    "regression": reg_vars,
+}
+
+default_groupings = [
+    ["grade_num"],
+    ["gender"],
+    ["overall_policy_num"],
+    ["artificial_intelligence_instruction_num"],
+]
+
+PARALLEL_MIN_GROUPS = 64
+# Predictor correlation matrices worse conditioned than this are treated as collinear
+MAX_CONDITION = 1e10
+
+
+def _stacked_matrix(adf):
+    """
+    Wide matrix [m_s, m_s * x_s for each section] with NaN rows zeroed per section.
+
+    Returns:
+    --------
+    tuple : (W, layout) where layout maps section -> (start column, variables)
+    """
+    blocks = []
+    layout = {}
+    start = 0
+    for name, variables in sections.items():
+        values = adf[variables].to_numpy(dtype=float)
+        mask = ~np.isnan(values).any(axis=1)
+        block = np.column_stack([mask.astype(float), np.where(mask[:, None], values, 0.0)])
+        blocks.append(block)
+        layout[name] = (start, variables)
+        start += block.shape[1]
+    return np.hstack(blocks), layout
+
+
+def _cross_products(args):
+    """Per-group W'W for a contiguous run of sorted rows."""
+    W, bounds = args
+    return np.stack([W[a:b].T @ W[a:b] for a, b in bounds])
+
+
+def grouped_cross_products(W, codes, n_groups, n_jobs=None):
+    """
+    (n_groups, m, m) cross-product matrices from one sorted pass over the rows.
+    """
+    order = np.argsort(codes, kind="stable")
+    W_sorted = W[order]
+    edges = np.searchsorted(codes[order], np.arange(n_groups + 1))
+    bounds = list(zip(edges[:-1], edges[1:]))
+    if n_groups < PARALLEL_MIN_GROUPS:
+        return _cross_products((W_sorted, bounds))
+    n_batches = min(n_groups, 4 * max(1, os.cpu_count() or 1))
+    batches = np.array_split(np.arange(n_groups), n_batches)
+    tasks = []
+    for batch in batches:
+        a, b = edges[batch[0]], edges[batch[-1] + 1]
+        tasks.append((W_sorted[a:b], [(lo - a, hi - a) for lo, hi in bounds[batch[0]:batch[-1] + 1]]))
+    return np.concatenate(parallel_map(_cross_products, tasks, n_jobs=n_jobs))
+
+
+def _block(C, layout, section):
+    start, variables = layout[section]
+    k = len(variables) + 1
+    return C[start:start + k, start:start + k], variables
+
+
+def _moments(block):
+    n = block[0, 0]
+    sums = block[0, 1:]
+    mean = sums / n if n > 0 else np.full(len(sums), np.nan)
+    cov = (block[1:, 1:] - n * np.outer(mean, mean)) / (n - 1) if n > 1 else np.full((len(sums),) * 2, np.nan)
+    return n, mean, cov
+
+
+def _ols_from_block(block, variables, outcome, predictors):
+    """
+    OLS (with intercept) from the section's [1, x] cross-products; drops constant predictors.
+
+    Slopes are solved from the centred moments, which are far better
+    conditioned than the raw cross-products. Returns None when there are no
+    residual degrees of freedom or the predictors are collinear in the group.
+    """
+    n = block[0, 0]
+    _, mean, cov = _moments(block)
+    idx = {v: i for i, v in enumerate(variables)}
+    keep = [p for p in predictors if cov[idx[p], idx[p]] > 1e-12]
+    p = len(keep) + 1
+    if n <= p:
+        return None
+    x, y = [idx[v] for v in keep], idx[outcome]
+    sxx = cov[np.ix_(x, x)]
+    sxy = cov[x, y]
+    sd = np.sqrt(np.diag(sxx))
+    if keep and np.linalg.cond(sxx / np.outer(sd, sd)) > MAX_CONDITION:
+        return None
+    sxx_inv = np.linalg.inv(sxx)
+    slopes = sxx_inv @ sxy
+    intercept = mean[y] - slopes @ mean[x]
+    sst = (n - 1) * cov[y, y]
+    sse = sst - (n - 1) * slopes @ sxy
+    s2 = sse / (n - p)
+    var_slopes = s2 * np.diag(sxx_inv) / (n - 1)
+    var_intercept = s2 * (1 / n + mean[x] @ sxx_inv @ mean[x] / (n - 1))
+    b = np.concatenate([[intercept], slopes])
+    se = np.sqrt(np.concatenate([[var_intercept], var_slopes]))
+    pvals = 2 * t_dist.sf(np.abs(b / se), n - p)
+    terms = ["Intercept"] + keep
+    return {"N": n, "R2": 1 - sse / sst, "terms": terms, "B": b, "SE": se, "p": pvals}
+
+
+def _group_rows(C, layout, min_cell, extremes):
+    """Long-format rows for one group's cross-product matrix."""
+    rows = []
+
+    def add(section, variable, statistic, value, n):
+        rows.append({"section": section, "variable": variable, "statistic": statistic,
+                     "value": value, "N": int(n), "suppressed": n < min_cell})
+
+    block, variables = _block(C, layout, "descriptives")
+    n, mean, cov = _moments(block)
+    for var in desc_vars:
+        i = variables.index(var)
+        add("descriptives", var, "mean", mean[i], n)
+        add("descriptives", var, "sd", np.sqrt(cov[i, i]), n)
+        add("descriptives", var, "min", extremes[var][0], n)
+        add("descriptives", var, "max", extremes[var][1], n)
+        items = [variables.index(item) for item in scale_items[var]]
+        item_cov = cov[np.ix_(items, items)]
+        k = len(items)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            alpha = k / (k - 1) * (1 - np.trace(item_cov) / item_cov.sum())
+        add("reliability", var, "alpha", alpha, n)
+
+    block, variables = _block(C, layout, "correlations")
+    n, _, cov = _moments(block)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sd = np.sqrt(np.diag(cov))
+        corr = cov / np.outer(sd, sd)
+    for i, a in enumerate(variables):
+        for j in range(i + 1, len(variables)):
+            add("correlations", f"{a} ~ {variables[j]}", "r", corr[i, j], n)
+
+    block, variables = _block(C, layout, "regression")
+    for key in ("model_a", "model_b"):
+        outcome = model_specs[key]["outcome_name"]
+        name = model_specs[key]["model_name"]
+        fit = _ols_from_block(block, variables, outcome, model_predictors) if block[0, 0] >= min_cell else None
+        n = block[0, 0]
+        if fit is None:
+            add(name, outcome, "R2", np.nan, n)
+            continue
+        add(name, outcome, "R2", fit["R2"], n)
+        for term, b, se, p in zip(fit["terms"], fit["B"], fit["SE"], fit["p"]):
+            add(name, term, "B", b, n)
+            add(name, term, "SE", se, n)
+            add(name, term, "p", p, n)
+    return rows
+
+
+def _format_level(value):
+    """Group label text: 11.0 -> '11', strings unchanged."""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def subgroup_statistics(adf, by, min_cell=10, n_jobs=None):
+    """
+    STEP 2-4 statistics for every group of the `by` columns.
+
+    Parameters:
+    -----------
+    adf : DataFrame
+        Scored analysis dataframe (see survey_data.load_analysis_frame)
+    by : list
+        Grouping columns; several columns are cross-classified
+    min_cell : int
+        Groups with fewer complete cases than this have their values blanked
+
+    Returns:
+    --------
+    DataFrame : long format, one row per group x statistic
+    """
+    by = list(by)
+    valid = adf[by].notna().all(axis=1).to_numpy()
+    data = adf[valid]
+    # A scalar key for a single column keeps group keys scalar (pandas 4 makes list keys tuples)
+    grouper = data.groupby(by[0] if len(by) == 1 else by, sort=True)
+    codes = grouper.ngroup().to_numpy()
+    labels = [" | ".join(_format_level(v) for v in (key if isinstance(key, tuple) else (key,)))
+              for key in grouper.groups.keys()]
+
+    W, layout = _stacked_matrix(data)
+    C = grouped_cross_products(W, codes, len(labels), n_jobs)
+
+    # Min/max are not sums, so they come from a grouped reduction of their own,
+    # over the same complete-case rows as the descriptives block
+    complete = data[sections["descriptives"]].notna().all(axis=1)
+    grouped = data[desc_vars].where(complete).groupby(codes)
+    minima, maxima = grouped.min(), grouped.max()
+
+    rows = []
+    for g, label in enumerate(labels):
+        extremes = {v: (minima.loc[g, v], maxima.loc[g, v]) for v in desc_vars}
+        for row in _group_rows(C[g], layout, min_cell, extremes):
+            row.update({"grouping": " x ".join(by), "group": label})
+            rows.append(row)
+    table = pd.DataFrame(rows)
+    table.loc[table["suppressed"], "value"] = np.nan
+    return table[["grouping", "group", "section", "variable", "statistic", "value", "N", "suppressed"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--by", nargs="+", default=None,
+                        help="Grouping columns (cross-classified); default runs each standard grouping")
+    parser.add_argument("--min-cell", type=int, default=10)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("SUBGROUP ANALYSIS (STEPS 2-4 by group)")
+    print("=" * 70)
+
+    adf = load_analysis_frame(args.data)
+    print(f"✓ Loaded {len(adf)} participants from {args.data}")
+
+    groupings = [args.by] if args.by else default_groupings
+    tables = []
+    for by in groupings:
+        table = subgroup_statistics(adf, by, args.min_cell, args.n_jobs)
+        tables.append(table)
+        suppressed = table.groupby("group")["suppressed"].any()
+        print(f"\n{' x '.join(by)}: {len(suppressed)} groups "
+              f"({int(suppressed.sum())} with cells below min cell)")
+        key = table[(table["section"] == "Model B") & (table["variable"] == "AI_USE_SCORE")
+                    & (table["statistic"] == "B")]
+        for _, row in key.iterrows():
+            value = "suppressed" if row["suppressed"] else f"{row['value']:.3f}"
+            print(f"  {row['group']}: N = {row['N']}, Model B AI_USE_SCORE B = {value}")
+
+    os.makedirs("tables", exist_ok=True)
+    out = pd.concat(tables, ignore_index=True)
+    path = "tables/subgroup_statistics.csv"
+    out.to_csv(path, index=False)
+    print(f"\n✓ Exported: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Shared loading and scoring helpers for the v4 survey export.
+
+Mirrors STEP 1 of final_analysis_v4.py so the add-on analyses in scripts/
+start from the same renamed columns, composite scores and covariates.
+
+Scale item lists, reverse keys and '<item>_REV' names are derived from
+scripts/scales.json. Two scripts keep their own scoring: final_analysis_v4.py
+(the locked reference that golden_check.py compares the compiled scoring
+against) and FIX_DATA_ISSUES.py (the v3 cleaning pass with its own minimums).
+"""
+
+import pandas as pd
+import numpy as np
+
+from scale_scoring import compiled_scales
+
+# Rename columns
+rename_map = {
+    "What is your age?": "age",
+    "What is your current grade level?": "grade",
+    "What is your gender?": "gender",
+    "About how many writing assignments (paragraphs, essays, or written projects) do you complete for school in a typical week?": "assignments_per_week",
+    "At your school, using AI tools for writing assignments is:": "overall_policy",
+    "Compared to other students in my grade, I think my writing skills are:": "writing_ability",
+    "I use AI tools (such as ChatGPT, Grammarly, or Gemini) to brainstorm ideas for my school writing.": "ai_brainstorm",
+    "I use AI tools to help me draft or write full sentences and paragraphs for my assignments.\n": "ai_draft",
+    "I use AI tools to edit or proofread my writing (for example, to fix grammar or wording).\n": "ai_edit",
+    "I use AI tools when I am stuck and do not know how to continue my writing.\n": "ai_stuck",
+    "Overall, I rely on AI tools when completing my writing assignments.\n": "ai_rely",
+    "My writing feels creative and original when I work on school assignments.\n": "creat_feels_creative",
+    "Using AI tools helps me come up with new ideas for my writing.\n": "creat_ai_helps_ideas",
+    "When I use AI tools, my writing feels more creative than when I do not use them.\n": "creat_more_creative_with_ai",
+    "I feel confident in my own ability to generate creative ideas for writing, even without AI.\n": "creat_conf_no_ai",
+    "I enjoy experimenting with different ways to express my ideas in writing.\n": "creat_enjoy_writing",
+    "The work I submit for writing assignments feels like it is primarily my own.\n": "auth_work_own",
+    "When I use AI tools, I still feel that the ideas in my writing belong to me.\n": "auth_ideas_mine",
+    "When I use AI tools, I sometimes feel less connected to the writing as \"my\" work.\n": "auth_less_connected",
+    "I worry that using AI tools might make my writing feel less genuine or authentic.\n": "auth_less_authentic",
+    "I feel comfortable taking credit for assignments where I used AI tools.\n": "auth_comfort_credit",
+    "I worry that I'm using AI on my assignments more than I should, and that I could get caught": "auth_worry_copy",
+    "How much have you been educated on AI use?": "artificial_intelligence_instruction",
+}
+
+_scoring = compiled_scales()
+
+# Scale items (scripts/scales.json); authorship uses the reverse-coded columns
+ai_items = list(_scoring.scales["AI_USE_SCORE"]["items"])
+creativity_general_items = list(_scoring.scales["CREATIVITY_GENERAL"]["items"])
+authorship_core_items = _scoring.keyed_items("AUTHORSHIP_SCORE")
+neg_auth_items = list(_scoring.scales["AUTHORSHIP_SCORE"]["reverse"])
+
+# Item banks (every questionnaire item, scored or not)
+creativity_items = [
+    "creat_feels_creative",
+    "creat_ai_helps_ideas",
+    "creat_more_creative_with_ai",
+    "creat_conf_no_ai",
+    "creat_enjoy_writing",
+]
+creativity_ai_boost_items = ["creat_ai_helps_ideas", "creat_more_creative_with_ai"]
+authorship_items = [
+    "auth_work_own",
+    "auth_ideas_mine",
+    "auth_less_connected",
+    "auth_less_authentic",
+    "auth_comfort_credit",
+    "auth_worry_copy",
+]
+
+# All raw 1-5 Likert items, in questionnaire order
+likert_items = ai_items + creativity_items + authorship_items
+
+# Raw items grouped by construct; reverse_keyed_items (item -> low + high)
+# run against their bank
+item_banks = {
+    "AI_USE": ai_items,
+    "CREATIVITY": creativity_items,
+    "AUTHORSHIP": authorship_items,
+}
+reverse_keyed_items = {**_scoring.reverse, **_scoring.unscored_reverse}
+
+# Covariate maps
+policy_map = {
+    "Completely not tolerated": 1,
+    "Mostly not tolerated": 2,
+    "Sometimes allowed depending on the assignment": 3,
+    "Mostly allowed": 4,
+    "Completely allowed": 5,
+}
+assignments_map = {"0-1": 1, "1": 1, "2-3": 2.5, "4-5": 4.5, "6+": 6}
+ai_edu_map = {"None at all": 1, "A little": 2, "Some": 3, "Quite a bit": 4, "A lot": 5}
+writing_ability_map = {"Much worse": 1, "A little worse": 2, "About the same": 3, "A little better": 4, "Much better": 5}
+
+covariates = ["grade_num", "gender_female", "writing_ability_num",
+              "assignments_per_week_num", "overall_policy_num",
+              "artificial_intelligence_instruction_num"]
+
+# The seven Model A/B predictors, in statsmodels formula order
+model_predictors = ["AI_USE_SCORE"] + covariates
+
+reg_vars = ["CREATIVITY_GENERAL", "AUTHORSHIP_SCORE"] + model_predictors
+
+# STEP 2-5 variable sets of final_analysis_v4.py
+desc_vars = ["AI_USE_SCORE", "CREATIVITY_GENERAL", "AUTHORSHIP_SCORE"]
+scale_items = {name: _scoring.keyed_items(name) for name in desc_vars}
+corr_vars = ["AI_USE_SCORE", "CREATIVITY_GENERAL", "AUTHORSHIP_SCORE",
+             "writing_ability_num", "artificial_intelligence_instruction_num",
+             "overall_policy_num"]
+key_pairs = {
+    "AI_USE_vs_CREATIVITY": ("AI_USE_SCORE", "CREATIVITY_GENERAL"),
+    "AI_USE_vs_AUTHORSHIP": ("AI_USE_SCORE", "AUTHORSHIP_SCORE"),
+    "CREATIVITY_vs_AUTHORSHIP": ("CREATIVITY_GENERAL", "AUTHORSHIP_SCORE"),
+}
+cluster_vars = ["AI_USE_SCORE", "CREATIVITY_GENERAL", "AUTHORSHIP_SCORE",
+                "writing_ability_num", "artificial_intelligence_instruction_num"]
+
+model_formulas = {
+    "model_a": "CREATIVITY_GENERAL ~ AI_USE_SCORE + grade_num + gender_female + "
+               "writing_ability_num + assignments_per_week_num + overall_policy_num + "
+               "artificial_intelligence_instruction_num",
+    "model_b": "AUTHORSHIP_SCORE ~ AI_USE_SCORE + grade_num + gender_female + "
+               "writing_ability_num + assignments_per_week_num + overall_policy_num + "
+               "artificial_intelligence_instruction_num",
+    "model_c": "AUTHORSHIP_SCORE ~ AI_USE_SCORE * writing_ability_num + grade_num + "
+               "gender_female + assignments_per_week_num + overall_policy_num + "
+               "artificial_intelligence_instruction_num",
+}
+
+# Column layout of each model's design matrix (same order as statsmodels)
+model_specs = {
+    "model_a": {
+        "model_name": "Model A",
+        "outcome_name": "CREATIVITY_GENERAL",
+        "terms": ["Intercept"] + model_predictors,
+    },
+    "model_b": {
+        "model_name": "Model B",
+        "outcome_name": "AUTHORSHIP_SCORE",
+        "terms": ["Intercept"] + model_predictors,
+    },
+    "model_c": {
+        "model_name": "Model C",
+        "outcome_name": "AUTHORSHIP_SCORE",
+        "terms": ["Intercept", "AI_USE_SCORE", "writing_ability_num",
+                  "AI_USE_SCORE:writing_ability_num", "grade_num", "gender_female",
+                  "assignments_per_week_num", "overall_policy_num",
+                  "artificial_intelligence_instruction_num"],
+    },
+}
+
+INTERACTION_TERM = "AI_USE_SCORE:writing_ability_num"
+
+
+def rename_columns(df):
+    """Rename raw questionnaire columns to the short item names."""
+    mapping = dict(rename_map)
+
+    # Handle column name variations
+    for col in df.columns:
+        lower = col.lower()
+        if "less connected" in lower and col not in mapping:
+            mapping[col] = "auth_less_connected"
+        if ("less genuine" in lower or ("authentic" in lower and "worry" not in lower)) and col not in mapping:
+            mapping[col] = "auth_less_authentic"
+        if "could get caught" in lower and col not in mapping:
+            mapping[col] = "auth_worry_copy"
+
+    return df.rename(columns=mapping)
+
+
+def score_composites(adf):
+    """
+    Add reverse-coded items and the composite scores, in place.
+
+    Composites follow scripts/scales.json and are computed together in one
+    matrix product (see scale_scoring); the '<item>_REV' columns are kept
+    for the item-level analyses.
+    """
+    for col, pivot in _scoring.reverse.items():
+        if col in adf.columns:
+            adf[col + "_REV"] = pivot - adf[col]
+
+    scores, _, _ = _scoring.score(adf[_scoring.items].to_numpy(dtype=float))
+    for s, name in enumerate(_scoring.names):
+        adf[name] = scores[:, s]
+    return adf
+
+
+def prepare_covariates(adf):
+    """Add the numeric covariates used by Models A-C, in place."""
+    adf["grade_num"] = adf["grade"].str.extract(r"(\d+)", expand=False).astype(float)
+    adf["gender_female"] = (adf["gender"] == "Female").astype(int)
+    adf["overall_policy_num"] = adf["overall_policy"].map(policy_map)
+
+    if adf["assignments_per_week"].dtype == 'object' or pd.api.types.is_string_dtype(adf["assignments_per_week"]):
+        adf["assignments_per_week_num"] = adf["assignments_per_week"].map(assignments_map)
+        adf["assignments_per_week_num"] = adf["assignments_per_week_num"].fillna(
+            adf["assignments_per_week"].str.extract(r"(\d+)")[0].astype(float)
+        )
+    else:
+        adf["assignments_per_week_num"] = adf["assignments_per_week"]
+
+    if adf["artificial_intelligence_instruction"].dtype == 'object' or pd.api.types.is_string_dtype(adf["artificial_intelligence_instruction"]):
+        adf["artificial_intelligence_instruction_num"] = adf["artificial_intelligence_instruction"].map(ai_edu_map)
+    else:
+        adf["artificial_intelligence_instruction_num"] = adf["artificial_intelligence_instruction"]
+
+    if adf["writing_ability"].dtype == 'object' or pd.api.types.is_string_dtype(adf["writing_ability"]):
+        adf["writing_ability_num"] = adf["writing_ability"].map(writing_ability_map)
+    else:
+        adf["writing_ability_num"] = adf["writing_ability"]
+    return adf
+
+
+def load_analysis_frame(path="v4_data.csv"):
+    """
+    Load a survey export and return the scored analysis dataframe.
+
+    Parameters:
+    -----------
+    path : str
+        CSV export in the v4_data.csv format (Timestamp index)
+
+    Returns:
+    --------
+    DataFrame : renamed items, composites and numeric covariates
+    """
+    df = pd.read_csv(path, index_col=0)
+    adf = rename_columns(df).copy()
+    score_composites(adf)
+    prepare_covariates(adf)
+    return adf
+
+
+def regression_data(adf):
+    """Listwise-deleted regression sample, as in STEP 4."""
+    return adf[reg_vars].dropna()
+
+
+def build_design(data, model_key):
+    """
+    Build the numeric design matrix for Model A, B or C.
+
+    Returns:
+    --------
+    tuple : (X, y, terms) with an intercept column first in X
+    """
+    spec = model_specs[model_key]
+    columns = []
+    for term in spec["terms"]:
+        if term == "Intercept":
+            columns.append(np.ones(len(data)))
+        elif ":" in term:
+            left, right = term.split(":")
+            columns.append(data[left].to_numpy(dtype=float) * data[right].to_numpy(dtype=float))
+        else:
+            columns.append(data[term].to_numpy(dtype=float))
+    X = np.column_stack(columns)
+    y = data[spec["outcome_name"]].to_numpy(dtype=float)
+    return X, y, list(spec["terms"])
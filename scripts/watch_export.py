@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Watch a growing survey export and refresh the STEP 2-4 outputs incrementally.
+
+The form export is only ever appended to. Instead of re-running
+final_analysis_v4.py on every refresh, this script keeps running sufficient
+statistics and, on each change:
+  1. reads only the byte range appended since the last refresh, cut at the
+     last complete CSV record (quoted answers may contain newlines; a last
+     record without a newline is taken once it is unchanged on two polls),
+  2. scores the new rows with the shared STEP 1 helpers,
+  3. adds them to running counts, sums, min/max, histogram bins and
+     cross-product matrices [1, x]'[1, x] (one per complete-case rule),
+  4. rewrites only the outputs whose statistics changed.
+
+Bursts of writes are debounced: a refresh runs once the file size and mtime
+have been stable for --debounce seconds. Each refresh costs time proportional
+to the appended rows, not to the file. If the file shrinks or its header
+changes, the state is rebuilt from the start.
+
+Outputs (STEP 6 formats and file names, under --out-dir, default
+results/watch/, so a refresh never overwrites the committed reference
+outputs in data/, tables/ and figures/):
+  - data/ai_psych_final_v4_clean.csv (new rows appended)
+  - tables/table1_descriptives_reliability.csv
+  - tables/table2_correlation_matrix.csv
+  - tables/table3_regression_summary.csv, tables/regression_results.json
+  - figures/histograms_main_variables.png
+  - figures/scatterplots_main_relationships.png (points sized by frequency)
+
+Alpha uses complete item responses; the STEP 5 clusters are not refreshed.
+The robust block of regression_results.json (HC0-HC3, Huber, bisquare) has
+no sufficient statistics, so the watched copy carries the classical
+estimates only; run robust_regression.py on the export for it.
+
+Usage:
+    python scripts/watch_export.py [--data v4_data.csv] [--out-dir results/watch] [--interval 1] [--debounce 2] [--once]
+"""
+
+import argparse
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import t as t_dist
+
+from survey_data import (
+    rename_columns, score_composites, prepare_covariates,
+    ai_items, creativity_general_items, authorship_core_items,
+    desc_vars, scale_items, corr_vars, key_pairs, reg_vars, model_specs, INTERACTION_TERM,
+)
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    HAS_PLOTTING = True
+except ImportError:
+    HAS_PLOTTING = False
+
+BLOCK_BYTES = 32 << 20
+DEFAULT_OUT_DIR = os.path.join("results", "watch")
+CLEAN_DATA = "data/ai_psych_final_v4_clean.csv"
+HIST_EDGES = np.linspace(1, 5, 21)
+
+export_cols = [
+    "AI_USE_SCORE", "CREATIVITY_GENERAL", "AUTHORSHIP_SCORE",
+    "grade_num", "gender_female", "writing_ability_num",
+    "assignments_per_week_num", "overall_policy_num",
+    "artificial_intelligence_instruction_num"
+] + ai_items + creativity_general_items + authorship_core_items
+
+# Complete-case blocks: each keeps [1, x]'[1, x] over rows with every variable present
+blocks = {
+    **{f"alpha_{var}": items for var, items in scale_items.items()},
+    "key_correlations": desc_vars,
+    "correlations": corr_vars,
+    "regression": reg_vars + [INTERACTION_TERM],
+}
+
+# Output (relative to the output directory) -> statistics it is computed from;
+# rewritten only when one of them changed
+outputs = {
+    "tables/table1_descriptives_reliability.csv": {"descriptives"} | {f"alpha_{v}" for v in desc_vars},
+    "tables/table2_correlation_matrix.csv": {"correlations"},
+    "tables/table3_regression_summary.csv": {"regression"},
+    "tables/regression_results.json": {"regression"},
+    "figures/histograms_main_variables.png": {"histograms"},
+    "figures/scatterplots_main_relationships.png": {"key_correlations", "scatter"},
+}
+
+
+# ----------------------------------------------------------------------------
+# Reading appended records
+# ----------------------------------------------------------------------------
+
+def complete_prefix(chunk):
+    """
+    Length of the longest prefix of `chunk` that ends on a complete CSV record.
+
+    A newline ends a record only when it sits outside quotes, i.e. when the
+    number of quote characters before it is even ("" escapes count twice).
+    """
+    quotes = chunk.count(b'"')
+    end = len(chunk)
+    while True:
+        newline = chunk.rfind(b"\n", 0, end)
+        if newline < 0:
+            return 0
+        quotes -= chunk.count(b'"', newline, end)
+        if quotes % 2 == 0:
+            return newline + 1
+        end = newline
+
+
+def score_rows(raw):
+    """STEP 1 scoring of raw export rows (renamed items, composites, covariates)."""
+    adf = rename_columns(raw).copy()
+    score_composites(adf)
+    prepare_covariates(adf)
+    return adf
+
+
+class ExportTail:
+    """Byte offset into a growing CSV export; yields the rows appended since the last read."""
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.header = None
+        self.text_columns = None
+        self.inode = None
+        # (offset, file size) at which an unterminated trailing record was last seen
+        self.waiting = None
+
+    def _rewritten(self):
+        """True when the file was truncated, replaced or got a new header."""
+        st = os.stat(self.path)
+        if self.header is None:
+            return False
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            return True
+        with open(self.path, "rb") as f:
+            return f.read(len(self.header)) != self.header
+
+    def read_new(self, final=False):
+        """
+        Scored DataFrames for the complete records appended since the last call.
+
+        A trailing record without a newline may be half-written, so it is only
+        taken when final is True (the file is known to be complete) or when
+        the previous call saw it at the same offset and file size; until then
+        the offset stays before it and `waiting` is set.
+
+        Returns:
+        --------
+        tuple : (list of DataFrames, rebuilt) where rebuilt is True when the
+                file had been rewritten and is now read from the start
+        """
+        rebuilt = self._rewritten()
+        if rebuilt:
+            self.reset()
+        frames = []
+        with open(self.path, "rb") as f:
+            if self.header is None:
+                self.inode = os.fstat(f.fileno()).st_ino
+                head = f.read(BLOCK_BYTES)
+                end = _header_end(head)
+                if end == len(head):
+                    return frames, rebuilt
+                self.header = head[:end + 1]
+                self.offset = len(self.header)
+            f.seek(self.offset)
+            pending = b""
+            while True:
+                block = f.read(BLOCK_BYTES)
+                if not block:
+                    break
+                data = pending + block
+                cut = complete_prefix(data)
+                if cut:
+                    frames.append(self._parse(data[:cut]))
+                    self.offset += cut
+                pending = data[cut:]
+            # Exports often end without a newline: a balanced trailing record is
+            # taken once it has stayed unchanged across two reads
+            tail = (self.offset, os.fstat(f.fileno()).st_size)
+            balanced = bool(pending.strip()) and pending.count(b'"') % 2 == 0
+            if balanced and (final or self.waiting == tail):
+                frames.append(self._parse(pending + b"\n"))
+                self.offset += len(pending)
+                self.waiting = None
+            else:
+                self.waiting = tail if balanced else None
+        return frames, rebuilt
+
+    def _parse(self, body):
+        dtype = {c: str for c in self.text_columns} if self.text_columns is not None else None
+        raw = pd.read_csv(io.BytesIO(self.header + body), index_col=0, dtype=dtype)
+        if self.text_columns is None:
+            # Later blocks keep the first block's text columns as text, even when a block is all blank
+            self.text_columns = [c for c in raw.columns
+                                 if raw[c].dtype == 'object' or pd.api.types.is_string_dtype(raw[c])]
+        return score_rows(raw)
+
+
+def _header_end(head):
+    """Index of the newline that ends the header record."""
+    quotes = 0
+    start = 0
+    while True:
+        newline = head.find(b"\n", start)
+        if newline < 0:
+            return len(head)
+        quotes += head.count(b'"', start, newline)
+        if quotes % 2 == 0:
+            return newline
+        start = newline + 1
+
+
+# ----------------------------------------------------------------------------
+# Running statistics
+# ----------------------------------------------------------------------------
+
+class RunningStatistics:
+    """Sufficient statistics for Tables 1-3 and the figures, updated per batch of rows."""
+
+    def __init__(self):
+        k = len(desc_vars)
+        self.n_rows = 0
+        self.count = np.zeros(k)
+        self.total = np.zeros(k)
+        self.total_sq = np.zeros(k)
+        self.minimum = np.full(k, np.inf)
+        self.maximum = np.full(k, -np.inf)
+        self.hist = np.zeros((k, len(HIST_EDGES) - 1))
+        self.cross = {name: np.zeros((len(v) + 1, len(v) + 1)) for name, v in blocks.items()}
+        self.scatter = {pair: {} for pair in key_pairs.values()}
+
+    @staticmethod
+    def _columns(adf, variables):
+        columns = []
+        for var in variables:
+            if ":" in var:
+                left, right = var.split(":")
+                columns.append(adf[left].to_numpy(dtype=float) * adf[right].to_numpy(dtype=float))
+            else:
+                columns.append(adf[var].to_numpy(dtype=float))
+        return np.column_stack(columns)
+
+    def update(self, adf):
+        """
+        Add a batch of scored rows.
+
+        Returns:
+        --------
+        set : names of the statistics that changed
+        """
+        changed = set()
+        self.n_rows += len(adf)
+
+        X = self._columns(adf, desc_vars)
+        ok = ~np.isnan(X)
+        if ok.any():
+            changed |= {"descriptives", "histograms"}
+            Z = np.where(ok, X, 0.0)
+            self.count += ok.sum(axis=0)
+            self.total += Z.sum(axis=0)
+            self.total_sq += (Z ** 2).sum(axis=0)
+            self.minimum = np.fmin(self.minimum, np.where(ok, X, np.inf).min(axis=0))
+            self.maximum = np.fmax(self.maximum, np.where(ok, X, -np.inf).max(axis=0))
+            for j in range(len(desc_vars)):
+                self.hist[j] += np.histogram(X[ok[:, j], j], bins=HIST_EDGES)[0]
+
+        for name, variables in blocks.items():
+            V = self._columns(adf, variables)
+            V = V[~np.isnan(V).any(axis=1)]
+            if len(V):
+                W = np.column_stack([np.ones(len(V)), V])
+                self.cross[name] += W.T @ W
+                changed.add(name)
+
+        for (x, y), counts in self.scatter.items():
+            P = self._columns(adf, [x, y])
+            P = P[~np.isnan(P).any(axis=1)]
+            if len(P):
+                points, n = np.unique(np.round(P, 6), axis=0, return_counts=True)
+                for (a, b), c in zip(points, n):
+                    counts[(a, b)] = counts.get((a, b), 0) + int(c)
+                changed.add("scatter")
+        return changed
+
+    # Derived results -----------------------------------------------------
+
+    @staticmethod
+    def _moments(C):
+        n = C[0, 0]
+        mean = C[0, 1:] / n
+        cov = (C[1:, 1:] - n * np.outer(mean, mean)) / (n - 1)
+        return n, mean, cov
+
+    def _corr(self, name):
+        n, _, cov = self._moments(self.cross[name])
+        sd = np.sqrt(np.diag(cov))
+        return n, cov / np.outer(sd, sd)
+
+    def table1(self):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.total / self.count
+            sd = np.sqrt((self.total_sq - self.count * mean ** 2) / (self.count - 1))
+        rows = []
+        for j, var in enumerate(desc_vars):
+            _, _, cov = self._moments(self.cross[f"alpha_{var}"])
+            k = cov.shape[0]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                alpha = k / (k - 1) * (1 - np.trace(cov) / cov.sum())
+            rows.append({"variable_name": var, "N": int(self.count[j]), "mean": mean[j], "sd": sd[j],
+                         "min": self.minimum[j], "max": self.maximum[j], "alpha": alpha})
+        return pd.DataFrame(rows)
+
+    def correlation_matrix(self):
+        _, r = self._corr("correlations")
+        return pd.DataFrame(r, index=corr_vars, columns=corr_vars)
+
+    def key_correlations(self):
+        n, r = self._corr("key_correlations")
+        out = {}
+        for key, (a, b) in key_pairs.items():
+            rho = r[desc_vars.index(a), desc_vars.index(b)]
+            t = rho * np.sqrt((n - 2) / (1 - rho ** 2))
+            out[key] = {"r": rho, "p": 2 * t_dist.sf(abs(t), n - 2)}
+        return out
+
+    def fit(self, model_key):
+        """OLS for one of Models A-C from the regression cross-products."""
+        spec = model_specs[model_key]
+        variables = blocks["regression"]
+        C = self.cross["regression"]
+        cols = [0] + [variables.index(t) + 1 for t in spec["terms"][1:]]
+        y = variables.index(spec["outcome_name"]) + 1
+        n = C[0, 0]
+        p = len(cols)
+        xtx_inv = np.linalg.inv(C[np.ix_(cols, cols)])
+        xty = C[cols, y]
+        b = xtx_inv @ xty
+        sse = C[y, y] - b @ xty
+        sst = C[y, y] - C[0, y] ** 2 / n
+        se = np.sqrt(sse / (n - p) * np.diag(xtx_inv))
+        pvals = 2 * t_dist.sf(np.abs(b / se), n - p)
+        terms = spec["terms"]
+        return {"N": int(n), "R2": 1 - sse / sst,
+                "B": dict(zip(terms, b)), "SE": dict(zip(terms, se)), "p": dict(zip(terms, pvals))}
+
+    def regression_results(self):
+        """Same layout as STEP 4's reg_results (without the robust blocks)."""
+        results = {}
+        for key in ("model_a", "model_b"):
+            fit = self.fit(key)
+            results[key] = {
+                "model_name": model_specs[key]["model_name"],
+                "outcome_name": model_specs[key]["outcome_name"],
+                "N": fit["N"],
+                "R2": fit["R2"],
+                "AI_USE_SCORE_B": fit["B"]["AI_USE_SCORE"],
+                "AI_USE_SCORE_SE": fit["SE"]["AI_USE_SCORE"],
+                "AI_USE_SCORE_p": fit["p"]["AI_USE_SCORE"],
+            }
+        fit = self.fit("model_c")
+        results["model_c"] = {
+            "model_name": "Model C",
+            "outcome_name": "AUTHORSHIP_SCORE",
+            "N": fit["N"],
+            "R2": fit["R2"],
+            "interaction_B": fit["B"][INTERACTION_TERM],
+            "interaction_SE": fit["SE"][INTERACTION_TERM],
+            "interaction_p": fit["p"][INTERACTION_TERM],
+        }
+        return {k: {f: (float(v) if isinstance(v, np.floating) else v) for f, v in m.items()}
+                for k, m in results.items()}
+
+
+# ----------------------------------------------------------------------------
+# Outputs
+# ----------------------------------------------------------------------------
+
+def _plot_histograms(stats, path):
+    fig, axes = plt.subplots(1, 3, figsize=(15, 4))
+    labels = ["AI Use Score", "Creativity General", "Authorship Score"]
+    for j, (ax, label) in enumerate(zip(axes, labels)):
+        ax.stairs(stats.hist[j], HIST_EDGES, fill=True, edgecolor="black")
+        ax.set_xlabel(label)
+        ax.set_ylabel("Frequency")
+        ax.set_title(f"Distribution of {label}")
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches="tight")
+    plt.close()
+
+
+def _plot_scatter(stats, path):
+    fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+    n, _, cov = stats._moments(stats.cross["key_correlations"])
+    mean = stats.cross["key_correlations"][0, 1:] / n
+    corrs = stats.key_correlations()
+    panels = [("AI_USE_vs_CREATIVITY", "Creativity General", "Creativity"),
+              ("AI_USE_vs_AUTHORSHIP", "Authorship Score", "Authorship")]
+    for ax, (key, ylabel, short) in zip(axes, panels):
+        x, y = key_pairs[key]
+        counts = stats.scatter[(x, y)]
+        points = np.array(list(counts.keys()))
+        sizes = np.array(list(counts.values()))
+        # Area relative to the most frequent point, so drawing cost does not grow with N
+        ax.scatter(points[:, 0], points[:, 1], s=10 + 290 * sizes / sizes.max(), alpha=0.5)
+        i, j = desc_vars.index(x), desc_vars.index(y)
+        slope = cov[i, j] / cov[i, i]
+        xs = np.array([points[:, 0].min(), points[:, 0].max()])
+        ax.plot(xs, mean[j] + slope * (xs - mean[i]), "r--", alpha=0.8)
+        ax.set_xlabel("AI Use Score")
+        ax.set_ylabel(ylabel)
+        ax.set_title(f"AI Use vs {short} (r = {corrs[key]['r']:.3f})")
+        ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300, bbox_inches="tight")
+    plt.close()
+
+
+def write_outputs(stats, changed, out_dir=DEFAULT_OUT_DIR):
+    """Rewrite the outputs that depend on a changed statistic; returns the paths written."""
+    written = []
+    for name, needs in outputs.items():
+        if not needs & changed:
+            continue
+        if name.startswith("figures/") and not HAS_PLOTTING:
+            continue
+        path = os.path.join(out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith("table1_descriptives_reliability.csv"):
+            stats.table1().to_csv(path, index=False)
+        elif path.endswith("table2_correlation_matrix.csv"):
+            stats.correlation_matrix().to_csv(path)
+        elif path.endswith("table3_regression_summary.csv"):
+            results = stats.regression_results()
+            pd.DataFrame([{
+                "Model": results[k]["model_name"], "Outcome": results[k]["outcome_name"],
+                "N": results[k]["N"], "R2": results[k]["R2"],
+                "AI_USE_B": results[k]["AI_USE_SCORE_B"], "AI_USE_SE": results[k]["AI_USE_SCORE_SE"],
+                "AI_USE_p": results[k]["AI_USE_SCORE_p"],
+            } for k in ("model_a", "model_b")]).to_csv(path, index=False)
+        elif path.endswith("regression_results.json"):
+            with open(path, "w") as f:
+                json.dump(stats.regression_results(), f, indent=2, default=str)
+        elif path.endswith("histograms_main_variables.png"):
+            _plot_histograms(stats, path)
+        elif path.endswith("scatterplots_main_relationships.png"):
+            _plot_scatter(stats, path)
+        written.append(path)
+    return written
+
+
+def append_clean_rows(frames, rebuilt, path=os.path.join(DEFAULT_OUT_DIR, CLEAN_DATA)):
+    """Append the new rows to the cleaned dataset (rewritten from scratch on a rebuild)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for i, adf in enumerate(frames):
+        fresh = rebuilt and i == 0
+        cols = [c for c in export_cols if c in adf.columns]
+        adf[cols].to_csv(path, mode="w" if fresh else "a", header=fresh, index=True)
+
+
+# ----------------------------------------------------------------------------
+# Watch loop
+# ----------------------------------------------------------------------------
+
+class ExportWatcher:
+    """Tail + running statistics + output refresh for one export file."""
+
+    def __init__(self, path, out_dir=DEFAULT_OUT_DIR):
+        self.tail = ExportTail(path)
+        self.stats = RunningStatistics()
+        self.out_dir = out_dir
+
+    def refresh(self, final=False):
+        """
+        Process everything appended since the last refresh (final: the file is complete).
+
+        Returns:
+        --------
+        dict : new_rows, total_rows, written outputs, seconds and rebuilt flag
+        """
+        start = time.perf_counter()
+        first = self.tail.header is None
+        frames, rebuilt = self.tail.read_new(final)
+        rebuilt = rebuilt or first
+        if rebuilt:
+            self.stats = RunningStatistics()
+        changed = set()
+        for adf in frames:
+            changed |= self.stats.update(adf)
+        new_rows = sum(len(adf) for adf in frames)
+        written = []
+        if new_rows:
+            clean = os.path.join(self.out_dir, CLEAN_DATA)
+            append_clean_rows(frames, rebuilt, clean)
+            written = [clean] + write_outputs(self.stats, changed, self.out_dir)
+        return {"new_rows": new_rows, "total_rows": self.stats.n_rows, "written": written,
+                "seconds": time.perf_counter() - start, "rebuilt": rebuilt}
+
+
+def _report(result):
+    if not result["new_rows"]:
+        return
+    label = "rebuilt" if result["rebuilt"] else "appended"
+    print(f"✓ {result['new_rows']} rows {label} (N = {result['total_rows']}) "
+          f"in {result['seconds']:.2f}s: {', '.join(result['written'])}")
+
+
+def watch(watcher, interval=1.0, debounce=2.0):
+    """Poll the export; refresh once its size and mtime have been stable for `debounce` seconds."""
+    processed = seen = None
+    seen_at = time.monotonic()
+    while True:
+        try:
+            st = os.stat(watcher.tail.path)
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+        now = time.monotonic()
+        if signature != seen:
+            seen, seen_at = signature, now
+        elif signature is not None and (signature != processed or watcher.tail.waiting) \
+                and now - seen_at >= debounce:
+            _report(watcher.refresh())
+            processed = signature
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--data", default="v4_data.csv")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR,
+                        help="Directory for the refreshed data/, tables/ and figures/ (kept out of the repo)")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between file checks")
+    parser.add_argument("--debounce", type=float, default=2.0,
+                        help="Seconds the file must stay unchanged before a refresh")
+    parser.add_argument("--once", action="store_true", help="Process the current file and exit")
+    args = parser.parse_args()
+
+    print("=" * 70)
+    print("WATCH MODE: INCREMENTAL STEP 2-4 REFRESH")
+    print("=" * 70)
+
+    watcher = ExportWatcher(args.data, args.out_dir)
+    _report(watcher.refresh(final=args.once))
+    if args.once:
+        return
+    print(f"\nWatching {args.data} (Ctrl+C to stop)")
+    try:
+        watch(watcher, args.interval, args.debounce)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()